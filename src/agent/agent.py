@@ -1,14 +1,23 @@
+import os
 import socketio
 import threading
 import time
 import numpy as np
 
 from model import MyAIModel
-from state_processor import extract_observation, format_action
+from obs_schema import FrameLog
+from recorder import EpisodeRecorder
+from state_processor import action_events, encode_states, format_action
 
 # === 初始化 socket.io 客户端 ===
 sio = socketio.Client()
-model = MyAIModel()
+model = None  # 启动时加载（见文件末尾），导入本模块不加载模型
+
+# === 设置 AGAR_RECORD_DIR 时记录每一帧的观察和动作（奖励记为 0） ===
+recorder = EpisodeRecorder(os.environ['AGAR_RECORD_DIR']) if os.environ.get('AGAR_RECORD_DIR') else None
+
+# === 设置 AGAR_FRAME_LOG 时把收到的原始帧写入该文件，供 obs_schema.py parity 检查编码一致性 ===
+frame_log = FrameLog(os.environ['AGAR_FRAME_LOG']) if os.environ.get('AGAR_FRAME_LOG') else None
 
 # === 全局目标用于心跳线程定时发出 ===
 latest_target = {'x': 100, 'y': 100}
@@ -47,9 +56,16 @@ def on_game_state(playerData, players, foods, masses, viruses):
     if not playerData.get('id') or not playerData.get('cells'):
         return
 
-    obs = extract_observation(playerData, players, foods, masses, viruses)
-    action = model.predict(obs)
+    frame = (playerData, players, foods, masses, viruses)
+    if frame_log:
+        frame_log.add(frame)
+    obs = encode_states([frame])
+    action = model.predict_batch(obs)[0]
+    if recorder:
+        recorder.add(obs[0], action, 0.0, False)
     latest_target = format_action(action, playerData)
+    for event in action_events(action):
+        sio.emit(event)
 
     # 打印目标日志
     print(f"[AI] Acting → target: {latest_target}")
@@ -57,15 +73,23 @@ def on_game_state(playerData, players, foods, masses, viruses):
 @sio.on('kick')
 def on_kick(reason):
     print(f"[AI] Kicked from server: {reason}")
+    if recorder:
+        recorder.end_episode()
 
 @sio.event
 def disconnect():
     print('[AI] Disconnected from server')
+    if recorder:
+        recorder.end_episode()
 
 # === 启动客户端 ===
 if __name__ == '__main__':
+    model = MyAIModel()
     try:
         sio.connect('http://localhost:3000?type=player', transports=['websocket'])
         sio.wait()
     except Exception as e:
         print('[AI] Failed to connect:', e)
+    finally:
+        if recorder:
+            recorder.close()
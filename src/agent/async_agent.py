@@ -0,0 +1,165 @@
+"""asyncio 版 AI 客户端：只处理最新一帧，动作算出后立即发送
+
+与 agent.py 不同，收到 serverTellPlayerMove 时只保存这一帧；决策协程每次取最新的
+一帧编码和推理（推理在线程池中运行，不阻塞接收），尚未处理就被新帧覆盖的帧
+计为丢弃。动作就绪后立即 emit，心跳协程每秒重发一次最新目标。
+定期打印每帧决策延迟（收到帧到发出动作）和丢帧数。
+
+用法: python async_agent.py [--bots 1] [--url http://localhost:3000]
+"""
+import argparse
+import asyncio
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import socketio
+
+from model import MyAIModel
+from state_processor import action_events, format_action
+
+
+class AsyncBot:
+    """一个机器人连接，predict(states) 对帧数据列表返回动作（在 executor 中调用）"""
+
+    def __init__(self, name, url, predict, executor, max_samples=10000):
+        self.name = name
+        self.url = url
+        self.predict = predict
+        self.executor = executor
+        self.latest_target = {'x': 100, 'y': 100}
+        # 最新一帧 (接收时间, 参数)，被决策协程取走后置为 None
+        self._frame = None
+        self._frame_ready = asyncio.Event()
+        self.frames = 0
+        self.dropped = 0
+        self.decisions = 0
+        self.latencies = deque(maxlen=max_samples)
+        self.sio = socketio.AsyncClient()
+        self.sio.on('connect', self.on_connect)
+        self.sio.on('match_found', self.on_match_found)
+        self.sio.on('welcome', self.on_welcome)
+        self.sio.on('serverTellPlayerMove', self.on_game_state)
+        self.sio.on('kick', self.on_kick)
+        self.sio.on('disconnect', self.on_disconnect)
+
+    async def run(self):
+        """连接并运行决策和心跳协程，直到断开"""
+        await self.sio.connect(self.url, transports=['websocket'])
+        tasks = [asyncio.create_task(self._decide_loop()), asyncio.create_task(self._heartbeat_loop())]
+        try:
+            await self.sio.wait()
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def on_connect(self):
+        print(f'[AI:{self.name}] Connected to server')
+        await self.sio.emit('join_matchmaking')
+
+    async def on_match_found(self, data):
+        print(f"[AI:{self.name}] Match found! Room ID: {data['roomId']}")
+        await self.sio.emit('gotit', {'name': self.name})
+
+    async def on_welcome(self, playerSettings, gameSizes):
+        await self.sio.emit('respawn')
+
+    async def on_game_state(self, playerData, players, foods, masses, viruses):
+        if not playerData.get('id') or not playerData.get('cells'):
+            return
+        self.frames += 1
+        if self._frame is not None:
+            # 上一帧还没被处理，直接被新帧替换
+            self.dropped += 1
+        self._frame = (time.perf_counter(), (playerData, players, foods, masses, viruses))
+        self._frame_ready.set()
+
+    async def on_kick(self, reason):
+        print(f"[AI:{self.name}] Kicked from server: {reason}")
+
+    async def on_disconnect(self):
+        print(f'[AI:{self.name}] Disconnected from server')
+
+    async def _decide_loop(self):
+        while True:
+            await self._frame_ready.wait()
+            self._frame_ready.clear()
+            received, state = self._frame
+            self._frame = None
+            # 一帧决策失败只记录下来，继续处理后面的帧，不让决策协程悄悄退出
+            try:
+                await self._decide(state)
+            except Exception as e:
+                print(f'[AI:{self.name}] Decision failed:', e)
+                continue
+            self.decisions += 1
+            self.latencies.append(time.perf_counter() - received)
+
+    async def _decide(self, state):
+        loop = asyncio.get_running_loop()
+        actions = await loop.run_in_executor(self.executor, self.predict, [state])
+        self.latest_target = format_action(actions[0], state[0])
+        await self.sio.emit('0', self.latest_target)
+        for event in action_events(actions[0]):
+            await self.sio.emit(event)
+
+    async def _heartbeat_loop(self):
+        while True:
+            await asyncio.sleep(1.0)  # 每秒发送一次
+            try:
+                await self.sio.emit('0', self.latest_target)
+            except Exception as e:
+                print(f'[AI:{self.name}] Heartbeat failed:', e)
+
+    def stats(self):
+        """决策延迟（毫秒）和丢帧统计"""
+        ms = np.asarray(self.latencies) * 1e3
+        return {
+            'frames': self.frames,
+            'decisions': self.decisions,
+            'dropped': self.dropped,
+            'latency_p50_ms': float(np.percentile(ms, 50)) if len(ms) else None,
+            'latency_p99_ms': float(np.percentile(ms, 99)) if len(ms) else None,
+        }
+
+
+async def _report_loop(bots, interval):
+    while True:
+        await asyncio.sleep(interval)
+        for bot in bots:
+            print(f'[AI:{bot.name}] {bot.stats()}')
+
+
+async def run_bots(model, url, n_bots, report_interval=10.0):
+    """在一个事件循环中运行 n_bots 个机器人，共享模型和单线程推理线程池"""
+    executor = ThreadPoolExecutor(max_workers=1)
+    suffix = np.random.randint(1000, 9999)
+    bots = [AsyncBot(f'py_ai_{suffix}_{i}', url, model.predict_states, executor) for i in range(n_bots)]
+    reporter = asyncio.create_task(_report_loop(bots, report_interval))
+    try:
+        await asyncio.gather(*(bot.run() for bot in bots))
+    finally:
+        reporter.cancel()
+        executor.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--bots', type=int, default=1)
+    parser.add_argument('--url', default='http://localhost:3000')
+    parser.add_argument('--model', default='models/ppo_agar_agent.zip')
+    parser.add_argument('--backend', choices=['sb3', 'numpy', 'onnx'], default='sb3',
+                        help='numpy / onnx 使用 numpy_policy.py 导出的权重，不加载 SB3 和 torch')
+    parser.add_argument('--report-interval', type=float, default=10.0)
+    args = parser.parse_args()
+    try:
+        asyncio.run(run_bots(MyAIModel(args.model, backend=args.backend), f'{args.url}?type=player', args.bots, args.report_interval))
+    except KeyboardInterrupt:
+        pass
+    except Exception as e:
+        print('[AI] Failed to connect:', e)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+"""空间索引基准：食物数量和地图尺寸增大时的平均 step 耗时
+
+用法: python bench_spatial.py [--steps 200] [--backend object numpy]
+"""
+import argparse
+import time
+
+import numpy as np
+
+from env import AgarEnvironment
+
+
+# (地图边长, 食物数量)，最后一项对应服务器 config.js 的 5000x5000 / 1000
+SCENARIOS = [
+    (500, 500),
+    (1000, 1000),
+    (2500, 1000),
+    (5000, 1000),
+    (5000, 4000),
+]
+
+
+def make_config(size, food):
+    return {
+        'gameWidth': size,
+        'gameHeight': size,
+        'defaultPlayerMass': 20,
+        'fireFood': 10,
+        'limitSplit': 16,
+        'maxFood': food,
+        'maxViruses': 10,
+        'foodMass': 1,
+        'virusMass': 100,
+        'slowBase': 4.5,
+        'foodUniformDisposition': False,
+        'newPlayerInitialPosition': 'farthest'
+    }
+
+
+def bench(backend, size, food, steps, seed=0):
+    """返回平均每步耗时（毫秒）"""
+    env = AgarEnvironment(config=make_config(size, food), backend=backend)
+    env.rng = np.random.RandomState(seed)
+    env.reset()
+    action = np.zeros(4, dtype=np.float32)
+    start = time.perf_counter()
+    for _ in range(steps):
+        _, _, done, _ = env.step(action)
+        if done:
+            env.reset()
+    return (time.perf_counter() - start) / steps * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--steps', type=int, default=200)
+    parser.add_argument('--backend', nargs='+', default=['object', 'numpy'])
+    args = parser.parse_args()
+
+    print(f"{'map':>10} {'food':>6} " + ' '.join(f'{b:>12}' for b in args.backend))
+    for size, food in SCENARIOS:
+        times = [bench(b, size, food, args.steps) for b in args.backend]
+        print(f"{size:>4}x{size:<5} {food:>6} " + ' '.join(f'{t:>9.3f} ms' for t in times))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,282 @@
+"""Python 智能体各热点路径的基准测试
+
+用法:
+    python benchmark.py run [--quick] [--out results.json] [--baseline baseline.json]
+    python benchmark.py compare baseline.json results.json [--threshold 0.1]
+
+结果为 JSON：{'meta': {...}, 'results': {名称: {'value', 'unit', 'higher_is_better'}}}。
+所有随机数种子固定；每项取 repeats 次测量的中位数。
+compare（以及 run --baseline）对比两份结果，任一指标比基线差超过 threshold
+（相对值）时列为回归并以状态码 1 退出。
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+
+import numpy as np
+
+from env import AgarEnvironment, DEFAULT_CONFIG
+from observation import make_encoder
+from state_processor import extract_observation, encode_states
+from vec_env import BatchedAgarVecEnv
+
+
+SEED = 0
+MODEL_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'models', 'ppo_agar_agent.zip')
+
+# (名称, 配置覆盖项)：基准配置之外每次只改变一个因素，最后一项为服务器 config.js 的配置
+ENV_SCENARIOS = [
+    ('base', {}),
+    ('food_2000', {'maxFood': 2000}),
+    ('viruses_50', {'maxViruses': 50}),
+    ('bots_20', {'botCount': 20}),
+    ('bots_100', {'botCount': 100}),
+    ('map_2500', {'gameWidth': 2500, 'gameHeight': 2500}),
+    ('server', {'gameWidth': 5000, 'gameHeight': 5000, 'maxFood': 1000, 'maxViruses': 50}),
+]
+
+
+def _median_time(fn, repeats):
+    """fn() 的耗时（秒）在 repeats 次测量中的中位数，先预热一次"""
+    fn()
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return float(np.median(times))
+
+
+def _metric(value, unit, higher_is_better):
+    return {'value': value, 'unit': unit, 'higher_is_better': higher_is_better}
+
+
+def _make_env(overrides, backend):
+    env = AgarEnvironment(config=dict(DEFAULT_CONFIG, **overrides), backend=backend)
+    env.seed(SEED)
+    env.reset()
+    return env
+
+
+def bench_env_steps(steps, repeats, backends):
+    """各场景下 AgarEnvironment 每秒步数"""
+    results = {}
+    for backend in backends:
+        for name, overrides in ENV_SCENARIOS:
+            env = _make_env(overrides, backend)
+            actions = np.random.RandomState(SEED).uniform([-1, -1, 0, 0], [1, 1, 1, 1], size=(steps, 4))
+
+            def run():
+                for action in actions:
+                    if env.step(action)[2]:
+                        env.reset()
+
+            seconds = _median_time(run, repeats)
+            results[f'env_steps/{backend}/{name}'] = _metric(steps / seconds, 'steps/s', True)
+    return results
+
+
+def bench_vec_env(steps, repeats, num_envs):
+    """BatchedAgarVecEnv 每秒环境步数"""
+    venv = BatchedAgarVecEnv(num_envs=num_envs, seed=SEED)
+    venv.reset()
+    actions = np.zeros((num_envs, 4), dtype=np.float32)
+
+    def run():
+        for _ in range(steps):
+            venv.step(actions)
+
+    seconds = _median_time(run, repeats)
+    return {f'vec_env_steps/{num_envs}': _metric(steps * num_envs / seconds, 'steps/s', True)}
+
+
+def bench_reset(repeats, backends):
+    """reset 延迟"""
+    results = {}
+    for backend in backends:
+        for name, overrides in (ENV_SCENARIOS[0], ENV_SCENARIOS[-1]):
+            env = _make_env(overrides, backend)
+            seconds = _median_time(env.reset, repeats)
+            results[f'reset/{backend}/{name}'] = _metric(seconds * 1e3, 'ms', False)
+    return results
+
+
+def bench_encoders(repeats, num_envs):
+    """观察编码耗时：单个环境和 num_envs 个共享 World 的环境"""
+    results = {}
+    venv = BatchedAgarVecEnv(num_envs=num_envs, seed=SEED)
+    venv.reset()
+    for _ in range(50):
+        venv.step(np.zeros((num_envs, 4), dtype=np.float32))
+    for mode in ('nearest', 'grid'):
+        encoder = make_encoder(dict(DEFAULT_CONFIG, observation=mode))
+        for batch in (1, num_envs):
+            envs = venv.envs[:batch]
+            seconds = _median_time(lambda: encoder.encode(envs), repeats)
+            results[f'encode/{mode}/{batch}'] = _metric(seconds * 1e3, 'ms', False)
+    return results
+
+
+def _live_state(n_foods, n_players, rng):
+    """模拟服务器推送的一帧数据"""
+    me = {'id': 0, 'x': 2500.0, 'y': 2500.0, 'massTotal': 50.0}
+    players = [
+        {'id': i, 'x': x, 'y': y, 'massTotal': m}
+        for i, (x, y, m) in enumerate(zip(
+            rng.uniform(0, 5000, n_players), rng.uniform(0, 5000, n_players), rng.uniform(10, 500, n_players)
+        ))
+    ]
+    players[0] = me
+    foods = [
+        {'x': x, 'y': y, 'mass': 1.0} for x, y in zip(rng.uniform(0, 5000, n_foods), rng.uniform(0, 5000, n_foods))
+    ]
+    return me, players, foods
+
+
+def bench_extract_observation(repeats, calls, batch):
+    """state_processor.extract_observation 每秒调用次数，以及 encode_states 批量编码的吞吐量"""
+    results = {}
+    rng = np.random.RandomState(SEED)
+    for n_foods, n_players in ((100, 10), (1000, 50)):
+        me, players, foods = _live_state(n_foods, n_players, rng)
+
+        def run():
+            for _ in range(calls):
+                extract_observation(me, players, foods, [], [])
+
+        seconds = _median_time(run, repeats)
+        results[f'extract_observation/{n_foods}f_{n_players}p'] = _metric(calls / seconds, 'calls/s', True)
+
+        states = [(me, players, foods, [], [])] * batch
+        seconds = _median_time(lambda: encode_states(states), repeats)
+        results[f'encode_states/{n_foods}f_{n_players}p/{batch}'] = _metric(batch / seconds, 'states/s', True)
+    return results
+
+
+def bench_model(repeats, calls, batch):
+    """各推理后端的 MyAIModel 加载耗时、单帧 predict 延迟和 batch 帧一次前向的延迟
+
+    缺少模型文件或依赖（或模型与已安装的 SB3 版本不兼容）的后端跳过。
+    """
+    from model import MyAIModel
+
+    rng = np.random.RandomState(SEED)
+    me, players, foods = _live_state(1000, 50, rng)
+    obs_dict = extract_observation(me, players, foods, [], [])
+    results = {}
+    for backend in ('sb3', 'numpy', 'onnx'):
+        try:
+            start = time.perf_counter()
+            model = MyAIModel(MODEL_PATH, backend=backend)
+            load_seconds = time.perf_counter() - start
+        except Exception as e:
+            print(f"[bench] skip {backend} model benchmarks: {e}", file=sys.stderr)
+            continue
+
+        def single():
+            for _ in range(calls):
+                model.predict(obs_dict)
+
+        obs = np.repeat(model._preprocess(obs_dict), batch, axis=0)
+        results[f'model_load/{backend}'] = _metric(load_seconds * 1e3, 'ms', False)
+        results[f'model_predict/{backend}/1'] = _metric(_median_time(single, repeats) / calls * 1e3, 'ms', False)
+        results[f'model_predict/{backend}/{batch}'] = _metric(
+            _median_time(lambda: model.predict_batch(obs), repeats) * 1e3, 'ms', False
+        )
+    return results
+
+
+def run_all(quick=False):
+    """运行全部基准，返回结果字典"""
+    steps, repeats, calls, batch = (50, 3, 100, 16) if quick else (300, 5, 1000, 64)
+    backends = ['object', 'numpy']
+    results = {}
+    results.update(bench_env_steps(steps, repeats, backends))
+    results.update(bench_vec_env(steps // 5, repeats, batch))
+    results.update(bench_reset(repeats, backends))
+    results.update(bench_encoders(repeats * 4, batch))
+    results.update(bench_extract_observation(repeats, calls // 10, batch))
+    results.update(bench_model(repeats, calls // 10, batch))
+    return {
+        'meta': {
+            'seed': SEED,
+            'quick': quick,
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'machine': platform.machine(),
+            'processor': platform.processor(),
+            'cpu_count': os.cpu_count(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        },
+        'results': results,
+    }
+
+
+def compare(baseline, current, threshold=0.1):
+    """对比两份结果，返回 [(名称, 基线值, 当前值, 相对变化, 是否回归)]
+
+    相对变化为正表示变好（吞吐量升高或延迟降低）。
+    """
+    rows = []
+    for name, base in sorted(baseline['results'].items()):
+        if name not in current['results']:
+            continue
+        value = current['results'][name]['value']
+        change = (value - base['value']) / base['value']
+        if not base['higher_is_better']:
+            change = -change
+        rows.append((name, base['value'], value, change, change < -threshold))
+    return rows
+
+
+def print_comparison(rows):
+    print(f"{'benchmark':<40} {'baseline':>12} {'current':>12} {'change':>8}")
+    for name, base, value, change, regressed in rows:
+        flag = '  REGRESSION' if regressed else ''
+        print(f"{name:<40} {base:>12.4g} {value:>12.4g} {change:>+7.1%}{flag}")
+
+
+def _load(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest='cmd', required=True)
+    run_parser = sub.add_parser('run', help='运行基准')
+    run_parser.add_argument('--quick', action='store_true', help='更少的步数和重复次数')
+    run_parser.add_argument('--out', help='结果 JSON 路径（默认输出到 stdout）')
+    run_parser.add_argument('--baseline', help='与该基线对比')
+    run_parser.add_argument('--threshold', type=float, default=0.1)
+    cmp_parser = sub.add_parser('compare', help='对比两份结果')
+    cmp_parser.add_argument('baseline')
+    cmp_parser.add_argument('current')
+    cmp_parser.add_argument('--threshold', type=float, default=0.1)
+    args = parser.parse_args()
+
+    if args.cmd == 'run':
+        current = run_all(args.quick)
+        text = json.dumps(current, indent=2)
+        if args.out:
+            with open(args.out, 'w') as f:
+                f.write(text)
+        else:
+            print(text)
+        if not args.baseline:
+            return
+        baseline = _load(args.baseline)
+    else:
+        baseline, current = _load(args.baseline), _load(args.current)
+
+    rows = compare(baseline, current, args.threshold)
+    print_comparison(rows)
+    if any(regressed for *_, regressed in rows):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
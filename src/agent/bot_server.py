@@ -0,0 +1,217 @@
+"""单进程托管多个 AI 机器人连接，共享一个模型做微批推理
+
+每个机器人一个 socket.io 连接，收到 serverTellPlayerMove 后把帧数据送入共享的
+InferenceQueue；推理线程把等待中的帧凑成一批（最多 max_batch 个，或最早的帧
+等待满 max_wait 秒），一次编码成模型输入（state_processor.encode_states）并前向，
+再把动作分发回各连接。所有连接共用一个心跳线程。
+
+用法: python bot_server.py [--bots 50] [--url http://localhost:3000] [--max-batch 64] [--max-wait 0.005]
+"""
+import argparse
+import queue
+import threading
+import time
+
+import numpy as np
+import socketio
+
+from model import MyAIModel
+from state_processor import action_events, format_action
+
+
+class InferenceQueue:
+    """微批推理队列
+
+    predict_batch(items) 接收 submit 提交的 N 个请求组成的列表，返回 N 个动作。
+    submit 的回调在推理线程中调用，应当足够轻量。
+    """
+
+    def __init__(self, predict_batch, max_batch=64, max_wait=0.005):
+        self.predict_batch = predict_batch
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.batches = 0
+        self.requests = 0
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+        self._thread.start()
+
+    def submit(self, item, callback):
+        """提交一个请求，动作算出后调用 callback(action)"""
+        self._queue.put((item, callback))
+
+    def close(self):
+        """处理完已提交的请求后停止推理线程"""
+        self._queue.put(None)
+        self._thread.join()
+
+    def _collect(self):
+        """阻塞取出下一批请求；收到关闭信号时第二个返回值为 True"""
+        item = self._queue.get()
+        if item is None:
+            return [], True
+        batch = [item]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    def _loop(self):
+        closed = False
+        while not closed:
+            batch, closed = self._collect()
+            if not batch:
+                continue
+            try:
+                actions = self.predict_batch([item for item, _ in batch])
+            except Exception as e:
+                print('[AI] Batched inference failed:', e)
+                continue
+            self.batches += 1
+            self.requests += len(batch)
+            for (_, callback), action in zip(batch, actions):
+                # 单个回调出错不影响同一批的其他连接，也不让推理线程退出
+                try:
+                    callback(action)
+                except Exception as e:
+                    print('[AI] Action callback failed:', e)
+
+
+class BotConnection:
+    """一个机器人的 socket.io 连接，事件处理与 agent.py 一致，推理交给 InferenceQueue"""
+
+    def __init__(self, name, url, inference, verbose=False):
+        self.name = name
+        self.url = url
+        self.inference = inference
+        self.verbose = verbose
+        self.latest_target = {'x': 100, 'y': 100}
+        self.sio = socketio.Client()
+        self.sio.on('connect', self.on_connect)
+        self.sio.on('match_found', self.on_match_found)
+        self.sio.on('welcome', self.on_welcome)
+        self.sio.on('serverTellPlayerMove', self.on_game_state)
+        self.sio.on('kick', self.on_kick)
+        self.sio.on('disconnect', self.on_disconnect)
+
+    def connect(self):
+        self.sio.connect(self.url, transports=['websocket'])
+
+    def heartbeat(self):
+        """发送最新目标，保持连接活跃"""
+        if not self.sio.connected:
+            return
+        try:
+            self.sio.emit('0', self.latest_target)
+        except Exception as e:
+            print(f'[AI:{self.name}] Heartbeat failed:', e)
+
+    def on_connect(self):
+        print(f'[AI:{self.name}] Connected to server')
+        self.sio.emit('join_matchmaking')
+
+    def on_match_found(self, data):
+        print(f"[AI:{self.name}] Match found! Room ID: {data['roomId']}")
+        self.sio.emit('gotit', {'name': self.name})
+
+    def on_welcome(self, playerSettings, gameSizes):
+        self.sio.emit('respawn')
+
+    def on_game_state(self, playerData, players, foods, masses, viruses):
+        if not playerData.get('id') or not playerData.get('cells'):
+            return
+        state = (playerData, players, foods, masses, viruses)
+        self.inference.submit(state, lambda action: self._act(action, playerData))
+
+    def _act(self, action, playerData):
+        self.latest_target = format_action(action, playerData)
+        for event in action_events(action):
+            self.sio.emit(event)
+        if self.verbose:
+            print(f"[AI:{self.name}] Acting → target: {self.latest_target}")
+
+    def on_kick(self, reason):
+        print(f"[AI:{self.name}] Kicked from server: {reason}")
+
+    def on_disconnect(self):
+        print(f'[AI:{self.name}] Disconnected from server')
+
+
+class BotServer:
+    """在一个进程中运行 n_bots 个机器人，共享一个 MyAIModel"""
+
+    def __init__(self, model, url, n_bots, max_batch=64, max_wait=0.005, verbose=False):
+        self.inference = InferenceQueue(model.predict_states, max_batch, max_wait)
+        suffix = np.random.randint(1000, 9999)
+        self.bots = [
+            BotConnection(f'py_ai_{suffix}_{i}', url, self.inference, verbose)
+            for i in range(n_bots)
+        ]
+
+    def start(self, connect_interval=0.05):
+        """依次建立连接（间隔 connect_interval 秒避免同时握手），并启动共享心跳线程"""
+        for bot in self.bots:
+            try:
+                bot.connect()
+            except Exception as e:
+                print(f'[AI:{bot.name}] Failed to connect:', e)
+            time.sleep(connect_interval)
+        threading.Thread(target=self._heartbeat_loop, daemon=True).start()
+
+    def _heartbeat_loop(self):
+        while True:
+            time.sleep(1.0)  # 每秒发送一次
+            for bot in self.bots:
+                bot.heartbeat()
+
+    def wait(self, report_interval=10.0):
+        """阻塞运行，定期打印批量推理统计"""
+        last_batches, last_requests = 0, 0
+        while any(bot.sio.connected for bot in self.bots):
+            time.sleep(report_interval)
+            q = self.inference
+            batches, requests = q.batches - last_batches, q.requests - last_requests
+            last_batches, last_requests = q.batches, q.requests
+            if batches:
+                print(f'[AI] {requests / report_interval:.0f} decisions/s, mean batch {requests / batches:.1f}')
+
+    def close(self):
+        for bot in self.bots:
+            bot.sio.disconnect()
+        self.inference.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--bots', type=int, default=50)
+    parser.add_argument('--url', default='http://localhost:3000')
+    parser.add_argument('--model', default='models/ppo_agar_agent.zip')
+    parser.add_argument('--backend', choices=['sb3', 'numpy', 'onnx'], default='sb3',
+                        help='numpy / onnx 使用 numpy_policy.py 导出的权重，不加载 SB3 和 torch')
+    parser.add_argument('--max-batch', type=int, default=64)
+    parser.add_argument('--max-wait', type=float, default=0.005, help='最早的帧最多等待的秒数')
+    parser.add_argument('--verbose', action='store_true')
+    args = parser.parse_args()
+
+    server = BotServer(
+        MyAIModel(args.model, backend=args.backend), f'{args.url}?type=player', args.bots,
+        args.max_batch, args.max_wait, args.verbose
+    )
+    try:
+        server.start()
+        server.wait()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+
+
+if __name__ == '__main__':
+    main()
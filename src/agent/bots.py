@@ -0,0 +1,58 @@
+import numpy as np
+
+
+# 机器人视野：只躲避或追逐此距离内的玩家
+BOT_SIGHT = 300
+# 每步随机换目标的概率
+RETARGET_PROB = 0.05
+# 质量超过对方该倍数才能吃掉对方（与碰撞规则一致）
+EAT_RATIO = 1.1
+
+
+def bot_policy(px, py, mass, valid, food_x, food_y, has_food, draws, width, height, sight=BOT_SIGHT):
+    """批量计算所有竞技场中机器人的目标位置
+
+    px, py, mass, valid, food_x, food_y, has_food 的形状为 (A, P)，第 a 行是
+    第 a 个竞技场的玩家（valid 标记有效槽位），food_* 是各玩家最近食物的位置；
+    draws 形状为 (A, P, 3)，是 [0, 1) 均匀随机数。
+    width, height, sight 为标量，或形状 (A, 1) 的逐竞技场数值。
+
+    优先级：躲避视野内最近的更大玩家 > 以 RETARGET_PROB 的概率随机换目标
+    > 追逐视野内最近的更小玩家 > 最近的食物 > 保持原目标。
+    返回 (target_x, target_y, keep)，keep 为 True 的槽位保持原目标。
+    """
+    n = px.shape[1]
+    sight = np.asarray(sight, dtype=np.float64).reshape(-1, 1)
+    # [a, i, j]：玩家 i 到玩家 j
+    dx = px[:, None, :] - px[:, :, None]
+    dy = py[:, None, :] - py[:, :, None]
+    dist = np.sqrt(dx ** 2 + dy ** 2)
+    near = valid[:, :, None] & valid[:, None, :] & ~np.eye(n, dtype=bool) & (dist < sight[..., None])
+    bigger = near & (mass[:, None, :] > mass[:, :, None] * EAT_RATIO)
+    smaller = near & (mass[:, :, None] > mass[:, None, :] * EAT_RATIO)
+
+    threat_dist = np.where(bigger, dist, np.inf)
+    threat = np.argmin(threat_dist, axis=2)[..., None]
+    flee = np.isfinite(np.take_along_axis(threat_dist, threat, axis=2)[..., 0])
+    away_x = -np.take_along_axis(dx, threat, axis=2)[..., 0]
+    away_y = -np.take_along_axis(dy, threat, axis=2)[..., 0]
+    away = np.sqrt(away_x ** 2 + away_y ** 2)
+    # 与威胁重合时随便选一个方向
+    away_x = np.where(away > 0, away_x, 1.0)
+    away = np.where(away > 0, away, 1.0)
+    flee_x = np.clip(px + away_x / away * sight, 0, width)
+    flee_y = np.clip(py + away_y / away * sight, 0, height)
+
+    prey_dist = np.where(smaller, dist, np.inf)
+    prey = np.argmin(prey_dist, axis=2)[..., None]
+    chase = np.isfinite(np.take_along_axis(prey_dist, prey, axis=2)[..., 0])
+    chase_x = np.take_along_axis(np.broadcast_to(px[:, None, :], dist.shape), prey, axis=2)[..., 0]
+    chase_y = np.take_along_axis(np.broadcast_to(py[:, None, :], dist.shape), prey, axis=2)[..., 0]
+
+    wander = draws[..., 0] < RETARGET_PROB
+    target_x = np.where(flee, flee_x, np.where(wander, draws[..., 1] * width,
+                        np.where(chase, chase_x, np.where(has_food, food_x, px))))
+    target_y = np.where(flee, flee_y, np.where(wander, draws[..., 2] * height,
+                        np.where(chase, chase_y, np.where(has_food, food_y, py))))
+    keep = ~(flee | wander | chase | has_food)
+    return target_x, target_y, keep
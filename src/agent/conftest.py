@@ -0,0 +1,2 @@
+# test_agent.py 是需要已训练模型的手动演示脚本，不作为测试收集
+collect_ignore = ['test_agent.py']
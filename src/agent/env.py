@@ -1,49 +1,195 @@
+import bisect
+import heapq
+import io
 import math  
 import random  
+from operator import attrgetter
+
 import numpy as np
 import gym
 from gym import spaces
 
 from typing import Dict, List, Tuple, Any, Optional  
+
+from world import (
+    World, EntityList, FoodView, VirusView, MassFoodList,
+    cell_slots, move_cells, decay_cells, eat_food, move_mass_food, mass_food_eats,
+    nearest_batch, nearest_distance, any_within, cell_eats, spawn_positions, density_positions,
+    own_cell_interactions,
+)
+from spatial import SpatialHash, DEFAULT_CELL_SIZE
+from bots import bot_policy
+from observation import make_encoder
+from profiling import StepProfiler
   
+# 默认游戏配置（字段名与 config.js 一致）
+DEFAULT_CONFIG = {
+    'gameWidth': 500,
+    'gameHeight': 500,
+    'defaultPlayerMass': 20,
+    'fireFood': 10,
+    'limitSplit': 16,
+    'maxFood': 500,
+    'maxViruses': 10,
+    'foodMass': 1,
+    'virusMass': 100,
+    # 病毒被射出质量喂到该质量时分裂出一个新病毒（config.js 的 virus.splitMass）
+    'virusSplitMass': 180,
+    # 每个竞技场射出质量池的容量
+    'maxMassFood': 256,
+    'slowBase': 4.5,
+    'foodUniformDisposition': False,
+    'newPlayerInitialPosition': 'farthest',
+    'botCount': 3,
+    # 机器人初始质量（defaultPlayerMass 的倍数）和视野（见 bots.bot_policy）
+    'botMass': 1.0,
+    'botSight': 300,
+    # 食物密度场：若干高斯团 {'x', 'y', 'spread', 'weight'}（坐标和 spread 为地图尺寸的比例），
+    # foodBackground 为均匀分布部分的权重；为空时均匀分布
+    'foodClusters': [],
+    'foodBackground': 0.2,
+    # 每局开始的前 ruleSteps 步由规则策略代替智能体动作
+    'ruleSteps': 2000,
+    # 每次决策运行的物理 tick 数（可以是小数，见 _ticks_for_step）；
+    # 'server' 表示与服务器一致：SERVER_TICK_RATE / networkUpdateFactor
+    'actionRepeat': 1,
+    'networkUpdateFactor': 40,
+    # 分裂后多少秒内同一玩家的细胞互相推开而不合并（map/player.js 的 MERGE_TIMER）
+    'mergeTime': 15
+}
+
+# 服务器 tickGame 的频率（server.js: setInterval(tickGame, 1000 / 60)）
+SERVER_TICK_RATE = 60
+
+# 分裂出的细胞的初速度及其每 tick 的衰减（map/player.js 的 SPLIT_CELL_SPEED / SPEED_DECREMENT）
+SPLIT_CELL_SPEED = 20
+SPEED_DECREMENT = 0.5
+
 class Cell:  
-    def __init__(self, x, y, mass, radius, player_id):  
+    def __init__(self, x, y, mass, radius, player_id, boost=0.0):  
         self.x = x  
         self.y = y  
         self.mass = mass  
         self.radius = radius  
         self.player_id = player_id  
+        # 分裂后的额外速度，每 tick 衰减 SPEED_DECREMENT
+        self.boost = boost
       
     def to_circle(self):  
         """转换为圆形，用于碰撞检测"""  
         return {'x': self.x, 'y': self.y, 'r': self.radius}  
   
 class Player:  
-    def __init__(self, player_id, name, x, y, mass):  
+    def __init__(self, player_id, name, x, y, mass, world=None, arena=0):  
         self.id = player_id  
         self.name = name  
         self.x = x  
         self.y = y  
-        self.cells = [Cell(x, y, mass, self._mass_to_radius(mass), player_id)]  
+        # numpy 后端下细胞存放在 world.cells 中，self.cells 保存视图
+        self.world = world
+        self.arena = arena
+        self.cells = [self._new_cell(x, y, mass, self._mass_to_radius(mass))]  
         self.massTotal = mass  
         self.target = {'x': x, 'y': y}  
         self.screenWidth = 1920  
         self.screenHeight = 1080  
         self.hue = random.randint(0, 360)  
+        # 距离细胞可以合并还剩的 tick 数，分裂时重置
+        self.merge_timer = 0
+        # 控制该机器人的冻结策略（见 league.League），None 时使用内置逻辑
+        self.policy = None
+        # 为 True 时动作由外部给出（见 multi_agent.MultiAgentAgarEnv），内置逻辑不改变其目标
+        self.controlled = False
       
+    @classmethod
+    def restore(cls, player_id, name, state, cells, world=None, arena=0):
+        """从快照恢复玩家（见 AgarEnvironment.get_state）
+
+        state 为 [x, y, target_x, target_y, massTotal, hue, merge_timer]，cells 为若干
+        [x, y, mass, radius, boost]（旧快照没有 merge_timer 和 boost）。不调用 __init__，不消耗随机数。
+        """
+        player = cls.__new__(cls)
+        player.id = player_id
+        player.name = name
+        player.world = world
+        player.arena = arena
+        x, y, target_x, target_y, mass_total, hue = state[:6]
+        player.x = x
+        player.y = y
+        player.cells = [player._new_cell(*cell) for cell in cells]
+        player.massTotal = mass_total
+        player.target = {'x': target_x, 'y': target_y}
+        player.screenWidth = 1920
+        player.screenHeight = 1080
+        player.hue = int(hue)
+        player.merge_timer = int(state[6]) if len(state) > 6 else 0
+        player.policy = None
+        player.controlled = False
+        return player
+
     def _mass_to_radius(self, mass):  
         """质量转换为半径"""  
         return 4 + math.sqrt(mass) * 6  
+
+    def _new_cell(self, x, y, mass, radius, boost=0.0):
+        """创建属于该玩家的细胞（不加入 self.cells）"""
+        if self.world is None:
+            return Cell(x, y, mass, radius, self.id, boost)
+        return self.world.new_cell(self.arena, x, y, mass, radius, self.id, boost)
+
+    # 质量记账：所有细胞质量的变化都经过以下方法，massTotal 和细胞半径
+    # 随之以 O(1) 增量更新，不再对细胞求和
+
+    def set_cell_mass(self, cell, mass):
+        """修改细胞质量，同步更新半径和玩家总质量"""
+        self.massTotal += mass - cell.mass
+        cell.mass = mass
+        cell.radius = self._mass_to_radius(mass)
+
+    def add_cells(self, cells):
+        """加入新细胞"""
+        self.cells.extend(cells)
+        for cell in cells:
+            self.massTotal += cell.mass
+
+    def remove_cell(self, cell):
+        """移除一个细胞并释放其存储"""
+        self.remove_cells([cell])
+
+    def remove_cells(self, cells):
+        """一次移除多个细胞并释放其存储"""
+        removed = set(map(id, cells))
+        self.cells = [cell for cell in self.cells if id(cell) not in removed]
+        for cell in cells:
+            self.massTotal -= cell.mass
+        if not self.cells:
+            self.massTotal = 0
+        if self.world is not None:
+            self.world.cells.kill(self.arena, [cell._slot for cell in cells])
+
+    def verify_mass(self):
+        """调试用：与逐细胞求和的结果比对，不一致时抛出 RuntimeError"""
+        expected = sum(cell.mass for cell in self.cells)
+        if not math.isclose(self.massTotal, expected, rel_tol=1e-9, abs_tol=1e-9):
+            raise RuntimeError(
+                f"Player {self.id}: massTotal {self.massTotal} != sum of cells {expected}"
+            )
       
     def move(self, slow_base, game_width, game_height):  
-        """移动玩家的所有细胞"""  
-        if len(self.cells) > 1:  
-            # 处理细胞合并逻辑  
-            pass  
-          
+        """移动玩家的所有细胞
+
+        细胞之间的合并和推开由环境对所有玩家批量处理（见 AgarEnvironment._resolve_own_cells）。
+        """  
+        if not self.cells:
+            # 已死亡但仍保留的玩家（多智能体接口中不重生的智能体）
+            return
         x_sum = 0  
         y_sum = 0  
         for cell in self.cells:  
+            # 分裂速度每 tick 衰减，不论细胞是否移动
+            boost = cell.boost
+            cell.boost = max(boost - SPEED_DECREMENT, 0.0)
+
             # 简化的移动逻辑  
             dx = self.target['x'] - cell.x  
             dy = self.target['y'] - cell.y  
@@ -52,8 +198,8 @@ class Player:
             if dist < 1:  
                 continue  
                   
-            # 速度与质量成反比  
-            speed = max(slow_base, 6.25 / math.sqrt(cell.mass))  
+            # 速度与质量成反比，刚分裂的细胞取分裂速度  
+            speed = max(slow_base, 6.25 / math.sqrt(cell.mass), boost)  
               
             # 标准化方向向量  
             dx /= dist  
@@ -74,8 +220,12 @@ class Player:
         self.x = x_sum / len(self.cells)  
         self.y = y_sum / len(self.cells)  
       
-    def split(self, limit_split, min_mass):  
-        """玩家分裂"""  
+    def split(self, limit_split, min_mass, merge_ticks=0):  
+        """玩家分裂
+
+        与 map/player.js 的 splitCell 一致，新细胞出现在原细胞的位置，以 SPLIT_CELL_SPEED
+        冲向目标；有细胞分裂时合并计时重置为 merge_ticks。
+        """  
         if len(self.cells) >= limit_split:  
             return  
           
@@ -86,85 +236,403 @@ class Player:
                   
             # 分裂细胞  
             new_mass = cell.mass / 2  
-            cell.mass = new_mass  
-            cell.radius = self._mass_to_radius(new_mass)  
+            self.set_cell_mass(cell, new_mass)
               
             # 创建新细胞  
-            dx = self.target['x'] - cell.x  
-            dy = self.target['y'] - cell.y  
-            dist = math.sqrt(dx * dx + dy * dy)  
-              
-            if dist < 1:  
-                dx = 1  
-                dy = 0  
-            else:  
-                dx /= dist  
-                dy /= dist  
-              
-            new_cell = Cell(  
-                cell.x + dx * cell.radius * 2,  
-                cell.y + dy * cell.radius * 2,  
+            new_cell = self._new_cell(  
+                cell.x,  
+                cell.y,  
                 new_mass,  
                 self._mass_to_radius(new_mass),  
-                self.id  
+                SPLIT_CELL_SPEED  
             )  
             new_cells.append(new_cell)  
           
-        self.cells.extend(new_cells)  
-        self.massTotal = sum(cell.mass for cell in self.cells)  
+        self.add_cells(new_cells)
+        if new_cells:
+            self.merge_timer = merge_ticks
       
-    def eject_mass(self, fire_food):  
-        """射出质量"""  
-        min_cell_mass = 20 + fire_food  # 假设默认质量为20  
-        for i, cell in enumerate(self.cells):  
-            if cell.mass >= min_cell_mass:  
-                cell.mass -= fire_food  
-                cell.radius = self._mass_to_radius(cell.mass)  
-                # 返回射出的质量信息  
-                return {  
-                    'x': cell.x,  
-                    'y': cell.y,  
-                    'mass': fire_food,  
-                    'direction': {'x': self.target['x'] - cell.x, 'y': self.target['y'] - cell.y}  
-                }  
-        return None  
-  
+    def eject_mass(self, fire_food, min_mass, limit):
+        """射出质量（对应服务器 socket.on('1')）
+
+        每个质量不小于 min_mass + fire_food 的细胞朝目标射出 fire_food，最多 limit 个。
+        返回 map/massFood.js 格式的射出质量 dict 列表：射出者 id、细胞下标 num、
+        位置、质量、半径、初速度 25 和单位方向向量。
+        """
+        ejected = []
+        for i, cell in enumerate(self.cells):
+            if len(ejected) >= limit:
+                break
+            if cell.mass < min_mass + fire_food:
+                continue
+            self.set_cell_mass(cell, cell.mass - fire_food)
+            dx = self.target['x'] - cell.x
+            dy = self.target['y'] - cell.y
+            dist = math.sqrt(dx * dx + dy * dy)
+            if dist > 0:
+                dx /= dist
+                dy /= dist
+            ejected.append({
+                'id': self.id,
+                'num': i,
+                'x': cell.x,
+                'y': cell.y,
+                'mass': fire_food,
+                'radius': self._mass_to_radius(fire_food),
+                'speed': 25.0,
+                'direction': {'x': dx, 'y': dy},
+            })
+        return ejected
+
 class Food:  
-    def __init__(self, x, y, mass=1):  
+    def __init__(self, x, y, mass=1, uid=None):  
         self.x = x  
         self.y = y  
         self.mass = mass  
         self.radius = 4  # 食物半径固定  
+        self.uid = uid  # 空间索引编号
+        self.slot = None  # 在食物池中的位置（object 后端）
   
 class Virus:  
-    def __init__(self, x, y, mass=100):  
+    def __init__(self, x, y, mass=100, uid=None):  
         self.x = x  
         self.y = y  
         self.mass = mass  
         self.radius = 4 + math.sqrt(mass) * 6  
+        self.uid = uid  # 空间索引编号
   
+def _tick_merge_timers(players):
+    """返回各玩家本 tick 能否合并细胞，并把未结束的合并计时减一"""
+    can_merge = []
+    for player in players:
+        can_merge.append(player.merge_timer <= 0)
+        if player.merge_timer > 0:
+            player.merge_timer -= 1
+    return can_merge
+
+
+def _merge_own_cells(players, cells, bounds, merges):
+    """结算 own_cell_interactions 返回的合并：吸收者获得被吸收者的质量，被吸收者移除
+
+    cells 为按玩家顺序展开的细胞列表，bounds 为其分段边界。
+    """
+    if not merges:
+        return
+    owner = np.repeat(np.arange(len(players)), np.diff(bounds)).tolist()
+    absorbed = {}
+    for a, b in merges:
+        player = players[owner[a]]
+        player.set_cell_mass(cells[a], cells[a].mass + cells[b].mass)
+        absorbed.setdefault(owner[a], []).append(cells[b])
+    for p, removed in absorbed.items():
+        players[p].remove_cells(removed)
+
+
+def resolve_own_cells_arrays(envs):
+    """所有竞技场所有玩家细胞之间的合并和推开（numpy 后端），envs 共享同一个 World
+
+    与 AgarEnvironment._resolve_own_cells 逐个环境计算的结果一致。
+    """
+    world = envs[0].world
+    store = world.cells
+    players = []
+    arena_of_player = []
+    sizes = []
+    for env in envs:
+        row = [env.agent_player] + env.players
+        players.extend(row)
+        arena_of_player.extend([env.arena] * len(row))
+        sizes.extend([(env.config['gameWidth'], env.config['gameHeight'])] * len(row))
+    slots, bounds = cell_slots(players)
+    counts = np.diff(bounds)
+    arenas = np.repeat(np.asarray(arena_of_player, dtype=np.int64), counts)
+    radius = store.radius[arenas, slots]
+    x = store.x[arenas, slots]
+    y = store.y[arenas, slots]
+    dx, dy, merges = own_cell_interactions(x, y, radius, bounds, _tick_merge_timers(players))
+    pushed = (dx != 0) | (dy != 0)
+    width = np.repeat([w for w, _ in sizes], counts)
+    height = np.repeat([h for _, h in sizes], counts)
+    store.x[arenas[pushed], slots[pushed]] = np.maximum(radius, np.minimum(width - radius, x + dx))[pushed]
+    store.y[arenas[pushed], slots[pushed]] = np.maximum(radius, np.minimum(height - radius, y + dy))[pushed]
+    _merge_own_cells(players, [cell for player in players for cell in player.cells], bounds, merges)
+
+
+def move_and_decay_arrays(envs):
+    """合并、推开并移动所有玩家的细胞，然后衰减质量（numpy 后端）
+
+    envs 中的环境共享同一个 World 和相同的物理配置（地图尺寸可以不同），各自占用
+    不同的竞技场；所有竞技场的细胞在一次向量化计算中完成，结果与逐个环境计算一致。
+    返回参与计算的细胞的 (arenas, slots)。
+    """
+    resolve_own_cells_arrays(envs)
+    world = envs[0].world
+    config = envs[0].config
+    cells = world.cells
+    players = []
+    arena_of_player = []
+    sizes = []
+    for env in envs:
+        players.append(env.agent_player)
+        players.extend(env.players)
+        arena_of_player.extend([env.arena] * (1 + len(env.players)))
+        sizes.extend([(env.config['gameWidth'], env.config['gameHeight'])] * (1 + len(env.players)))
+    slots, bounds = cell_slots(players)
+    counts = np.diff(bounds)
+    arenas = np.repeat(np.asarray(arena_of_player, dtype=np.int64), counts)
+    # 分裂速度每 tick 衰减，不论细胞是否移动
+    boost = cells.boost[arenas, slots]
+    cells.boost[arenas, slots] = np.maximum(boost - SPEED_DECREMENT, 0.0)
+    x, y, moved = move_cells(
+        cells.x[arenas, slots],
+        cells.y[arenas, slots],
+        cells.mass[arenas, slots],
+        cells.radius[arenas, slots],
+        np.repeat([p.target['x'] for p in players], counts),
+        np.repeat([p.target['y'] for p in players], counts),
+        config['slowBase'],
+        np.repeat([w for w, _ in sizes], counts),
+        np.repeat([h for _, h in sizes], counts),
+        boost
+    )
+    cells.x[arenas, slots] = x
+    cells.y[arenas, slots] = y
+    xs, ys, moved = x.tolist(), y.tolist(), moved.tolist()
+    for player, lo, hi in zip(players, bounds[:-1], bounds[1:]):
+        if hi == lo:
+            continue
+        # 与 Player.move 相同的顺序累加，只统计实际移动的细胞
+        x_sum = 0
+        y_sum = 0
+        for i in range(lo, hi):
+            if moved[i]:
+                x_sum += xs[i]
+                y_sum += ys[i]
+        player.x = x_sum / (hi - lo)
+        player.y = y_sum / (hi - lo)
+
+    mass_decay_rate = 0.002  # 每步衰减0.2%
+    mass, decaying = decay_cells(
+        cells.mass[arenas, slots],
+        config['defaultPlayerMass'] * 1.1,
+        mass_decay_rate
+    )
+    deltas = (mass - cells.mass[arenas, slots]).tolist()
+    cells.mass[arenas, slots] = mass
+    cells.radius[arenas[decaying], slots[decaying]] = 4 + np.sqrt(mass[decaying]) * 6
+    decaying = decaying.tolist()
+    # 与 Player.set_cell_mass 相同的增量更新
+    for player, lo, hi in zip(players, bounds[:-1], bounds[1:]):
+        for i in range(lo, hi):
+            if decaying[i]:
+                player.massTotal += deltas[i]
+    return arenas, slots
+
+
+def nearest_food_arrays(envs, players):
+    """players[q] 在 envs[q] 中最近食物的位置 {'x', 'y'}（没有食物时为 None）
+
+    所有查询在一次向量化计算中完成，结果与 AgarEnvironment._nearest_food 一致。
+    """
+    if not players:
+        return []
+    food = envs[0].world.food
+    arenas = np.array([env.arena for env in envs], dtype=np.int64)
+    slots = nearest_batch(
+        food,
+        arenas,
+        np.array([p.x for p in players]),
+        np.array([p.y for p in players])
+    )
+    xs = food.x[arenas, slots].tolist()
+    ys = food.y[arenas, slots].tolist()
+    return [
+        {'x': x, 'y': y} if slot >= 0 else None
+        for x, y, slot in zip(xs, ys, slots.tolist())
+    ]
+
+
+def nearest_food_objects(envs, players):
+    """nearest_food_arrays 的 object 后端版本
+
+    每个环境的所有查询对其食物坐标数组（AgarEnvironment._food_xy）一次向量化计算；
+    距离相同时取槽位较小者，与 nearest_food_arrays 一致。
+    """
+    foods = [None] * len(players)
+    groups = {}
+    for q, env in enumerate(envs):
+        groups.setdefault(id(env), (env, []))[1].append(q)
+    for env, queries in groups.values():
+        if not env.food:
+            continue
+        fx, fy = env._food_xy[:len(env.food)].T
+        qx = np.array([players[q].x for q in queries])
+        qy = np.array([players[q].y for q in queries])
+        slots = np.argmin(np.sqrt((qx[:, None] - fx) ** 2 + (qy[:, None] - fy) ** 2), axis=1).tolist()
+        xs, ys = fx[slots].tolist(), fy[slots].tolist()
+        for q, x, y in zip(queries, xs, ys):
+            foods[q] = {'x': x, 'y': y}
+    return foods
+
+
+def update_bot_targets(envs):
+    """批量决定 envs 中所有机器人的目标（策略见 bots.bot_policy）
+
+    每个环境用自己的随机数生成器为每个机器人抽取 3 个随机数；numpy 后端的
+    最近食物查询对全部机器人批量完成（numpy 后端跨竞技场一次完成，object 后端每个环境一次）。
+    """
+    rows = [[env.agent_player] + env.players for env in envs]
+    shape = (len(envs), max(len(row) for row in rows))
+    px = np.zeros(shape)
+    py = np.zeros(shape)
+    mass = np.zeros(shape)
+    valid = np.zeros(shape, dtype=bool)
+    draws = np.ones(shape + (3,))
+    for a, (env, row) in enumerate(zip(envs, rows)):
+        n = len(row)
+        px[a, :n] = [p.x for p in row]
+        py[a, :n] = [p.y for p in row]
+        mass[a, :n] = [p.massTotal for p in row]
+        valid[a, :n] = True
+        draws[a, 1:n] = env.rng.random_sample((n - 1, 3))
+
+    owners = [env for env in envs for _ in env.players]
+    bots = [p for env in envs for p in env.players]
+    if envs[0].world is not None:
+        foods = nearest_food_arrays(owners, bots)
+    else:
+        foods = nearest_food_objects(owners, bots)
+    food_x = np.zeros(shape)
+    food_y = np.zeros(shape)
+    has_food = np.zeros(shape, dtype=bool)
+    i = 0
+    for a, env in enumerate(envs):
+        for b in range(1, len(env.players) + 1):
+            if foods[i]:
+                food_x[a, b] = foods[i]['x']
+                food_y[a, b] = foods[i]['y']
+                has_food[a, b] = True
+            i += 1
+
+    # 地图尺寸和机器人视野可以随场景按竞技场不同
+    target_x, target_y, keep = bot_policy(
+        px, py, mass, valid, food_x, food_y, has_food, draws,
+        np.array([env.config['gameWidth'] for env in envs], dtype=np.float64)[:, None],
+        np.array([env.config['gameHeight'] for env in envs], dtype=np.float64)[:, None],
+        np.array([env.config.get('botSight', 300) for env in envs], dtype=np.float64)[:, None]
+    )
+    target_x, target_y, keep = target_x.tolist(), target_y.tolist(), keep.tolist()
+    for a, row in enumerate(rows):
+        for b in range(1, len(row)):
+            if not keep[a][b] and not row[b].controlled:
+                row[b].target = {'x': target_x[a][b], 'y': target_y[a][b]}
+
+
+def apply_leagues(envs):
+    """由联赛策略控制的机器人改用策略的动作（在 update_bot_targets 之后调用）
+
+    使用同一个 League 的环境一起批量计算（见 league.League.act）。
+    """
+    leagues = {}
+    for env in envs:
+        if env.league is not None:
+            leagues.setdefault(id(env.league), (env.league, []))[1].append(env)
+    for league, members in leagues.values():
+        league.act(members)
+
+
+def food_contact_arrays(world, arenas, slots):
+    """可能吃到食物的细胞掩码，形状 (n_arenas, cells.capacity)
+
+    细胞半径只会因吃食物而增长，因此当前半径内没有食物的细胞本步不会吃到任何食物。
+    """
+    cells = world.cells
+    may_eat = np.zeros((world.n_arenas, cells.capacity), dtype=bool)
+    may_eat[arenas, slots] = any_within(
+        world.food,
+        arenas,
+        cells.x[arenas, slots],
+        cells.y[arenas, slots],
+        cells.radius[arenas, slots]
+    )
+    return may_eat
+
+
+def move_mass_food_arrays(envs):
+    """移动所有竞技场中仍在运动的射出质量（numpy 后端），envs 共享同一个 World"""
+    world = envs[0].world
+    store = world.mass_food
+    arenas = np.array([env.arena for env in envs], dtype=np.int64)
+    widths = np.array([env.config['gameWidth'] for env in envs], dtype=np.float64)
+    heights = np.array([env.config['gameHeight'] for env in envs], dtype=np.float64)
+    rows = np.arange(store.capacity)[None, :] < store.n_used[arenas][:, None]
+    rows &= store.speed[arenas] > 0
+    row, slots = np.nonzero(rows)
+    if len(slots) == 0:
+        return
+    a = arenas[row]
+    x, y, speed = move_mass_food(
+        store.x[a, slots], store.y[a, slots], store.speed[a, slots],
+        store.dir_x[a, slots], store.dir_y[a, slots], store.radius[a, slots],
+        widths[row], heights[row]
+    )
+    store.x[a, slots] = x
+    store.y[a, slots] = y
+    store.speed[a, slots] = speed
+
+
+def _repeat_action(action):
+    """动作重复时后续 tick 的动作：保持目标，不再分裂和射出质量"""
+    return [action[0], action[1], 0.0, 0.0]
+
+
+def pack_state(state):
+    """把 get_state() 的结果序列化为 bytes"""
+    buf = io.BytesIO()
+    np.savez(buf, **state)
+    return buf.getvalue()
+
+
+def unpack_state(data):
+    """pack_state 的逆操作"""
+    with np.load(io.BytesIO(data)) as f:
+        return {name: f[name] for name in f.files}
+
+
 class AgarEnvironment(gym.Env):  
-    def __init__(self, config=None):  
-        """初始化环境"""  
-        self.config = config or {  
-            'gameWidth': 500,  
-            'gameHeight': 500,  
-            'defaultPlayerMass': 20,  
-            'fireFood': 10,  
-            'limitSplit': 16,  
-            'maxFood': 500,  
-            'maxViruses': 10,  
-            'foodMass': 1,  
-            'virusMass': 100,  
-            'slowBase': 4.5,  
-            'foodUniformDisposition': False,  
-            'newPlayerInitialPosition': 'farthest'  
-        }  
+    metadata = {'render_modes': ['human', 'rgb_array']}
+
+    def __init__(self, config=None, backend='object', world=None, arena=0):  
+        """初始化环境
+
+        backend: 'object' 使用逐对象的 Python 实现；
+                 'numpy' 把实体保存在 world.World 的连续数组中并向量化更新，
+                 同一随机种子下 step() 的结果与 'object' 一致。numpy 后端只用于
+                 批量模拟（BatchedAgarVecEnv 等一次处理所有竞技场）：单个环境时它
+                 通常比 'object' 慢（机器人多时约慢 10%~15%），单个环境请使用默认的 'object'。
+        world, arena: 使用外部 World 的第 arena 行（多个环境共享一个 World，
+                 见 vec_env.BatchedAgarVecEnv），隐含 backend='numpy'。
+        """  
+        self.config = config or dict(DEFAULT_CONFIG)
+        if world is not None:
+            backend = 'numpy'
+        if backend not in ('object', 'numpy'):
+            raise ValueError(f"Unknown backend: {backend}")
+        self.backend = backend
+        if world is None and backend == 'numpy':
+            world = World(self.config)
+        self.world = world
+        self.arena = arena
+
+        # 食物和病毒的空间索引，随生成/被吃增量更新；numpy 后端的食物查询
+        # 直接在整行数组上向量化完成（见 world.eat_food / nearest_batch），不维护食物索引
+        cell_size = self.config.get('spatialCellSize', DEFAULT_CELL_SIZE)
+        self.food_index = SpatialHash(cell_size) if self.world is None else None
+        self.virus_index = SpatialHash(cell_size)
+        self._next_uid = 0
+
         # 游戏实体  
-        self.food = []  
-        self.viruses = []  
-        self.players = []  
-        self.mass_food = []  
+        self._clear_entities()
           
         # AI控制的玩家  
         self.agent_player = None  
@@ -173,18 +641,75 @@ class AgarEnvironment(gym.Env):
         self.steps = 0  
         self.max_steps = 20000  
         self.total_reward = 0  
+
+        # 为 True 时每步校验增量维护的玩家总质量（调试用）
+        self.debug_mass = False
+
+        # 分阶段计时（见 enable_profiling），为 None 时不计时
+        self.profiler = None
+
+        # 预先生成的初始局面（见 set_start_pool），为空时 reset 重新生成
+        self._start_pool = []
+        # 课程调度器（见 set_curriculum 和 scenarios.CurriculumScheduler）及当前场景名
+        self.curriculum = None
+        self.scenario = None
+        # 自博弈联赛（见 set_league 和 league.League）
+        self.league = None
+        # render('rgb_array') 使用的光栅化器，首次渲染时创建
+        self.renderer = None
+
+        # 每次决策的 tick 数及小数部分的累加器
+        repeat = self.config.get('actionRepeat', 1)
+        if repeat == 'server':
+            repeat = SERVER_TICK_RATE / self.config.get('networkUpdateFactor', 40)
+        if not repeat >= 1:
+            raise ValueError(f"actionRepeat must be >= 1 or 'server', got {repeat!r}")
+        self.action_repeat = repeat
+        self._tick_phase = 0.0
+        # 分裂后不能合并的 tick 数
+        self.merge_ticks = int(self.config.get('mergeTime', 15) * SERVER_TICK_RATE)
           
         # 随机数生成器  
         self.rng = np.random.RandomState()
-        self.observation_space = spaces.Box(low=-1, high=1, shape=(22,), dtype=np.float32)
+        # 观察编码器（k 近邻或栅格，见 observation.make_encoder）
+        self.encoder = make_encoder(self.config)
+        self.observation_space = spaces.Box(low=-1, high=1, shape=(self.encoder.size,), dtype=np.float32)
         self.action_space = spaces.Box(low=np.array([-1, -1, 0, 0]), high=np.array([1, 1, 1, 1]), dtype=np.float32)
+
+    def seed(self, seed=None):
+        """设置随机种子"""
+        self.rng = np.random.RandomState(seed)
+        return [seed]
+
+    def enable_profiling(self, profiler=None):
+        """开启分阶段计时，返回 StepProfiler
+
+        开启后每步的 info['profile'] 包含各阶段耗时和实体、碰撞检查计数，
+        profiler.summary() / histograms() / export() 汇总所有步。
+        """
+        self.profiler = profiler or StepProfiler()
+        return self.profiler
+
+    def disable_profiling(self):
+        """关闭分阶段计时"""
+        self.profiler = None
       
     def reset(self):  
         """重置环境"""  
-        self.food = []  
-        self.viruses = []  
-        self.players = []  
-        self.mass_food = []  
+        self._tick_phase = 0.0
+        if self.curriculum is not None:
+            if self.steps > 0:
+                # 上一局的表现
+                self.curriculum.record(self.total_reward)
+            self.curriculum.apply(self)
+        if self._start_pool:
+            state, indices = self._start_pool[self.rng.randint(len(self._start_pool))]
+            self.set_state(state, restore_rng=False, indices=indices)
+            if self.league is not None:
+                self.league.assign(self)
+            return self._get_observation()
+        self._clear_entities()
+        self.agent_player = None
           
         # 初始化食物  
         self._init_food(self.config['maxFood'])  
@@ -193,24 +718,205 @@ class AgarEnvironment(gym.Env):
         self._init_viruses(self.config['maxViruses'])  
           
         # 初始化其他玩家（简单AI）  
-        self._init_other_players(3)  # 5个其他玩家  
+        self._init_other_players(self.config.get('botCount', 3))  
           
         # 初始化AI控制的玩家  
         spawn_point = self._generate_spawn_point()  
-        self.agent_player = Player(  
-            'agent',  
-            'AI Agent',  
-            spawn_point['x'],  
-            spawn_point['y'],  
-            self.config['defaultPlayerMass']  
-        )  
+        self.agent_player = self._new_player('agent', 'AI Agent', spawn_point)
           
         self.steps = 0  
         self.total_reward = 0  
+        if self.league is not None:
+            self.league.assign(self)
           
         # 返回初始观察  
         return self._get_observation()  
       
+    def set_start_pool(self, size):
+        """预先生成 size 个初始局面，之后 reset() 用本环境的随机数从中选一个恢复
+
+        恢复时不还原随机数状态，各局的后续随机性仍然不同。空间索引也随局面缓存，
+        恢复时复制而不是重建。size 为 0 时关闭。
+        """
+        self._start_pool = []
+        self._start_pool = self.generate_layouts(size)
+
+    def generate_layouts(self, size):
+        """用当前配置生成 size 个初始局面 [(快照, (食物索引, 病毒索引))]，numpy 后端的食物索引为 None
+
+        生成时暂停初始局面池和课程调度，结束后恢复；环境停在最后一个局面上。
+        """
+        pool, curriculum = self._start_pool, self.curriculum
+        self._start_pool, self.curriculum = [], None
+        layouts = []
+        try:
+            for _ in range(size):
+                self.reset()
+                food_index = self.food_index.copy() if self.food_index is not None else None
+                layouts.append((self.get_state(), (food_index, self.virus_index.copy())))
+        finally:
+            self._start_pool, self.curriculum = pool, curriculum
+        return layouts
+
+    def apply_scenario(self, name, config, layouts=None):
+        """切换到场景 name：使用配置 config，reset 从 layouts（共享的预生成局面）中选取
+
+        layouts 也可以是 scenarios.LayoutCache：切换配置后从中取该场景的局面，
+        缓存未命中时用本环境（已是新配置）生成。
+        从下一次 reset 起生效。config 只应改变地图和对手相关的键
+        （见 scenarios.SCENARIO_KEYS），其余键须与共享 World 的其他环境一致。
+        """
+        self.scenario = name
+        self.config = config
+        self._start_pool = []
+        if hasattr(layouts, 'layouts'):
+            layouts = layouts.layouts(name, self)
+        self._start_pool = layouts or []
+
+    def set_curriculum(self, curriculum):
+        """每次 reset 时向 curriculum 报告上一局的总奖励，并按其当前难度切换场景；None 时关闭"""
+        self.curriculum = curriculum
+
+    def set_league(self, league):
+        """每次 reset 时由 league 为机器人分配对手策略，之后每个 tick 由策略控制；None 时关闭
+
+        从下一次 reset 起生效。
+        """
+        self.league = league
+
+    def get_state(self):
+        """完整环境状态的快照：由 numpy 数组组成的 dict（与后端无关）
+
+        包括食物、病毒、射出质量、所有玩家和细胞、步数计数和随机数状态；
+        数组都是副本，之后修改环境不影响快照。可用 pack_state 序列化。
+        """
+        players = [self.agent_player] + self.players
+        if self.world is not None:
+            a = self.arena
+            food, viruses, mass_food, cells = (
+                self.world.food, self.world.viruses, self.world.mass_food, self.world.cells
+            )
+            nf, nv, nm = int(food.n_used[a]), int(viruses.n_used[a]), int(mass_food.n_used[a])
+            food_rows = np.stack([food.x[a, :nf], food.y[a, :nf], food.mass[a, :nf]], axis=1)
+            food_uid = food.uid[a, :nf].copy()
+            virus_rows = np.stack([viruses.x[a, :nv], viruses.y[a, :nv], viruses.mass[a, :nv]], axis=1)
+            virus_uid = viruses.uid[a, :nv].copy()
+            mass_rows = np.stack([
+                mass_food.x[a, :nm], mass_food.y[a, :nm], mass_food.mass[a, :nm],
+                mass_food.dir_x[a, :nm], mass_food.dir_y[a, :nm], mass_food.speed[a, :nm],
+                np.zeros(nm), mass_food.num[a, :nm]
+            ], axis=1)
+            slots, _ = cell_slots(players)
+            cell_rows = np.stack([
+                cells.x[a, slots], cells.y[a, slots], cells.mass[a, slots], cells.radius[a, slots], cells.boost[a, slots]
+            ], axis=1)
+        else:
+            food_rows = np.array([(f.x, f.y, f.mass) for f in self.food], dtype=np.float64).reshape(-1, 3)
+            food_uid = np.array([f.uid for f in self.food], dtype=np.int64)
+            virus_rows = np.array([(v.x, v.y, v.mass) for v in self.viruses], dtype=np.float64).reshape(-1, 3)
+            virus_uid = np.array([v.uid for v in self.viruses], dtype=np.int64)
+            mass_rows = np.array([
+                (m['x'], m['y'], m['mass'], m['direction']['x'], m['direction']['y'], m['speed'], 0, m['num'])
+                for m in self.mass_food
+            ], dtype=np.float64).reshape(-1, 8)
+            cell_rows = np.array([
+                (c.x, c.y, c.mass, c.radius, c.boost) for p in players for c in p.cells
+            ], dtype=np.float64).reshape(-1, 5)
+        # 射出者保存为在 players 中的下标（已出局为 -1）
+        mass_rows[:, 6] = self._mass_food_arrays(players)[-1]
+        _, keys, pos, has_gauss, cached_gaussian = self.rng.get_state()
+        return {
+            'food': food_rows,
+            'food_uid': food_uid,
+            'viruses': virus_rows,
+            'virus_uid': virus_uid,
+            'mass_food': mass_rows,
+            'cells': cell_rows,
+            'cell_counts': np.array([len(p.cells) for p in players], dtype=np.int64),
+            'players': np.array([
+                (p.x, p.y, p.target['x'], p.target['y'], p.massTotal, p.hue, p.merge_timer) for p in players
+            ], dtype=np.float64),
+            'player_ids': np.array([p.id for p in players]),
+            'player_names': np.array([p.name for p in players]),
+            'counters': np.array([self.steps, self.max_steps, self._next_uid], dtype=np.int64),
+            'total_reward': np.array(self.total_reward, dtype=np.float64),
+            'tick_phase': np.array(self._tick_phase, dtype=np.float64),
+            'rng_keys': keys.copy(),
+            'rng_extra': np.array([pos, has_gauss, cached_gaussian], dtype=np.float64),
+        }
+
+    def set_state(self, state, restore_rng=True, indices=None):
+        """恢复 get_state() 得到的快照（可以来自另一个后端或另一个环境）
+
+        restore_rng: 为 False 时保留当前随机数状态。
+        indices: 与快照对应的 (食物索引, 病毒索引)，给出时复制使用，否则根据实体位置重建。
+        """
+        self._clear_entities()
+        food, food_uid = state['food'], state['food_uid']
+        viruses, virus_uid = state['viruses'], state['virus_uid']
+        if self.world is not None:
+            a = self.arena
+            if len(food):
+                self.world.food.append(a, x=food[:, 0], y=food[:, 1], mass=food[:, 2], radius=4, uid=food_uid)
+            if len(viruses):
+                self.world.viruses.append(
+                    a, x=viruses[:, 0], y=viruses[:, 1], mass=viruses[:, 2],
+                    radius=4 + np.sqrt(viruses[:, 2]) * 6, uid=virus_uid
+                )
+        else:
+            self._set_food_xy(0, food[:, 0], food[:, 1])
+            for slot, ((fx, fy, mass), uid) in enumerate(zip(food.tolist(), food_uid.tolist())):
+                item = self._food_free.pop() if self._food_free else Food(0, 0)
+                item.x, item.y, item.mass, item.uid, item.slot = fx, fy, mass, uid, slot
+                self.food.append(item)
+                self._food_by_uid[uid] = item
+            for (vx, vy, mass), uid in zip(viruses.tolist(), virus_uid.tolist()):
+                self.viruses.append(Virus(vx, vy, mass, uid))
+        mass_rows = state['mass_food']
+        if mass_rows.shape[1] == 5:
+            # 旧快照的射出质量没有速度和射出者
+            mass_rows = np.concatenate([mass_rows, np.tile([0.0, -1.0, 0.0], (len(mass_rows), 1))], axis=1)
+        player_ids = [str(pid) for pid in state['player_ids']]
+        for mx, my, mass, dx, dy, speed, owner, num in mass_rows.tolist():
+            self.mass_food.append({
+                'id': player_ids[int(owner)] if owner >= 0 else None,
+                'num': int(num),
+                'x': mx,
+                'y': my,
+                'mass': mass,
+                'radius': 4 + math.sqrt(mass) * 6,
+                'speed': speed,
+                'direction': {'x': dx, 'y': dy},
+            })
+        if self.food_index is not None:
+            if indices is not None and indices[0] is not None:
+                self.food_index = indices[0].copy()
+            else:
+                self.food_index.insert_many(food_uid.tolist(), food[:, 0], food[:, 1])
+        if indices is not None:
+            self.virus_index = indices[1].copy()
+        else:
+            self.virus_index.insert_many(virus_uid.tolist(), viruses[:, 0], viruses[:, 1])
+
+        cells = state['cells'].tolist()
+        bounds = np.concatenate([[0], np.cumsum(state['cell_counts'])]).tolist()
+        players = [
+            Player.restore(str(pid), str(name), row, cells[lo:hi], self.world, self.arena)
+            for pid, name, row, lo, hi in zip(
+                state['player_ids'], state['player_names'], state['players'].tolist(), bounds[:-1], bounds[1:]
+            )
+        ]
+        self.agent_player = players[0]
+        self.players = players[1:]
+
+        self.steps, self.max_steps, self._next_uid = state['counters'].tolist()
+        self.total_reward = float(state['total_reward'])
+        # 旧快照没有 tick_phase
+        self._tick_phase = float(state['tick_phase']) if 'tick_phase' in state else 0.0
+        if restore_rng:
+            pos, has_gauss, cached_gaussian = state['rng_extra'].tolist()
+            self.rng.set_state(('MT19937', state['rng_keys'], int(pos), int(has_gauss), cached_gaussian))
+
     def step(self, action):  
         """执行一步环境交互  
           
@@ -220,86 +926,150 @@ class AgarEnvironment(gym.Env):
                 split: 是否分裂 (0或1)  
                 eject: 是否射出质量 (0或1)  
           
+        一次决策运行 action_repeat 个物理 tick：目标在每个 tick 重新应用，
+        分裂和射出质量只在第一个 tick 执行；奖励累加，中间 tick 不计算观察，
+        提前结束时不再运行剩余的 tick。
+
         返回:  
             observation: 观察状态  
             reward: 奖励  
             done: 是否结束  
             info: 额外信息  
         """  
+        prof = self.profiler
+        if prof is not None:
+            prof.start()
+        reward = 0.0
+        for tick in range(self._ticks_for_step()):
+            prev_mass = self._apply_action(action if tick == 0 else _repeat_action(action))
+            if prof is not None:
+                prof.lap('action')
+
+            # 更新所有实体  
+            may_eat = self._update_all_entities()  
+            if prof is not None:
+                prof.lap('update')
+
+            tick_reward, done = self._end_tick(prev_mass, may_eat)
+            reward += tick_reward
+            if done:
+                break
+
+        obs = self._get_observation()
+        if prof is not None:
+            prof.lap('observation')
+        return obs, reward, done, self._step_info()
+
+    def _ticks_for_step(self):
+        """本次决策运行的 tick 数
+
+        action_repeat 为小数时用累加器交替取整，例如与服务器一致的 1.5 依次为 1, 2, 1, 2...
+        累加结果舍入到 1e-9，避免 2.4 这类不能精确表示的小数累积误差少算一个 tick。
+        """
+        phase = round(self._tick_phase + self.action_repeat, 9)
+        ticks = int(phase)
+        self._tick_phase = phase - ticks
+        return ticks
+
+    def _apply_action(self, action, rule_action=None):
+        """step 的第一阶段：解析动作、分裂和射出质量，返回动作前的质量
+
+        rule_action: 预先算好的规则动作（批量环境使用），为 None 时现算。
+        """
         self.steps += 1  
-        if self.steps < 2000:
-            action = self._rule_based_action()
-        # 解析动作  
-        target_x_rel, target_y_rel, split, eject = action  
+        if self.steps < self.config.get('ruleSteps', 2000):
+            action = rule_action if rule_action is not None else self._rule_based_action()
+        # 记录之前的质量（射出的质量计入本步的质量变化）
+        prev_mass = self.agent_player.massTotal
+        self._control(self.agent_player, action)
+        return prev_mass
+
+    def _control(self, player, action):
+        """让 player 执行动作 [target_x, target_y, split, eject]（智能体和联赛机器人共用）"""
+        # 解析动作（转成 Python float，float32 动作不把坐标降为 float32）  
+        target_x_rel, target_y_rel, split, eject = map(float, action)  
           
         # 将相对坐标转换为绝对坐标  
         view_distance = 1000  # 视野范围  
-        target_x = self.agent_player.x + target_x_rel * view_distance  
-        target_y = self.agent_player.y + target_y_rel * view_distance  
+        target_x = player.x + target_x_rel * view_distance  
+        target_y = player.y + target_y_rel * view_distance  
           
         # 更新玩家目标  
-        self.agent_player.target = {'x': target_x, 'y': target_y}  
-          
+        player.target = {'x': target_x, 'y': target_y}  
+
         # 处理分裂  
         if split > 0.5:  # 二值化  
-            self.agent_player.split(  
+            player.split(  
                 self.config['limitSplit'],  
-                self.config['defaultPlayerMass']  
+                self.config['defaultPlayerMass'],  
+                self.merge_ticks  
             )  
           
-        # 处理射出质量  
-        ejected_mass = None  
+        # 处理射出质量（池满时不再射出）
         if eject > 0.5:  # 二值化  
-            ejected_mass = self.agent_player.eject_mass(self.config['fireFood'])  
-            if ejected_mass:  
-                self.mass_food.append(ejected_mass)  
-          
-        # 记录之前的质量  
-        prev_mass = self.agent_player.massTotal  
-          
-        # 更新所有实体  
-        self._update_all_entities()  
-          
+            ejected = player.eject_mass(
+                self.config['fireFood'],
+                self.config['defaultPlayerMass'],
+                self.config.get('maxMassFood', 256) - len(self.mass_food)
+            )
+            for mass_food in ejected:
+                self.mass_food.append(mass_food)
+
+    def _end_tick(self, prev_mass, may_eat=None, players=None):
+        """一个 tick 的最后阶段：碰撞、奖励和结束判断，返回 (reward, done)
+
+        may_eat: 本竞技场可能吃到食物的细胞掩码（numpy 后端，见 food_contact_arrays）。
+        players: 给出时为计算奖励的玩家列表（多智能体接口），prev_mass 为它们动作前的质量列表，
+                 reward 为对应的奖励列表，不计入 total_reward。
+        开启计时时，调用方在此之前已调用 profiler.start() 或记录了前面的阶段。
+        """
+        prof = self.profiler
+        if prof is not None:
+            prof.count('food', len(self.food))
+            prof.count('viruses', len(self.viruses))
+            prof.count('players', 1 + len(self.players))
+            prof.count('cells', sum(len(p.cells) for p in [self.agent_player] + self.players))
+
         # 检查碰撞  
-        self._check_collisions()  
+        self._check_collisions(may_eat)  
+        if self.debug_mass:
+            for player in [self.agent_player] + self.players:
+                player.verify_mass()
           
         # 计算奖励  
-        reward = self._calculate_reward(prev_mass)  
-        self.total_reward += reward  
+        if players is not None:
+            reward = [self._calculate_reward(mass, player) for player, mass in zip(players, prev_mass)]
+        else:
+            reward = self._calculate_reward(prev_mass)  
+            self.total_reward += reward  
           
         # 检查游戏是否结束  
         done = self._is_done()  
-                
-        target_x_rel = float(np.clip(target_x_rel, -1, 1))
-        target_y_rel = float(np.clip(target_y_rel, -1, 1))
-        split = 1 if split > 0.5 else 0
-        eject = 1 if eject > 0.5 else 0
+        if prof is not None:
+            prof.lap('reward')
+        return reward, done
 
-        # 返回观察、奖励、是否结束、额外信息  
-        return self._get_observation(), reward, done, {  
+    def _step_info(self):
+        """一次决策结束时的额外信息；开启计时时结束本步的计时"""
+        info = {  
             'steps': self.steps,  
             'total_reward': self.total_reward,  
             'player_mass': self.agent_player.massTotal  
-        }  
+        }
+        if self.profiler is not None:
+            info['profile'] = self.profiler.finish()
+        return info
       
     def _rule_based_action(self):
         """模仿 JavaScript bot 的简单策略，返回动作向量 [dx, dy, split, eject]"""
-        player = self.agent_player
-        food_list = self.food
-        enemies = self.players
-
-        # 寻找最近食物
-        nearest_food = None
-        min_dist = float('inf')
-        for food in food_list:
-            dist = math.sqrt((player.x - food.x)**2 + (player.y - food.y)**2)
-            if dist < min_dist:
-                min_dist = dist
-                nearest_food = food
+        return self._chase_action(self._nearest_food(self.agent_player))
 
+    def _chase_action(self, nearest_food):
+        """朝最近食物移动的动作，没有食物时不动"""
+        player = self.agent_player
         if nearest_food:
-            dx = nearest_food.x - player.x
-            dy = nearest_food.y - player.y
+            dx = nearest_food['x'] - player.x
+            dy = nearest_food['y'] - player.y
             norm = math.sqrt(dx**2 + dy**2) + 1e-6
             return [dx / norm, dy / norm, 0.0, 0.0]
 
@@ -308,48 +1078,202 @@ class AgarEnvironment(gym.Env):
 
 
     def render(self, mode='human'):  
-        """渲染当前环境状态"""  
-        # 这里可以实现简单的可视化  
-        # 如果需要GUI，可以使用pygame等库  
+        """渲染当前环境状态
+
+        'human' 打印一行文字；'rgb_array' 返回 (H, W, 3) 的 uint8 帧（见 render.Rasterizer），
+        光栅化器按 renderSize / renderView / renderSupersample 配置创建，也可以直接设置 self.renderer。
+        """  
+        if mode == 'rgb_array':
+            if self.renderer is None:
+                from render import Rasterizer
+
+                self.renderer = Rasterizer(
+                    self.config, size=self.config.get('renderSize', 128),
+                    view=self.config.get('renderView'), supersample=self.config.get('renderSupersample', 1)
+                )
+            return self.renderer.render(self)
+        if mode != 'human':
+            raise ValueError(f"Unknown render mode: {mode}")
         print(f"Step: {self.steps}, Mass: {self.agent_player.massTotal}, Reward: {self.total_reward}")  
       
+    def _clear_entities(self):
+        """清空所有游戏实体"""
+        self.players = []
+        if self.food_index is not None:
+            self.food_index.clear()
+        self.virus_index.clear()
+        if self.world is None:
+            # 固定容量的食物池：self.food 是存活食物（swap-remove 保持紧凑），
+            # 被吃掉的 Food 对象进入空闲列表，重新生成时复用；
+            # _food_xy 的前 len(self.food) 行是按槽位排列的食物坐标（批量最近邻查询用）
+            free = getattr(self, '_food_free', None)
+            if free is None:
+                free = [Food(0, 0, self.config['foodMass']) for _ in range(self.config['maxFood'])]
+                self._food_xy = np.zeros((self.config['maxFood'], 2))
+            else:
+                free.extend(self.food)
+            self._food_free = free
+            self._food_by_uid = {}
+            self.food = []
+            self.viruses = []
+            self.mass_food = []
+            return
+        self.world.clear(self.arena)
+        self.food = EntityList(self.world.food, self.arena, FoodView)
+        self.viruses = EntityList(self.world.viruses, self.arena, VirusView)
+        self.mass_food = MassFoodList(self.world.mass_food, self.arena, self.world)
+
+    def _new_player(self, player_id, name, spawn_point, mass=None):
+        """在出生点创建玩家，mass 默认为 defaultPlayerMass"""
+        return Player(
+            player_id,
+            name,
+            spawn_point['x'],
+            spawn_point['y'],
+            mass or self.config['defaultPlayerMass'],
+            world=self.world,
+            arena=self.arena
+        )
+
+    def _new_uids(self, count):
+        """分配 count 个递增的实体编号"""
+        start = self._next_uid
+        self._next_uid += count
+        return range(start, start + count)
+
+    def _spawn_arrays(self, store, index, count, mass, radius, x=None, y=None):
+        """批量生成实体；未给出位置时一次随机数调用抽取，与逐个 uniform(0, W), uniform(0, H) 的序列一致
+
+        index 为要同步的空间索引，None 时不维护。
+        """
+        if x is None:
+            x, y = spawn_positions(self.rng, count, self.config['gameWidth'], self.config['gameHeight'])
+        uids = self._new_uids(count)
+        store.append(
+            self.arena,
+            x=x,
+            y=y,
+            mass=mass,
+            radius=radius,
+            uid=np.asarray(uids),
+        )
+        if index is not None:
+            index.insert_many(uids, x.tolist(), y.tolist())
+
     def _init_food(self, count):  
-        """初始化食物"""  
-        for _ in range(count):  
-            x = self.rng.uniform(0, self.config['gameWidth'])  
-            y = self.rng.uniform(0, self.config['gameHeight'])  
-            self.food.append(Food(x, y, self.config['foodMass']))  
+        """生成食物，池满时多余的部分忽略；所有位置一次随机数调用抽取"""  
+        count = min(count, self.config['maxFood'] - len(self.food))
+        if count <= 0:
+            return
+        width, height = self.config['gameWidth'], self.config['gameHeight']
+        if self.config.get('foodClusters'):
+            x, y = density_positions(
+                self.rng, count, width, height, self.config['foodClusters'], self.config.get('foodBackground', 0.2)
+            )
+        else:
+            nearest_dist = None
+            if self.config.get('foodUniformDisposition') and len(self.food) > 0:
+                nearest_dist = self._food_distance
+            x, y = spawn_positions(self.rng, count, width, height, nearest_dist)
+        if self.world is not None:
+            self._spawn_arrays(self.world.food, None, count, self.config['foodMass'], 4, x, y)
+            return
+        self._set_food_xy(len(self.food), x, y)
+        for uid, fx, fy in zip(self._new_uids(count), x.tolist(), y.tolist()):  
+            # 场景可能把 maxFood 调大，空闲对象不够时新建
+            food = self._food_free.pop() if self._food_free else Food(0, 0)
+            food.x = fx
+            food.y = fy
+            food.mass = self.config['foodMass']
+            food.uid = uid
+            food.slot = len(self.food)
+            self.food.append(food)  
+            self._food_by_uid[uid] = food
+            self.food_index.insert(uid, fx, fy)
+
+    def _set_food_xy(self, start, x, y):
+        """写入从槽位 start 开始的食物坐标（object 后端），容量不够时扩大"""
+        end = start + len(x)
+        if end > len(self._food_xy):
+            grown = np.zeros((max(end, 2 * len(self._food_xy)), 2))
+            grown[:start] = self._food_xy[:start]
+            self._food_xy = grown
+        self._food_xy[start:end, 0] = x
+        self._food_xy[start:end, 1] = y
+
+    def _food_distance(self, xs, ys):
+        """各点到最近食物的距离"""
+        if self.world is not None:
+            arenas = np.full(len(xs), self.arena, dtype=np.int64)
+            return nearest_distance(self.world.food, arenas, xs, ys)
+        return [self.food_index.nearest(x, y)[0][1] for x, y in zip(xs.tolist(), ys.tolist())]
+
+    def _remove_food(self, foods):
+        """从食物池中 swap-remove 若干 Food（object 后端），顺序与 EntityArrays.swap_remove 一致"""
+        for food in sorted(foods, key=lambda f: f.slot, reverse=True):
+            last = self.food.pop()
+            if last is not food:
+                self.food[food.slot] = last
+                last.slot = food.slot
+                self._food_xy[food.slot] = self._food_xy[len(self.food)]
+            del self._food_by_uid[food.uid]
+            self.food_index.remove(food.uid)
+            self._food_free.append(food)
       
     def _init_viruses(self, count):  
         """初始化病毒"""  
-        for _ in range(count):  
+        if self.world is not None:
+            if count > 0:
+                mass = self.config['virusMass']
+                self._spawn_arrays(self.world.viruses, self.virus_index, count, mass, 4 + math.sqrt(mass) * 6)
+            return
+        for uid in self._new_uids(count):  
             x = self.rng.uniform(0, self.config['gameWidth'])  
             y = self.rng.uniform(0, self.config['gameHeight'])  
-            self.viruses.append(Virus(x, y, self.config['virusMass']))  
+            self.viruses.append(Virus(x, y, self.config['virusMass'], uid))  
+            self.virus_index.insert(uid, x, y)
       
     def _init_other_players(self, count):  
         """初始化其他玩家"""  
+        mass = self.config['defaultPlayerMass'] * self.config.get('botMass', 1.0)
         for i in range(count):  
             spawn_point = self._generate_spawn_point()  
-            player = Player(  
-                f'bot_{i}',  
-                f'Bot {i}',  
-                spawn_point['x'],  
-                spawn_point['y'],  
-                self.config['defaultPlayerMass']  
-            )  
+            player = self._new_player(f'bot_{i}', f'Bot {i}', spawn_point, mass)
             self.players.append(player)  
       
     def _generate_spawn_point(self):  
-        """生成出生点"""  
-        # 简单实现：随机位置  
+        """生成出生点
+
+        newPlayerInitialPosition 为 'farthest' 且已有玩家时，与服务器 util.uniformPosition
+        的思路相同：抽取 10 个候选位置，取到最近玩家最远的一个；否则随机位置。
+        """  
         radius = 4 + math.sqrt(self.config['defaultPlayerMass']) * 6  
-        x = self.rng.uniform(radius, self.config['gameWidth'] - radius)  
-        y = self.rng.uniform(radius, self.config['gameHeight'] - radius)  
+        width, height = self.config['gameWidth'], self.config['gameHeight']
+        players = ([self.agent_player] if self.agent_player else []) + self.players
+        if self.config.get('newPlayerInitialPosition') == 'farthest' and players:
+            u = self.rng.random_sample((10, 2))
+            xs = radius + (width - 2 * radius) * u[:, 0]
+            ys = radius + (height - 2 * radius) * u[:, 1]
+            px = np.array([p.x for p in players])
+            py = np.array([p.y for p in players])
+            dist = np.min((xs[:, None] - px[None, :]) ** 2 + (ys[:, None] - py[None, :]) ** 2, axis=1)
+            best = int(np.argmax(dist))
+            return {'x': float(xs[best]), 'y': float(ys[best])}
+        x = self.rng.uniform(radius, width - radius)  
+        y = self.rng.uniform(radius, height - radius)  
         return {'x': x, 'y': y}  
       
     def _update_all_entities(self):  
         """更新所有实体"""  
+        if self.world is not None:
+            return self._update_all_entities_arrays()
+        # 先根据移动前的局面批量决定所有机器人的目标，联赛策略控制的机器人再覆盖
+        update_bot_targets([self])
+        apply_leagues([self])
+
+        # 同一玩家细胞的合并和推开，之后再移动
+        self._resolve_own_cells()
+
         # 更新AI控制的玩家  
         self.agent_player.move(  
             self.config['slowBase'],  
@@ -357,28 +1281,8 @@ class AgarEnvironment(gym.Env):
             self.config['gameHeight']  
         )  
           
-        # 更新其他玩家（简单AI行为）  
+        # 更新其他玩家  
         for player in self.players:  
-            # 简单AI：随机移动或追逐食物  
-            if self.rng.random() < 0.05:  # 5%概率随机移动  
-                player.target = {  
-                    'x': self.rng.uniform(0, self.config['gameWidth']),  
-                    'y': self.rng.uniform(0, self.config['gameHeight'])  
-                }  
-            else:  
-                # 找到最近的食物  
-                closest_food = None  
-                min_dist = float('inf')  
-                for food in self.food:  
-                    dist = math.sqrt((player.x - food.x)**2 + (player.y - food.y)**2)  
-                    if dist < min_dist:  
-                        min_dist = dist  
-                        closest_food = food  
-                  
-                if closest_food:  
-                    player.target = {'x': closest_food.x, 'y': closest_food.y}  
-              
-            # 移动玩家  
             player.move(  
                 self.config['slowBase'],  
                 self.config['gameWidth'],  
@@ -389,94 +1293,382 @@ class AgarEnvironment(gym.Env):
             for cell in player.cells:  
                 if cell.mass > self.config['defaultPlayerMass'] * 1.1:  # 只有当质量足够大时才衰减  
                     decay = cell.mass * mass_decay_rate  
-                    cell.mass -= decay  
-                    cell.radius = player._mass_to_radius(cell.mass)  
-            player.massTotal = sum(cell.mass for cell in player.cells)
+                    player.set_cell_mass(cell, cell.mass - decay)
+
+        # 移动射出质量（与 move_mass_food 逐位一致）
+        width, height = self.config['gameWidth'], self.config['gameHeight']
+        for mass_food in self.mass_food:
+            speed = mass_food['speed']
+            if speed <= 0:
+                continue
+            border = mass_food['radius'] + 5
+            direction = mass_food['direction']
+            mass_food['x'] = max(border, min(width - border, mass_food['x'] + speed * direction['x']))
+            mass_food['y'] = max(border, min(height - border, mass_food['y'] + speed * direction['y']))
+            mass_food['speed'] = max(speed - 0.5, 0.0)
       
-    def _check_collisions(self):  
+    def _resolve_own_cells(self):
+        """所有玩家细胞之间的合并和推开（object 后端，与 resolve_own_cells_arrays 逐位一致）"""
+        players = [self.agent_player] + self.players
+        cells = [cell for player in players for cell in player.cells]
+        bounds = np.concatenate([[0], np.cumsum([len(p.cells) for p in players])]).tolist()
+        x = np.array([cell.x for cell in cells])
+        y = np.array([cell.y for cell in cells])
+        radius = np.array([cell.radius for cell in cells])
+        width, height = self.config['gameWidth'], self.config['gameHeight']
+        dx, dy, merges = own_cell_interactions(x, y, radius, bounds, _tick_merge_timers(players))
+        pushed = ((dx != 0) | (dy != 0)).tolist()
+        new_x = np.maximum(radius, np.minimum(width - radius, x + dx)).tolist()
+        new_y = np.maximum(radius, np.minimum(height - radius, y + dy)).tolist()
+        for cell, moved, cx, cy in zip(cells, pushed, new_x, new_y):
+            if moved:
+                cell.x = cx
+                cell.y = cy
+        _merge_own_cells(players, cells, bounds, merges)
+
+    def _update_all_entities_arrays(self):
+        """_update_all_entities 的向量化实现（numpy 后端）"""
+        # 先根据移动前的局面批量决定机器人目标，再统一移动
+        update_bot_targets([self])
+        apply_leagues([self])
+        arenas, slots = move_and_decay_arrays([self])
+        move_mass_food_arrays([self])
+        return food_contact_arrays(self.world, arenas, slots)[self.arena]
+
+    def _check_collisions(self, may_eat=None):  
         """检查碰撞"""  
+        prof = self.profiler
         # 检查AI玩家与食物的碰撞  
-        self._check_player_food_collision(self.agent_player)  
+        self._check_player_food_collision(self.agent_player, may_eat)  
           
         # 检查其他玩家与食物的碰撞  
         for player in self.players:  
-            self._check_player_food_collision(player)  
+            self._check_player_food_collision(player, may_eat)  
+        if prof is not None:
+            prof.lap('food_collision')
+
+        # 射出质量：被细胞吃掉，或喂给病毒
+        self._check_mass_food_collision()
+        self._feed_viruses()
+        if prof is not None:
+            prof.lap('mass_food')
           
         # 检查玩家之间的碰撞  
         self._check_players_collision()  
+        if prof is not None:
+            prof.lap('player_collision')
           
-        # 检查玩家与病毒的碰撞  
-        self._check_player_virus_collision(self.agent_player)  
-        for player in self.players:  
+        # 检查玩家与病毒的碰撞；每个玩家检查后，病毒数量低于最大值时有一定概率生成新病毒
+        for player in [self.agent_player] + self.players:
             self._check_player_virus_collision(player)
+            if len(self.viruses) < self.config['maxViruses'] and self.rng.random() < 0.1:
+                self._init_viruses(1)
+        if prof is not None:
+            prof.lap('virus_collision')
+
         # 添加食物再生逻辑  
         food_deficit = self.config['maxFood'] - len(self.food)  
         if food_deficit > 0:  
             self._init_food(min(food_deficit, 10))  # 每步最多生成10个新食物
+        if prof is not None:
+            prof.lap('respawn')
       
-    def _check_player_food_collision(self, player):  
+    def _nearest_food(self, player):
+        """距离玩家最近的食物位置 {'x', 'y'}，没有食物时返回 None"""
+        if self.world is not None:
+            return nearest_food_arrays([self], [player])[0]
+        hits = self.food_index.nearest(player.x, player.y)
+        if not hits:
+            return None
+        x, y = self.food_index.position(hits[0][0])
+        return {'x': x, 'y': y}
+
+    def _food_candidates(self, cell, food_mass):
+        """可能被 cell 吃掉的食物 uid（按生成顺序）
+
+        吃食物会让半径增长，因此用 "细胞质量 + 候选食物总质量" 对应的半径
+        作为查询半径的上界，反复扩大直到候选集合不再变化。
+        food_mass(uids) 返回这些食物的总质量。
+        """
+        bound = cell.radius
+        while True:
+            uids = [uid for uid, _ in self.food_index.query_radius(cell.x, cell.y, bound)]
+            new_bound = 4 + math.sqrt(cell.mass + food_mass(uids)) * 6
+            if new_bound <= bound:
+                return uids
+            bound = new_bound + 1e-9
+
+    def _check_player_food_collision(self, player, may_eat=None):  
         """检查玩家与食物的碰撞"""  
+        if self.world is not None:
+            return self._check_player_food_collision_arrays(player, may_eat)
+        food_by_uid = self._food_by_uid
+        food_mass = lambda uids: sum(food_by_uid[uid].mass for uid in uids)
         for cell in player.cells:  
-            food_to_remove = []  
-            for i, food in enumerate(self.food):  
+            food_to_remove = set()  
+            mass = cell.mass
+            radius = cell.radius
+            candidates = self._food_candidates(cell, food_mass)
+            if self.profiler is not None:
+                self.profiler.count('food_checks', len(candidates))
+            for uid in candidates:  
+                food = food_by_uid[uid]
                 dist = math.sqrt((cell.x - food.x)**2 + (cell.y - food.y)**2)  
-                if dist < cell.radius:  # 碰撞  
-                    cell.mass += food.mass  
-                    cell.radius = player._mass_to_radius(cell.mass)  
-                    food_to_remove.append(i)  
+                if dist < radius:  # 碰撞  
+                    mass += food.mass  
+                    radius = player._mass_to_radius(mass)  
+                    food_to_remove.add(uid)  
             
-            # 移除被吃掉的食物  
-            for i in sorted(food_to_remove, reverse=True):  
-                self.food.pop(i)  
-            
-            # 更新玩家总质量  
-            player.massTotal = sum(cell.mass for cell in player.cells)  
+            # 移除被吃掉的食物，并一次性更新细胞和玩家质量
+            if food_to_remove:
+                player.set_cell_mass(cell, mass)
+                self._remove_food([food_by_uid[uid] for uid in food_to_remove])
 
-    def _check_players_collision(self):
-        """检查玩家之间的碰撞"""
-        cells_to_remove = []  # 延迟删除列表
+    def _check_player_food_collision_arrays(self, player, may_eat=None):
+        """_check_player_food_collision 的向量化实现（numpy 后端）"""
+        if not player.cells:
+            return
+        food = self.world.food
+        cells = self.world.cells
+        arena = self.arena
+        slots, _ = cell_slots([player])
+        eaters = slots if may_eat is None else slots[may_eat[slots]]
+        for slot in eaters.tolist():
+            # 候选食物由 eat_food 在整行数组上向量化筛选，比逐格查询空间索引更快
+            n = food.n_used[arena]
+            if self.profiler is not None:
+                self.profiler.count('food_checks', int(n))
+            old_mass = float(cells.mass[arena, slot])
+            eaten, mass, radius = eat_food(
+                float(cells.x[arena, slot]),
+                float(cells.y[arena, slot]),
+                old_mass,
+                float(cells.radius[arena, slot]),
+                food.x[arena, :n], food.y[arena, :n], food.mass[arena, :n],
+                order=food.uid[arena, :n]
+            )
+            if eaten:
+                # 等价于 Player.set_cell_mass
+                cells.mass[arena, slot] = mass
+                cells.radius[arena, slot] = radius
+                player.massTotal += mass - old_mass
+                food.swap_remove(arena, eaten)
 
-        for i, player1 in enumerate(self.players + [self.agent_player]):
-            for j, player2 in enumerate(self.players + [self.agent_player]):
-                if i == j:
-                    continue
+    def _viruses_near(self, cells):
+        """可能让 cells 中某个细胞被病毒分裂的病毒在病毒列表中的下标（升序，用病毒索引查询）
+
+        病毒质量在 virusMass 和 virusSplitMass 之间（见 _feed_viruses），
+        用最小质量和最大半径做保守筛选。病毒列表按 uid 升序排列（按生成顺序追加，
+        删除时保持顺序），因此 uid 可以二分查找到下标。
+        """
+        virus_mass = self.config['virusMass']
+        virus_radius = 4 + math.sqrt(max(virus_mass, self.config.get('virusSplitMass', 180))) * 6
+        uids = set()
+        for cell in cells:
+            if cell.mass <= virus_mass or cell.mass / self.config['defaultPlayerMass'] < 2:
+                continue
+            uids.update(uid for uid, _ in self.virus_index.query_radius(cell.x, cell.y, cell.radius + virus_radius))
+        if not uids:
+            return []
+        uids = sorted(uids)
+        if self.world is not None:
+            store, a = self.world.viruses, self.arena
+            return np.searchsorted(store.uid[a, :int(store.n_used[a])], uids).tolist()
+        return [bisect.bisect_left(self.viruses, uid, key=attrgetter('uid')) for uid in uids]
+
+    def _mass_food_arrays(self, players):
+        """射出质量的 x, y, mass, speed, dir_x, dir_y, num 数组，以及射出者在 players 中的下标（不在时为 -1）"""
+        if self.world is not None:
+            store, a = self.world.mass_food, self.arena
+            n = int(store.n_used[a])
+            columns = [getattr(store, k)[a, :n] for k in ('x', 'y', 'mass', 'speed', 'dir_x', 'dir_y', 'num')]
+            index = {self.world.owner_handle(p.id): i for i, p in enumerate(players)}
+            keys = store.owner[a, :n].tolist()
+        else:
+            items = self.mass_food
+            columns = [np.array([m[k] for m in items], dtype=np.float64) for k in ('x', 'y', 'mass', 'speed')]
+            columns += [
+                np.array([m['direction'][k] for m in items], dtype=np.float64) for k in ('x', 'y')
+            ] + [np.array([m['num'] for m in items], dtype=np.int64)]
+            index = {p.id: i for i, p in enumerate(players)}
+            keys = [m['id'] for m in items]
+        owner = np.array([index.get(k, -1) for k in keys], dtype=np.int64)
+        return columns + [owner]
+
+    def _remove_mass_food(self, indices):
+        """删除第 indices 个射出质量，其余保持顺序"""
+        if self.world is not None:
+            self.world.mass_food.remove(self.arena, indices)
+            return
+        removed = set(indices)
+        self.mass_food = [m for i, m in enumerate(self.mass_food) if i not in removed]
 
-                for cell1 in player1.cells[:]:
-                    for cell2 in player2.cells[:]:
-                        dist = math.sqrt((cell1.x - cell2.x)**2 + (cell1.y - cell2.y)**2)
+    def _check_mass_food_collision(self):
+        """细胞吃射出质量（规则见 world.mass_food_eats），玩家按 AI 玩家、机器人的顺序结算"""
+        if not self.mass_food:
+            return
+        players = [self.agent_player] + self.players
+        cells = [cell for player in players for cell in player.cells]
+        if not cells:
+            return
+        owners = [player for player in players for _ in player.cells]
+        owner = np.repeat(np.arange(len(players)), [len(p.cells) for p in players])
+        index = np.concatenate([np.arange(len(p.cells)) for p in players])
+        if self.world is not None:
+            store = self.world.cells
+            slots, _ = cell_slots(players)
+            x, y = store.x[self.arena, slots], store.y[self.arena, slots]
+            radius, mass = store.radius[self.arena, slots], store.mass[self.arena, slots]
+        else:
+            x = np.array([cell.x for cell in cells])
+            y = np.array([cell.y for cell in cells])
+            radius = np.array([cell.radius for cell in cells])
+            mass = np.array([cell.mass for cell in cells])
 
-                        if dist < cell1.radius + cell2.radius:
-                            if cell1.mass > cell2.mass * 1.1:
-                                cell1.mass += cell2.mass
-                                cell1.radius = player1._mass_to_radius(cell1.mass)
-                                if cell2 in player2.cells:
-                                    player2.cells.remove(cell2)
+        fx, fy, fmass, fspeed, _, _, fnum, fowner = self._mass_food_arrays(players)
+        eater = mass_food_eats(x, y, radius, mass, owner, index, fx, fy, fmass, fspeed, fowner, fnum)
+        eaten = np.flatnonzero(eater >= 0).tolist()
+        if not eaten:
+            return
+        # 每个细胞吃到的质量按射出质量的顺序累加，再一次性加到细胞上
+        gained = {}
+        masses = fmass.tolist()
+        for j, e in zip(eaten, eater[eaten].tolist()):
+            gained[e] = gained.get(e, 0.0) + masses[j]
+        for e, gain in gained.items():
+            owners[e].set_cell_mass(cells[e], cells[e].mass + gain)
+        self._remove_mass_food(eaten)
 
-                                player1.massTotal = sum(c.mass for c in player1.cells)
-                                player2.massTotal = sum(c.mass for c in player2.cells)
+    def _feed_viruses(self):
+        """仍在运动的射出质量撞进病毒（中心在病毒圆内）时被病毒吸收
 
-                                if len(player2.cells) == 0 and player2 != self.agent_player:
-                                    self.players.remove(player2)
-                                break
+        候选射出质量在本阶段开始时确定，之后按顺序逐个结算：归第一个包含它的病毒，
+        病毒质量增加；达到 virusSplitMass 时病毒恢复 virusMass，并沿射出方向
+        分裂出一个新病毒（病毒已达 maxViruses 时不分裂，质量以 virusSplitMass 为上限）。
+        """
+        if not self.mass_food or not self.viruses:
+            return
+        fx, fy, fmass, fspeed, fdx, fdy, _, _ = self._mass_food_arrays([])
+        split_mass = self.config.get('virusSplitMass', 180)
+        base_mass = self.config['virusMass']
+        max_radius = 4 + math.sqrt(max(split_mass, base_mass)) * 6
+        vx, vy = self._virus_positions()
+        d2 = (fx[:, None] - vx[None, :]) ** 2 + (fy[:, None] - vy[None, :]) ** 2
+        candidates = np.flatnonzero((fspeed > 0) & (d2 <= max_radius * max_radius).any(axis=1))
+        absorbed = []
+        for j in candidates.tolist():
+            vx, vy = self._virus_positions()
+            d2 = ((fx[j] - vx) ** 2 + (fy[j] - vy) ** 2).tolist()
+            for i in np.flatnonzero(np.asarray(d2) <= max_radius * max_radius).tolist():
+                virus = self.viruses[i]
+                if d2[i] > virus.radius * virus.radius:
+                    continue
+                absorbed.append(j)
+                mass = virus.mass + float(fmass[j])
+                if mass >= split_mass and len(self.viruses) < self.config['maxViruses']:
+                    mass = base_mass
+                    radius = 4 + math.sqrt(base_mass) * 6
+                    width, height = self.config['gameWidth'], self.config['gameHeight']
+                    self._add_virus(
+                        max(0.0, min(width, virus.x + float(fdx[j]) * radius * 2)),
+                        max(0.0, min(height, virus.y + float(fdy[j]) * radius * 2))
+                    )
+                virus.mass = min(mass, split_mass)
+                virus.radius = 4 + math.sqrt(virus.mass) * 6
+                break
+        if absorbed:
+            self._remove_mass_food(absorbed)
+
+    def _virus_positions(self):
+        """所有病毒的 x, y 数组（按列表顺序）"""
+        if self.world is not None:
+            store, a = self.world.viruses, self.arena
+            n = int(store.n_used[a])
+            return store.x[a, :n], store.y[a, :n]
+        return (
+            np.array([v.x for v in self.viruses], dtype=np.float64),
+            np.array([v.y for v in self.viruses], dtype=np.float64),
+        )
+
+    def _add_virus(self, x, y):
+        """在指定位置生成一个 virusMass 的病毒"""
+        mass = self.config['virusMass']
+        if self.world is not None:
+            self._spawn_arrays(
+                self.world.viruses, self.virus_index, 1, mass, 4 + math.sqrt(mass) * 6,
+                np.array([x]), np.array([y])
+            )
+            return
+        uid, = self._new_uids(1)
+        self.viruses.append(Virus(x, y, mass, uid))
+        self.virus_index.insert(uid, x, y)
+
+    def _check_players_collision(self):
+        """检查玩家之间的碰撞
 
-                            elif cell2.mass > cell1.mass * 1.1:
-                                cell2.mass += cell1.mass
-                                cell2.radius = player2._mass_to_radius(cell2.mass)
+        先用 sweep-and-prune 粗筛，每个无序细胞对只判定一次；
+        吃与被吃在判定完成后统一结算（规则见 world.cell_eats），结果确定。
+        """
+        players = self.players + [self.agent_player]
+        owners = [player for player in players for _ in player.cells]
+        if len(owners) < 2:
+            return
+        cells = [cell for player in players for cell in player.cells]
+        owner = np.repeat(np.arange(len(players)), [len(p.cells) for p in players])
+        if self.world is not None:
+            store = self.world.cells
+            slots, _ = cell_slots(players)
+            x = store.x[self.arena, slots]
+            y = store.y[self.arena, slots]
+            radius = store.radius[self.arena, slots]
+            mass = store.mass[self.arena, slots]
+        else:
+            x = np.array([cell.x for cell in cells])
+            y = np.array([cell.y for cell in cells])
+            radius = np.array([cell.radius for cell in cells])
+            mass = np.array([cell.mass for cell in cells])
 
-                                if cell1 in player1.cells:  # ✅ 安全检查
-                                    player1.cells.remove(cell1)
+        events = cell_eats(x, y, radius, mass, owner)
+        if self.profiler is not None:
+            self.profiler.count('player_eats', len(events))
+        if not events:
+            return
 
-                                player1.massTotal = sum(c.mass for c in player1.cells)
-                                player2.massTotal = sum(c.mass for c in player2.cells)
+        masses = mass.tolist()
+        gained = {}
+        eaten = {}
+        for e, p in events:
+            gained[e] = gained.get(e, masses[e]) + masses[p]
+            eaten.setdefault(id(owners[p]), []).append(cells[p])
+        for e, new_mass in gained.items():
+            owners[e].set_cell_mass(cells[e], new_mass)
+        for e, p in events:
+            player = owners[p]
+            if id(player) in eaten:
+                player.remove_cells(eaten.pop(id(player)))
 
-                                if len(player1.cells) == 0 and player1 != self.agent_player:
-                                    self.players.remove(player1)
-                                break
+        # 没有细胞的机器人出局（AI 玩家由 _is_done 处理）
+        self.players = [player for player in self.players if player.cells]
 
     def _check_player_virus_collision(self, player):   
         viruses_to_remove = []  
         
-        for i, virus in enumerate(self.viruses):  
+        prof = self.profiler
+        viruses = self.viruses
+        # 按列表顺序只检查病毒索引给出的候选；细胞分裂后，新细胞附近的候选并入待检查的队列
+        pending = []
+        if len(player.cells) < self.config['limitSplit']:
+            pending = self._viruses_near(player.cells)
+        heapq.heapify(pending)
+        last = -1
+        while pending:
+            i = heapq.heappop(pending)
+            if i == last:
+                continue
+            last = i
+            virus = viruses[i]
+            if prof is not None:
+                prof.count('virus_checks', len(player.cells))
             for cell_idx, cell in enumerate(player.cells[:]):  # 创建副本以避免在迭代时修改  
                 # 计算距离  
                 dist = math.sqrt((cell.x - virus.x)**2 + (cell.y - virus.y)**2)  
@@ -492,28 +1684,30 @@ class AgarEnvironment(gym.Env):
                             split_count = min(4, int(cell.mass / self.config['defaultPlayerMass']))  
                             
                             if split_count > 1:  
-                                # 移除原始细胞  
-                                player.cells.remove(cell)  
-                                
                                 # 创建新的小细胞  
                                 for _ in range(split_count):  
                                     new_mass = cell.mass / split_count  
                                     angle = 2 * math.pi * self.rng.random()  
                                     
-                                    new_cell = Cell(  
+                                    new_cell = player._new_cell(  
                                         cell.x + math.cos(angle) * cell.radius,  
                                         cell.y + math.sin(angle) * cell.radius,  
                                         new_mass,  
                                         player._mass_to_radius(new_mass),  
-                                        player.id  
+                                        SPLIT_CELL_SPEED  
                                     )  
                                     new_cells.append(new_cell)  
                                 
+                                # 移除原始细胞（在创建新细胞之后，避免其存储被复用）
+                                player.remove_cell(cell)
+
                                 # 添加新细胞  
-                                player.cells.extend(new_cells)  
-                                
-                                # 更新玩家总质量  
-                                player.massTotal = sum(c.mass for c in player.cells)  
+                                player.add_cells(new_cells)
+                                player.merge_timer = self.merge_ticks
+                                # 新细胞可能接触到列表中排在后面的病毒
+                                for j in self._viruses_near(new_cells):
+                                    if j > i:
+                                        heapq.heappush(pending, j)
                                 
                                 # 移除病毒  
                                 viruses_to_remove.append(i)  
@@ -521,19 +1715,16 @@ class AgarEnvironment(gym.Env):
         
         # 移除被消耗的病毒  
         for i in sorted(viruses_to_remove, reverse=True):  
+            self.virus_index.remove(self.viruses[i].uid)
             self.viruses.pop(i)  
-            
-        # 如果病毒数量低于最大值，有一定概率生成新病毒  
-        if len(self.viruses) < self.config['maxViruses'] and self.rng.random() < 0.1:  
-            self._init_viruses(1)  
     
-    def _calculate_reward(self, prev_mass):
-        """改进版奖励函数"""
+    def _calculate_reward(self, prev_mass, player=None):
+        """改进版奖励函数（player 默认为智能体）"""
 
         reward = 0.0
 
         # 成长奖励：每增长 1 点质量，奖励 0.2（你可以调成 1.0 看更快反馈）
-        delta_mass = self.agent_player.massTotal - prev_mass
+        delta_mass = (player or self.agent_player).massTotal - prev_mass
         reward += delta_mass * 0.5
 
         # 存活奖励：每一步都给 0.05
@@ -546,7 +1737,7 @@ class AgarEnvironment(gym.Env):
         # 游戏结束条件：  
         # 1. 达到最大步数  
         # 2. AI玩家死亡（没有细胞）  
-        # 3. AI玩家是唯一存活的玩家  
+        # 3. AI玩家是唯一存活的玩家（没有机器人的场景只按前两条结束）
         
         if self.steps >= self.max_steps:  
             return True  
@@ -554,32 +1745,11 @@ class AgarEnvironment(gym.Env):
         if len(self.agent_player.cells) == 0:  
             return True  
         
-        if len(self.players) == 0:  
+        if len(self.players) == 0 and self.config.get('botCount', 3) > 0:
             return True  
         
         return False  
     
-    def _get_observation(self):  
-        obs = []
-
-        # 玩家自身信息
-        obs.extend([self.agent_player.x / 5000, self.agent_player.y / 5000, self.agent_player.massTotal / 500])  # 归一化
-
-        # 记录前5个食物（x, y 相对坐标）
-        for food in self.food[:5]:
-            dx = (food.x - self.agent_player.x) / 1000
-            dy = (food.y - self.agent_player.y) / 1000
-            obs.extend([dx, dy])
-        while len(obs) < 3 + 5 * 2:  # 不足补0
-            obs.extend([0, 0])
-
-        # 记录前3个敌人（x, y, mass）
-        for player in self.players[:3]:
-            dx = (player.x - self.agent_player.x) / 1000
-            dy = (player.y - self.agent_player.y) / 1000
-            dm = player.massTotal / 500
-            obs.extend([dx, dy, dm])
-        while len(obs) < 3 + 5*2 + 3*3:
-            obs.extend([0, 0, 0])
-
-        return np.array(obs, dtype=np.float32)
\ No newline at end of file
+    def _get_observation(self):
+        """当前观察（布局见 self.encoder）"""
+        return self.encoder.encode([self])[0]
@@ -0,0 +1,150 @@
+"""自博弈联赛：用过去的策略快照控制环境中的机器人
+
+PolicyPool 保存最多 max_size 个冻结的策略（numpy_policy.NumpyPolicy），超出时淘汰
+最早加入的快照；快照可以从 models/ 下的检查点加载，也可以在训练中直接冻结当前模型
+（SelfPlayCallback）。League 在每局 reset 时为机器人抽取对手策略，每个 tick 把所有
+竞技场中由策略控制的机器人的观察一次编码，按快照分组各做一次批量前向，
+动作与智能体动作的解释方式相同（见 AgarEnvironment._control）。
+
+用法:
+    pool = PolicyPool(max_size=8)
+    pool.load_directory('models')
+    league = League(pool)
+    venv.env_method('set_league', league)    # BatchedAgarVecEnv，所有竞技场共享
+    model.learn(..., callback=SelfPlayCallback(pool, every=50_000))
+"""
+import glob
+import os
+from collections import OrderedDict
+
+import numpy as np
+from stable_baselines3.common.callbacks import BaseCallback
+
+from numpy_policy import NumpyPolicy, export
+
+
+class PolicyPool:
+    """按加入顺序保存的冻结策略快照，最多 max_size 个
+
+    obs_size 给出时，维数不符的快照在加入时被拒绝（ValueError）。
+    已分配给机器人的快照被淘汰后，仍由这些机器人使用到本局结束。
+    """
+
+    def __init__(self, max_size=8, obs_size=None):
+        if max_size < 1:
+            raise ValueError(f'max_size must be >= 1, got {max_size}')
+        self.max_size = max_size
+        self.obs_size = obs_size
+        self._policies = OrderedDict()
+
+    def __len__(self):
+        return len(self._policies)
+
+    @property
+    def names(self):
+        return list(self._policies)
+
+    def add(self, name, policy):
+        """加入一个快照（同名时替换），超出容量时淘汰最早的快照"""
+        if self.obs_size is not None and policy.obs_size != self.obs_size:
+            raise ValueError(f"Policy {name!r} expects {policy.obs_size}-dim observations, not {self.obs_size}")
+        self._policies.pop(name, None)
+        self._policies[name] = policy
+        while len(self._policies) > self.max_size:
+            self._policies.popitem(last=False)
+
+    def load(self, path, name=None):
+        """加载一个检查点：.npz 直接读取；.zip（SB3 模型）先导出为同名 .npz（需要 torch）"""
+        stem, ext = os.path.splitext(path)
+        if ext == '.zip':
+            npz = stem + '.npz'
+            if not os.path.exists(npz) or os.path.getmtime(npz) < os.path.getmtime(path):
+                export(path, npz)
+            path = npz
+        elif ext != '.npz':
+            raise ValueError(f"Unsupported checkpoint: {path}")
+        name = name or os.path.basename(stem)
+        self.add(name, NumpyPolicy(path))
+        return name
+
+    def load_directory(self, directory='models'):
+        """按修改时间从旧到新加载目录中的检查点（同名的 .zip 和 .npz 只加载一次），返回加载的名字"""
+        paths = {}
+        for path in glob.glob(os.path.join(directory, '*.npz')) + glob.glob(os.path.join(directory, '*.zip')):
+            # 同名时优先使用已导出的 .npz
+            paths.setdefault(os.path.splitext(path)[0], path)
+        ordered = sorted(paths.values(), key=os.path.getmtime)
+        return [self.load(path) for path in ordered[-self.max_size:]]
+
+    def snapshot(self, model, name):
+        """冻结训练中的 SB3 模型的当前权重并加入池中"""
+        self.add(name, NumpyPolicy.from_model(model))
+
+    def sample(self, rng, count):
+        """用 rng 均匀抽取 count 个快照"""
+        policies = list(self._policies.values())
+        return [policies[i] for i in rng.randint(len(policies), size=count).tolist()]
+
+
+class League:
+    """为机器人分配对手策略并批量计算它们的动作
+
+    fraction: 每个机器人由策略控制的概率，其余机器人使用内置逻辑（bots.bot_policy）。
+    """
+
+    def __init__(self, pool, fraction=1.0):
+        self.pool = pool
+        self.fraction = fraction
+
+    def assign(self, env):
+        """在 env 的一局开始时为每个机器人抽取策略（用 env 的随机数，结果可复现）"""
+        bots = env.players
+        if not bots or not len(self.pool):
+            for bot in bots:
+                bot.policy = None
+            return
+        controlled = (env.rng.random_sample(len(bots)) < self.fraction).tolist()
+        policies = self.pool.sample(env.rng, len(bots))
+        for bot, use, policy in zip(bots, controlled, policies):
+            # 外部控制的玩家（multi_agent）不分配策略
+            bot.policy = policy if use and not bot.controlled else None
+
+    def act(self, envs):
+        """计算 envs 中所有由策略控制的机器人的动作并应用
+
+        envs 应使用相同的观察配置。所有机器人的观察一次编码，每个快照一次前向。
+        float32 矩阵乘法的结果可能随批大小有末位差异，因此启用联赛时 BatchedAgarVecEnv
+        的轨迹与单独运行的环境不保证逐位一致。
+        """
+        rows = [(env, bot) for env in envs for bot in env.players if bot.policy is not None]
+        if not rows:
+            return
+        obs = envs[0].encoder.encode([env for env, _ in rows], [bot for _, bot in rows])
+        groups = {}
+        for i, (_, bot) in enumerate(rows):
+            groups.setdefault(id(bot.policy), (bot.policy, []))[1].append(i)
+        actions = np.zeros((len(rows), 4), dtype=np.float32)
+        for policy, index in groups.values():
+            actions[index] = policy.predict(obs[index])
+        for (env, bot), action in zip(rows, actions.tolist()):
+            env._control(bot, action)
+
+
+class SelfPlayCallback(BaseCallback):
+    """训练中每 every 步把当前模型冻结为一个新快照加入 pool"""
+
+    def __init__(self, pool, every=50_000, prefix='self', verbose=0):
+        super().__init__(verbose)
+        self.pool = pool
+        self.every = every
+        self.prefix = prefix
+        self._last = 0
+
+    def _on_step(self):
+        if self.num_timesteps - self._last >= self.every:
+            self._last = self.num_timesteps
+            name = f'{self.prefix}_{self.num_timesteps}'
+            self.pool.snapshot(self.model, name)
+            if self.verbose:
+                print(f'[AI] League snapshot {name} ({len(self.pool)} in pool)')
+        return True
@@ -1,47 +1,75 @@
-from stable_baselines3 import PPO
+import os
+
 import numpy as np
 
+from obs_schema import DEFAULT_SCHEMA
+from state_processor import encode_states
+
 class MyAIModel:
-    def __init__(self, model_path='models/ppo_agar_agent.zip'):
-        self.model = PPO.load(model_path, custom_objects={
-            "clip_range": lambda x: 0.2,
-            "lr_schedule": lambda x: 2.5e-4,
-            "optimizer": None  # 避免加载 optimizer 导致参数冲突
-        })
-        print("[AI] PPO model loaded successfully.")
+    def __init__(self, model_path='models/ppo_agar_agent.zip', backend='sb3'):
+        """加载模型
+
+        backend: 'sb3' 用 stable-baselines3 加载 PPO；
+                 'numpy' / 'onnx' 加载 numpy_policy.py 导出的 .npz / .onnx 文件，
+                 不导入 SB3 和 torch（model_path 为 .zip 时自动换成对应后缀）。
+        """
+        self.backend = backend
+        if backend == 'sb3':
+            from stable_baselines3 import PPO
+
+            self.model = PPO.load(model_path, custom_objects={
+                "clip_range": lambda x: 0.2,
+                "lr_schedule": lambda x: 2.5e-4,
+                "optimizer": None  # 避免加载 optimizer 导致参数冲突
+            })
+            print("[AI] PPO model loaded successfully.")
+            return
+        from numpy_policy import NumpyPolicy, OnnxPolicy
+
+        if backend not in ('numpy', 'onnx'):
+            raise ValueError(f"Unknown backend: {backend}")
+        stem, ext = os.path.splitext(model_path)
+        if ext == '.zip':
+            model_path = stem + ('.npz' if backend == 'numpy' else '.onnx')
+        self.model = NumpyPolicy(model_path) if backend == 'numpy' else OnnxPolicy(model_path)
+        print(f"[AI] {backend} policy loaded successfully.")
 
     def predict(self, obs_dict):
         # 你必须将 obs_dict 转换为模型训练时定义的 observation 格式
         obs = self._preprocess(obs_dict)
-        action, _ = self.model.predict(obs, deterministic=True)
-        return action
+        return self.predict_batch(obs)
+
+    def predict_batch(self, obs):
+        """对形状 (N, obs_dim) 的观察做一次批量前向，返回 (N, action_dim) 的动作"""
+        obs = np.asarray(obs, dtype=np.float32)
+        if self.backend != 'sb3':
+            return self.model.predict(obs)
+        actions, _ = self.model.predict(obs, deterministic=True)
+        return actions
+
+    def predict_states(self, states):
+        """对多个机器人的帧数据（serverTellPlayerMove 的参数）批量推理，返回 (N, action_dim) 的动作"""
+        return self.predict_batch(encode_states(states))
 
     def _preprocess(self, obs_dict):
         """
-        将 state_processor 返回的 dict 转换为模型训练时需要的 observation 格式。
-        假设你训练时使用的是一个一维向量表示的状态空间。
+        将 state_processor.extract_observation 返回的 dict 转换为模型输入，
+        用与训练环境相同的编译后编码器（obs_schema.DEFAULT_SCHEMA）编码。
+        dict 中的实体是相对自身的坐标，先还原为绝对坐标。
         """
-        obs = []
-
-        # 例如：拼接 self_x, self_y, self_mass
-        obs.extend([
-            obs_dict['self_x'] / 1000.0,
-            obs_dict['self_y'] / 1000.0,
-            obs_dict['self_mass'] / 500.0
-        ])
-
-        # 拼接 food 相对位置
-        for food in obs_dict['nearby_foods']:
-            obs.extend([food[0] / 100.0, food[1] / 100.0])
-        while len(obs_dict['nearby_foods']) < 5:
-            obs.extend([0, 0])  # 补零
-
-        # 拼接敌人相对位置和体重
-        for enemy in obs_dict['nearby_enemies']:
-            obs.extend([
-                enemy[0] / 100.0, enemy[1] / 100.0, enemy[2] / 500.0
-            ])
-        while len(obs_dict['nearby_enemies']) < 3:
-            obs.extend([0, 0, 0])
-
-        return np.array(obs, dtype=np.float32).reshape(1, -1)
+        schema = DEFAULT_SCHEMA
+        x, y = obs_dict['self_x'], obs_dict['self_y']
+        rows = {
+            'food': np.array(obs_dict['nearby_foods'], dtype=np.float64).reshape(-1, 2),
+            'enemies': np.array(obs_dict['nearby_enemies'], dtype=np.float64).reshape(-1, 3),
+        }
+        entities = {}
+        for source in schema.sources:
+            r = rows.get(source, np.zeros((0, 3)))
+            mass = r[:, 2] if r.shape[1] > 2 else np.zeros(len(r))
+            entities[source] = (
+                (x + r[:, 0])[None], (y + r[:, 1])[None], mass[None], np.ones((1, len(r)), dtype=bool)
+            )
+        selves = (np.array([x], dtype=np.float64), np.array([y], dtype=np.float64),
+                  np.array([obs_dict['self_mass']], dtype=np.float64))
+        return schema.compile().encode(selves, entities)
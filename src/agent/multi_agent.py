@@ -0,0 +1,291 @@
+"""多智能体接口：一个竞技场中的多个玩家都由外部动作控制
+
+MultiAgentAgarEnv 与 PettingZoo parallel API 类似，但观察、动作、奖励都是按智能体槽位
+排列的数组：第 0 个槽位是环境的 agent_player，其余槽位是被标记为 controlled 的机器人
+（内置逻辑和联赛不再改变它们的目标），剩下的机器人照常由内置逻辑控制。
+所有存活智能体的观察用一次 encoder.encode 完成。
+
+死亡和重生用掩码表示：step 返回的 dones[i] 表示槽位 i 在这一步死亡（或本局结束），
+respawn=True 时死亡的智能体在步末以新玩家重生，否则保持死亡直到 reset；
+alive 掩码（infos['alive'] 与 self.alive）标记下一步动作会生效的槽位，死亡槽位的观察为 0。
+
+MultiAgentVecEnv 把若干竞技场的所有智能体槽位展开成一个 SB3 VecEnv（共享策略训练），
+一个竞技场每个 tick 产生 n_agents 条转移。
+"""
+import numpy as np
+from stable_baselines3.common.vec_env.base_vec_env import VecEnv
+
+from env import (
+    AgarEnvironment, DEFAULT_CONFIG,
+    move_and_decay_arrays, food_contact_arrays, update_bot_targets, apply_leagues, move_mass_food_arrays,
+    _repeat_action,
+)
+from world import World
+
+
+class MultiAgentAgarEnv:
+    """一个竞技场中的 n_agents 个受控玩家
+
+    config['botCount'] 至少为 n_agents - 1；多出的机器人使用内置逻辑。
+    ruleSteps 的规则策略接管只用于单智能体接口，这里不生效。
+    """
+
+    def __init__(self, n_agents=4, config=None, backend='object', respawn=True, world=None, arena=0):
+        if n_agents < 1:
+            raise ValueError(f'n_agents must be >= 1, got {n_agents}')
+        config = dict(config or DEFAULT_CONFIG)
+        config['botCount'] = max(config.get('botCount', 3), n_agents - 1)
+        self.env = AgarEnvironment(config=config, backend=backend, world=world, arena=arena)
+        self.n_agents = n_agents
+        self.respawn = respawn
+        # 各槽位的玩家 id，重生后不变
+        self.possible_agents = ['agent'] + [f'bot_{i}' for i in range(n_agents - 1)]
+        self.observation_space = self.env.observation_space
+        self.action_space = self.env.action_space
+        self.slots = []
+        self.alive = np.zeros(n_agents, dtype=bool)
+
+    @property
+    def agents(self):
+        """当前存活的智能体 id"""
+        return [name for name, alive in zip(self.possible_agents, self.alive) if alive]
+
+    def seed(self, seed=None):
+        return self.env.seed(seed)
+
+    def reset(self):
+        """开始新的一局，返回 (n_agents, obs_dim) 的观察"""
+        env = self.env
+        env.reset()
+        self.slots = [env.agent_player] + env.players[:self.n_agents - 1]
+        for player in self.slots[1:]:
+            player.controlled = True
+            player.policy = None
+        self.alive[:] = True
+        return self.observations()
+
+    def observations(self):
+        """所有槽位的观察，死亡槽位为 0"""
+        obs = np.zeros((self.n_agents,) + self.observation_space.shape, dtype=np.float32)
+        index = np.flatnonzero(self.alive)
+        if len(index):
+            players = [self.slots[i] for i in index]
+            obs[index] = self.env.encoder.encode([self.env] * len(players), players)
+        return obs
+
+    def step(self, actions):
+        """actions 形状 (n_agents, 4)，死亡槽位的动作被忽略
+
+        返回 (obs, rewards, dones, infos)：obs 为 (n_agents, obs_dim)，rewards / dones 为 (n_agents,)，
+        infos 包含 'alive'（下一步的存活掩码）和 'episode_done'（本局结束，需要 reset），
+        开启计时时还包含 'profile'（见 AgarEnvironment.enable_profiling）。
+        """
+        rewards, dones, episode_done = self.simulate(actions)
+        if not episode_done:
+            self.respawn_dead(dones)
+        obs = self.observations()
+        infos = {'alive': self.alive.copy(), 'episode_done': episode_done}
+        prof = self.env.profiler
+        if prof is not None:
+            prof.lap('observation')
+            infos['profile'] = prof.finish()
+        return obs, rewards, dones, infos
+
+    def simulate(self, actions):
+        """step 的物理部分（不编码观察、不重生），返回 (rewards, dones, episode_done)"""
+        env = self.env
+        if env.profiler is not None:
+            env.profiler.start()
+        acting, rewards, dones = self.begin_step(actions)
+        for tick in range(env._ticks_for_step()):
+            index, prev_mass = self.apply_actions(tick, acting, dones)
+            may_eat = env._update_all_entities()
+            if env.profiler is not None:
+                env.profiler.lap('update')
+            self.end_tick(index, prev_mass, may_eat, rewards, dones)
+            if env.steps >= env.max_steps:
+                break
+        return self.end_step(acting, rewards, dones)
+
+    # simulate 的各阶段，MultiAgentVecEnv 在 apply_actions 和 end_tick 之间对所有竞技场批量更新实体
+
+    def begin_step(self, actions):
+        """记录本步的动作，返回 (acting, rewards, dones)：本步开始时存活的槽位和清零的累加缓冲区"""
+        self._actions = np.asarray(actions)
+        return self.alive.copy(), np.zeros(self.n_agents), np.zeros(self.n_agents, dtype=bool)
+
+    def apply_actions(self, tick, acting, dones):
+        """一个 tick 的动作阶段，返回 (本 tick 行动的槽位, 它们动作前的质量)"""
+        env = self.env
+        env.steps += 1
+        index = np.flatnonzero(acting & ~dones).tolist()
+        prev_mass = [self.slots[i].massTotal for i in index]
+        for i in index:
+            action = self._actions[i]
+            env._control(self.slots[i], action if tick == 0 else _repeat_action(action))
+        if env.profiler is not None:
+            env.profiler.lap('action')
+        return index, prev_mass
+
+    def end_tick(self, index, prev_mass, may_eat, rewards, dones):
+        """一个 tick 的碰撞和奖励（AgarEnvironment._end_tick），累加到 rewards，细胞全部被吃的槽位记入 dones
+
+        本局是否结束由 end_step 判断，_end_tick 返回的单智能体结束标志不使用。
+        """
+        players = [self.slots[i] for i in index]
+        tick_rewards, _ = self.env._end_tick(prev_mass, may_eat, players)
+        for i, player, reward in zip(index, players, tick_rewards):
+            rewards[i] += reward
+            if not player.cells:
+                dones[i] = True
+
+    def end_step(self, acting, rewards, dones):
+        """更新存活掩码并判断本局是否结束，返回 (rewards, dones, episode_done)"""
+        env = self.env
+        env.total_reward += rewards[0]
+        self.alive &= ~dones
+        episode_done = env.steps >= env.max_steps or not (self.respawn or self.alive.any())
+        if episode_done:
+            dones |= acting
+        return rewards, dones, episode_done
+
+    def respawn_dead(self, dones):
+        """respawn=True 时在新的出生点重生 dones 中死亡的槽位"""
+        if not self.respawn:
+            return
+        for i in np.flatnonzero(dones & ~self.alive).tolist():
+            self._respawn(i)
+
+    def _respawn(self, i):
+        """在新的出生点重生槽位 i 的玩家"""
+        env = self.env
+        player = env._new_player(self.possible_agents[i], self.slots[i].name, env._generate_spawn_point())
+        if i == 0:
+            env.agent_player = player
+        else:
+            player.controlled = True
+            env.players.append(player)
+        self.slots[i] = player
+        self.alive[i] = True
+
+
+class MultiAgentVecEnv(VecEnv):
+    """把 n_arenas 个竞技场的 n_agents 个智能体槽位展开成 n_arenas * n_agents 个 SB3 环境
+
+    第 a 个竞技场的第 i 个智能体是第 a * n_agents + i 个环境；智能体死亡时该环境 done，
+    返回的观察是重生后的观察；一局结束时整个竞技场重置，其所有环境 done。
+    终局观察放在 info['terminal_observation']。numpy 后端的竞技场共享一个 World，
+    所有竞技场的观察一次编码。
+    """
+
+    def __init__(self, n_arenas=16, n_agents=4, config=None, seed=None):
+        config = dict(config or DEFAULT_CONFIG)
+        self.n_agents = n_agents
+        self.world = World(config, n_arenas=n_arenas)
+        self.arenas = [
+            MultiAgentAgarEnv(n_agents, config, respawn=True, world=self.world, arena=a)
+            for a in range(n_arenas)
+        ]
+        space = self.arenas[0].observation_space
+        super().__init__(n_arenas * n_agents, space, self.arenas[0].action_space)
+        self._actions = None
+        if seed is not None:
+            self.seed(seed)
+
+    def _observations(self):
+        """所有竞技场所有存活智能体的观察，一次编码"""
+        obs = np.zeros((self.num_envs,) + self.observation_space.shape, dtype=np.float32)
+        envs, players, rows = [], [], []
+        for a, arena in enumerate(self.arenas):
+            for i in np.flatnonzero(arena.alive).tolist():
+                envs.append(arena.env)
+                players.append(arena.slots[i])
+                rows.append(a * self.n_agents + i)
+        if rows:
+            obs[rows] = self.arenas[0].env.encoder.encode(envs, players)
+        return obs
+
+    def reset(self):
+        for arena in self.arenas:
+            arena.reset()
+        return self._observations()
+
+    def step_async(self, actions):
+        self._actions = np.asarray(actions).reshape(len(self.arenas), self.n_agents, -1)
+
+    def step_wait(self):
+        n = self.n_agents
+        arenas = self.arenas
+        # 与 vec_env.BatchedAgarVecEnv 相同：机器人目标、移动、衰减和食物接触预筛对所有竞技场一次完成，
+        # 碰撞和奖励逐个竞技场结算（_end_tick）
+        steps = [arena.begin_step(actions) for arena, actions in zip(arenas, self._actions)]
+        ticks = [arena.env._ticks_for_step() for arena in arenas]
+        stopped = [False] * len(arenas)
+        for arena in arenas:
+            if arena.env.profiler is not None:
+                arena.env.profiler.start()
+        for tick in range(max(ticks)):
+            active = [a for a in range(len(arenas)) if tick < ticks[a] and not stopped[a]]
+            if not active:
+                break
+            moved = [arenas[a].apply_actions(tick, steps[a][0], steps[a][2]) for a in active]
+            tick_envs = [arenas[a].env for a in active]
+            update_bot_targets(tick_envs)
+            apply_leagues(tick_envs)
+            cell_arenas, cell_slots = move_and_decay_arrays(tick_envs)
+            move_mass_food_arrays(tick_envs)
+            may_eat = food_contact_arrays(self.world, cell_arenas, cell_slots)
+            for a, (index, prev_mass) in zip(active, moved):
+                env = arenas[a].env
+                if env.profiler is not None:
+                    # 前面的阶段是全部竞技场批量完成的，只统计各竞技场自己的碰撞和奖励
+                    env.profiler.skip()
+                arenas[a].end_tick(index, prev_mass, may_eat[env.arena], steps[a][1], steps[a][2])
+                stopped[a] = env.steps >= env.max_steps
+
+        rewards = np.zeros(self.num_envs, dtype=np.float32)
+        dones = np.zeros(self.num_envs, dtype=bool)
+        finished = np.zeros(len(arenas), dtype=bool)
+        for a, (arena, (acting, r, d)) in enumerate(zip(arenas, steps)):
+            r, d, finished[a] = arena.end_step(acting, r, d)
+            rewards[a * n:(a + 1) * n] = r
+            dones[a * n:(a + 1) * n] = d
+        # 重生和重置之前编码终局观察：死亡的智能体为 0，本局到时结束的存活智能体记为截断
+        terminal = self._observations()
+        infos = [{} for _ in range(self.num_envs)]
+        for k in np.flatnonzero(dones).tolist():
+            infos[k]['terminal_observation'] = terminal[k]
+            infos[k]['TimeLimit.truncated'] = bool(self.arenas[k // n].alive[k % n])
+        for a, arena in enumerate(self.arenas):
+            if arena.env.profiler is not None:
+                infos[a * n]['profile'] = arena.env.profiler.finish()
+            if finished[a]:
+                arena.reset()
+            else:
+                arena.respawn_dead(dones[a * n:(a + 1) * n])
+        return self._observations(), rewards, dones, infos
+
+    def seed(self, seed=None):
+        """第 a 个竞技场使用种子 seed + a"""
+        if seed is None:
+            seed = np.random.randint(0, 2 ** 31 - 1)
+        return [arena.seed(seed + a)[0] for a, arena in enumerate(self.arenas)]
+
+    def close(self):
+        pass
+
+    def get_attr(self, attr_name, indices=None):
+        return [getattr(self.arenas[i // self.n_agents].env, attr_name) for i in self._get_indices(indices)]
+
+    def set_attr(self, attr_name, value, indices=None):
+        for i in self._get_indices(indices):
+            setattr(self.arenas[i // self.n_agents].env, attr_name, value)
+
+    def env_method(self, method_name, *method_args, indices=None, **method_kwargs):
+        return [
+            getattr(self.arenas[i // self.n_agents].env, method_name)(*method_args, **method_kwargs)
+            for i in self._get_indices(indices)
+        ]
+
+    def env_is_wrapped(self, wrapper_class, indices=None):
+        return [False for _ in self._get_indices(indices)]
@@ -0,0 +1,216 @@
+"""不依赖 SB3/torch 的确定性策略推理
+
+export 把 SB3 PPO 模型（.zip）中的 MlpPolicy 动作分支导出为 .npz 权重文件
+（可选再导出 .onnx）；NumpyPolicy 只用 NumPy 矩阵乘法计算确定性动作
+（高斯分布的均值，按动作空间截断，与 PPO.predict(deterministic=True) 一致），
+OnnxPolicy 用 onnxruntime 运行导出的 ONNX 图。
+
+用法:
+    python numpy_policy.py export models/ppo_agar_agent.zip [--onnx]
+    python numpy_policy.py check models/ppo_agar_agent.zip [--backend numpy]
+"""
+import argparse
+import io
+import json
+import os
+import re
+import zipfile
+
+import numpy as np
+
+
+ACTIVATIONS = {
+    'tanh': np.tanh,
+    'relu': lambda x: np.maximum(x, 0),
+}
+
+
+def _parse_array(text):
+    """SB3 data 中 numpy 数组的字符串形式，如 '[-1. -1.  0.  0.]'"""
+    return np.array(text.strip('[]').split(), dtype=np.float32)
+
+
+def _policy_arrays(state, activation_fn, low, high):
+    """从策略的 state_dict 提取前向所需的数组（NumpyPolicy 的 .npz 格式）"""
+    # policy_net 的线性层按下标顺序排列，之间是激活函数
+    layers = sorted(
+        int(m.group(1)) for m in map(re.compile(r'mlp_extractor\.policy_net\.(\d+)\.weight').fullmatch, state) if m
+    )
+    # 复制一份：训练中的模型之后更新参数时，已冻结的快照不能跟着变
+    copy = lambda name: state[name].detach().cpu().numpy().copy()
+    arrays = {}
+    for i, layer in enumerate(layers):
+        arrays[f'w{i}'] = copy(f'mlp_extractor.policy_net.{layer}.weight')
+        arrays[f'b{i}'] = copy(f'mlp_extractor.policy_net.{layer}.bias')
+    arrays['action_w'] = copy('action_net.weight')
+    arrays['action_b'] = copy('action_net.bias')
+    arrays['activation'] = np.array('relu' if 'ReLU' in str(activation_fn) else 'tanh')
+    arrays['action_low'] = low
+    arrays['action_high'] = high
+    return arrays
+
+
+def export(zip_path, out_path=None):
+    """把 SB3 模型的策略网络导出为 .npz，返回输出路径（导出时需要 torch）"""
+    import torch
+
+    out_path = out_path or os.path.splitext(zip_path)[0] + '.npz'
+    with zipfile.ZipFile(zip_path) as archive:
+        data = json.loads(archive.read('data'))
+        state = torch.load(io.BytesIO(archive.read('policy.pth')), map_location='cpu', weights_only=True)
+
+    space = data['action_space']
+    shape = tuple(space['_shape'])
+    # MlpPolicy 默认激活函数为 Tanh
+    arrays = _policy_arrays(
+        state,
+        data.get('policy_kwargs', {}).get('activation_fn', 'Tanh'),
+        np.broadcast_to(_parse_array(space['low']), shape),
+        np.broadcast_to(_parse_array(space['high']), shape)
+    )
+    np.savez(out_path, **arrays)
+    return out_path
+
+
+class NumpyPolicy:
+    """从 .npz 权重文件加载的确定性策略"""
+
+    def __init__(self, path):
+        with np.load(path) as f:
+            self._load(f)
+
+    @classmethod
+    def from_model(cls, model):
+        """冻结一个训练中的 SB3 PPO 模型的当前权重（复制，不写文件）"""
+        space = model.action_space
+        policy = cls.__new__(cls)
+        policy._load(_policy_arrays(
+            model.policy.state_dict(), model.policy.activation_fn.__name__,
+            space.low.astype(np.float32), space.high.astype(np.float32)
+        ))
+        return policy
+
+    @property
+    def obs_size(self):
+        """输入观察的维数"""
+        return self.layers[0][0].shape[0] if self.layers else self.action_w.shape[0]
+
+    def _load(self, f):
+        """f 为打开的 .npz 文件或同样键名的 dict（数组都复制一份，不与 f 共享内存）"""
+        n_layers = sum(1 for name in f if re.fullmatch(r'w\d+', name))
+        # 预先转置成 (in, out)，前向时直接 x @ w
+        self.layers = [
+            (np.array(f[f'w{i}'].T, order='C'), np.array(f[f'b{i}'])) for i in range(n_layers)
+        ]
+        self.action_w = np.array(f['action_w'].T, order='C')
+        self.action_b = np.array(f['action_b'])
+        self.activation = ACTIVATIONS[str(f['activation'])]
+        self.low = f['action_low']
+        self.high = f['action_high']
+
+    def predict(self, obs):
+        """obs 形状 (N, obs_dim)，返回 (N, action_dim) 的 float32 动作"""
+        x = np.asarray(obs, dtype=np.float32)
+        for w, b in self.layers:
+            x = self.activation(x @ w + b)
+        return np.clip(x @ self.action_w + self.action_b, self.low, self.high)
+
+
+def export_onnx(npz_path, out_path=None):
+    """把 .npz 权重导出为 ONNX 图：MatMul + Add + 激活（导出时需要 onnx）"""
+    import onnx
+    from onnx import TensorProto, helper, numpy_helper
+
+    out_path = out_path or os.path.splitext(npz_path)[0] + '.onnx'
+    policy = NumpyPolicy(npz_path)
+    activation = 'Tanh' if policy.activation is np.tanh else 'Relu'
+    layers = policy.layers + [(policy.action_w, policy.action_b)]
+    nodes, weights = [], []
+    x = 'obs'
+    for i, (w, b) in enumerate(layers):
+        weights += [numpy_helper.from_array(w, f'w{i}'), numpy_helper.from_array(b, f'b{i}')]
+        nodes += [
+            helper.make_node('MatMul', [x, f'w{i}'], [f'mm{i}']),
+            helper.make_node('Add', [f'mm{i}', f'b{i}'], [f'z{i}']),
+        ]
+        x = f'z{i}'
+        if i < len(layers) - 1:
+            nodes.append(helper.make_node(activation, [x], [f'h{i}']))
+            x = f'h{i}'
+    weights += [numpy_helper.from_array(policy.low, 'low'), numpy_helper.from_array(policy.high, 'high')]
+    # Clip 只接受标量上下界，逐维截断用 Min / Max
+    nodes += [
+        helper.make_node('Min', [x, 'high'], ['upper']),
+        helper.make_node('Max', ['upper', 'low'], ['action']),
+    ]
+    graph = helper.make_graph(
+        nodes, 'policy',
+        [helper.make_tensor_value_info('obs', TensorProto.FLOAT, ['batch', layers[0][0].shape[0]])],
+        [helper.make_tensor_value_info('action', TensorProto.FLOAT, ['batch', layers[-1][0].shape[1]])],
+        weights
+    )
+    # 固定较低的 IR 版本，兼容旧版 onnxruntime
+    model = helper.make_model(graph, opset_imports=[helper.make_opsetid('', 13)], ir_version=7)
+    onnx.checker.check_model(model)
+    onnx.save(model, out_path)
+    return out_path
+
+
+class OnnxPolicy:
+    """用 onnxruntime 运行 export_onnx 导出的图"""
+
+    def __init__(self, path):
+        import onnxruntime
+
+        options = onnxruntime.SessionOptions()
+        options.intra_op_num_threads = 1
+        self.session = onnxruntime.InferenceSession(path, options, providers=['CPUExecutionProvider'])
+
+    def predict(self, obs):
+        """obs 形状 (N, obs_dim)，返回 (N, action_dim) 的 float32 动作"""
+        action, = self.session.run(None, {'obs': np.asarray(obs, dtype=np.float32)})
+        return action
+
+
+def check_parity(model, policy, n=4096, seed=0, atol=1e-5):
+    """在随机观察上对比 policy 与 PPO.predict(deterministic=True)，返回最大绝对误差
+
+    model 为 .zip 路径（与 MyAIModel 相同的方式加载）或已加载的 PPO 模型。
+    超过 atol 时抛出 AssertionError（需要 SB3）。
+    """
+    if isinstance(model, (str, os.PathLike)):
+        from model import MyAIModel
+
+        model = MyAIModel(os.fspath(model), backend='sb3').model
+    low, high = model.observation_space.low, model.observation_space.high
+    # 观察取略大于观察空间的范围，覆盖实际出现的越界值
+    obs = np.random.RandomState(seed).uniform(2 * low, 2 * high, size=(n,) + low.shape).astype(np.float32)
+    expected, _ = model.predict(obs, deterministic=True)
+    error = float(np.max(np.abs(policy.predict(obs) - expected)))
+    assert error <= atol, f"policy differs from the SB3 model by {error}"
+    return error
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest='cmd', required=True)
+    export_parser = sub.add_parser('export', help='导出权重')
+    export_parser.add_argument('model')
+    export_parser.add_argument('--onnx', action='store_true', help='同时导出 ONNX 图')
+    check_parser = sub.add_parser('check', help='与 SB3 模型对比输出')
+    check_parser.add_argument('model')
+    check_parser.add_argument('--backend', choices=['numpy', 'onnx'], default='numpy')
+    args = parser.parse_args()
+
+    stem = os.path.splitext(args.model)[0]
+    if args.cmd == 'export':
+        print('[AI] Exported', export(args.model))
+        if args.onnx:
+            print('[AI] Exported', export_onnx(stem + '.npz'))
+    else:
+        policy = NumpyPolicy(stem + '.npz') if args.backend == 'numpy' else OnnxPolicy(stem + '.onnx')
+        print(f'[AI] Max abs difference: {check_parity(args.model, policy):.3g}')
+
+
+if __name__ == '__main__':
+    main()
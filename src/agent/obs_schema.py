@@ -0,0 +1,279 @@
+"""观察的声明式定义：训练环境、批量环境和实时机器人共用同一个编码器
+
+ObservationSchema 列出自身信息之后的各个实体分组（实体来源、取最近的 k 个、是否附带质量）
+和归一化尺度，compile() 得到 CompiledEncoder：输入视角玩家的 (x, y, 总质量) 数组和各来源的
+填充实体数组 (x, y, mass, valid)，一次向量化地写入 (B, size) 的输出（可以是调用方预分配的
+缓冲区）。实体数组的来源有两种：环境（observation.gather_entities）和服务器推送的帧
+（state_processor.frame_entities），两边的布局和尺度因此不会再不一致。
+
+一致性检查：实时机器人设置 AGAR_FRAME_LOG 时把收到的帧按行写入 JSON 文件（FrameLog）；
+check_parity 把每一帧恢复成环境状态（frame_to_state），比较两条路径编码的结果。
+
+用法:
+    python obs_schema.py layout
+    python obs_schema.py parity frames.jsonl
+"""
+import argparse
+import json
+from collections import namedtuple
+
+import numpy as np
+
+
+# 归一化尺度：绝对坐标、相对坐标、质量
+POS_SCALE = 5000
+REL_SCALE = 1000
+MASS_SCALE = 500
+
+# 实体来源：食物、其他玩家（质心和总质量）、病毒、射出质量、自身细胞、其他玩家的细胞
+SOURCES = ('food', 'enemies', 'viruses', 'mass_food', 'own_cells', 'enemy_cells')
+
+# 一个实体分组：来源、取最近的 k 个、是否附带质量
+Group = namedtuple('Group', 'source k with_mass')
+
+
+def nearest_k(dx, dy, valid, k):
+    """每行距离最近的 k 个有效元素的列下标，按 (距离, 下标) 升序，不足处为 -1
+
+    先用 argpartition 在 O(N) 内选出前 k 个，再只对这 k 个排序。
+    """
+    rows, n = dx.shape
+    if k <= 0 or n == 0:
+        return np.full((rows, max(k, 0)), -1, dtype=np.int64)
+    d2 = np.where(valid, dx * dx + dy * dy, np.inf)
+    if n > k:
+        cols = np.argpartition(d2, k - 1, axis=1)[:, :k]
+    else:
+        cols = np.broadcast_to(np.arange(n), (rows, n))
+    sub = np.take_along_axis(d2, cols, axis=1)
+    order = np.lexsort((cols, sub))
+    cols = np.take_along_axis(cols, order, axis=1)
+    sub = np.take_along_axis(sub, order, axis=1)
+    cols = np.where(np.isfinite(sub), cols, -1)
+    if cols.shape[1] < k:
+        cols = np.concatenate([cols, np.full((rows, k - cols.shape[1]), -1, dtype=cols.dtype)], axis=1)
+    return cols
+
+
+class ObservationSchema:
+    """观察布局：[x, y, mass] + 各分组最近 k 个实体的 (dx, dy[, mass])，不足 k 个时补 0"""
+
+    def __init__(self, groups, pos_scale=POS_SCALE, rel_scale=REL_SCALE, mass_scale=MASS_SCALE):
+        self.groups = tuple(Group(*g) for g in groups if g[1] > 0)
+        unknown = {g.source for g in self.groups} - set(SOURCES)
+        if unknown:
+            raise ValueError(f"Unknown observation sources: {sorted(unknown)}")
+        self.pos_scale = pos_scale
+        self.rel_scale = rel_scale
+        self.mass_scale = mass_scale
+        self.size = 3 + sum(g.k * (3 if g.with_mass else 2) for g in self.groups)
+        self._compiled = None
+
+    @classmethod
+    def nearest(cls, k_food=5, k_enemies=3, k_viruses=0, k_mass_food=0, k_cells=0):
+        """k 近邻布局，分组顺序固定；默认参数下为 22 维"""
+        return cls([
+            ('food', k_food, False),
+            ('enemies', k_enemies, True),
+            ('viruses', k_viruses, False),
+            ('mass_food', k_mass_food, False),
+            ('own_cells', k_cells, True),
+        ])
+
+    @classmethod
+    def from_config(cls, config):
+        """按 obsFoodK / obsEnemyK / obsVirusK / obsMassFoodK / obsCellK 创建"""
+        return cls.nearest(
+            k_food=config.get('obsFoodK', 5),
+            k_enemies=config.get('obsEnemyK', 3),
+            k_viruses=config.get('obsVirusK', 0),
+            k_mass_food=config.get('obsMassFoodK', 0),
+            k_cells=config.get('obsCellK', 0),
+        )
+
+    @property
+    def sources(self):
+        return [g.source for g in self.groups]
+
+    def layout(self):
+        """每一维的名字，如 'food[0].dx'"""
+        names = ['self.x', 'self.y', 'self.mass']
+        for g in self.groups:
+            fields = ('dx', 'dy', 'mass') if g.with_mass else ('dx', 'dy')
+            names += [f'{g.source}[{i}].{f}' for i in range(g.k) for f in fields]
+        return names
+
+    def columns(self, source):
+        """来源 source 的分组在观察中的列范围 slice"""
+        start = 3
+        for g in self.groups:
+            width = g.k * (3 if g.with_mass else 2)
+            if g.source == source:
+                return slice(start, start + width)
+            start += width
+        raise KeyError(source)
+
+    def compile(self):
+        """编译后的编码器（缓存）"""
+        if self._compiled is None:
+            self._compiled = CompiledEncoder(self)
+        return self._compiled
+
+    def __eq__(self, other):
+        return isinstance(other, ObservationSchema) and self._key() == other._key()
+
+    def __hash__(self):
+        return hash(self._key())
+
+    def _key(self):
+        return self.groups, self.pos_scale, self.rel_scale, self.mass_scale
+
+
+class CompiledEncoder:
+    """ObservationSchema 的向量化编码器"""
+
+    def __init__(self, schema):
+        self.schema = schema
+        self.size = schema.size
+        self._blocks = [(g, schema.columns(g.source)) for g in schema.groups]
+
+    def encode(self, selves, entities, out=None):
+        """selves 为视角玩家的 (x, y, 总质量) 数组，形状 (B,)；entities[source] 为
+        (x, y, mass, valid)，形状 (B, N)。结果写入 out（(B, size) 的 float32 数组）并返回，
+        out 为 None 时新分配。
+        """
+        schema = self.schema
+        px, py, pm = selves
+        rows = len(px)
+        if out is None:
+            out = np.empty((rows, self.size), dtype=np.float32)
+        out[:, 0] = px / schema.pos_scale
+        out[:, 1] = py / schema.pos_scale
+        out[:, 2] = pm / schema.mass_scale
+        for group, columns in self._blocks:
+            block = out[:, columns].reshape(rows, group.k, -1)
+            x, y, mass, valid = entities[group.source]
+            if x.shape[1] == 0:
+                block[...] = 0
+                continue
+            dx = x - px[:, None]
+            dy = y - py[:, None]
+            cols = nearest_k(dx, dy, valid, group.k)
+            found = cols >= 0
+            cols = np.maximum(cols, 0)
+            block[..., 0] = np.where(found, np.take_along_axis(dx, cols, axis=1) / schema.rel_scale, 0)
+            block[..., 1] = np.where(found, np.take_along_axis(dy, cols, axis=1) / schema.rel_scale, 0)
+            if group.with_mass:
+                block[..., 2] = np.where(found, np.take_along_axis(mass, cols, axis=1) / schema.mass_scale, 0)
+        return out
+
+
+DEFAULT_SCHEMA = ObservationSchema.nearest()
+
+
+class FrameLog:
+    """把 serverTellPlayerMove 的参数按行写入 JSON 文件，供 check_parity 使用"""
+
+    def __init__(self, path):
+        self.file = open(path, 'a', buffering=1)
+
+    def add(self, frame):
+        json.dump(list(frame), self.file)
+        self.file.write('\n')
+
+    def close(self):
+        self.file.close()
+
+
+def load_frames(path):
+    """读取 FrameLog 写出的帧列表"""
+    with open(path) as f:
+        return [tuple(json.loads(line)) for line in f if line.strip()]
+
+
+def frame_to_state(frame, max_steps=20000):
+    """把一帧服务器数据转换为 AgarEnvironment.get_state 格式的快照
+
+    只包含帧中可见的实体；视角玩家为 agent_player，其余玩家按帧中顺序排列，
+    帧中没有的字段（实体 uid、玩家目标、随机数状态）取占位值，恢复时应使用 restore_rng=False。
+    """
+    me, players, foods, masses, viruses = frame
+    others = [p for p in players if p['id'] != me['id']]
+    everyone = [me] + others
+
+    def rows(items, keys, default=0.0):
+        return np.array([[float(e.get(k, default)) for k in keys] for e in items], dtype=np.float64).reshape(-1, len(keys))
+
+    cells = [c for p in everyone for c in p.get('cells', [])]
+    cell_rows = rows(cells, ('x', 'y', 'mass'))
+    mass_rows = np.zeros((len(masses), 8))
+    if masses:
+        mass_rows[:, :3] = rows(masses, ('x', 'y', 'mass'))
+        mass_rows[:, 3] = [m.get('direction', {}).get('x', 0.0) for m in masses]
+        mass_rows[:, 4] = [m.get('direction', {}).get('y', 0.0) for m in masses]
+        mass_rows[:, 5] = [m.get('speed', 0.0) for m in masses]
+        ids = [p['id'] for p in everyone]
+        mass_rows[:, 6] = [ids.index(m['id']) if m.get('id') in ids else -1 for m in masses]
+        mass_rows[:, 7] = [m.get('num', 0) for m in masses]
+    return {
+        'food': rows(foods, ('x', 'y', 'mass'), 1.0),
+        'food_uid': np.arange(len(foods), dtype=np.int64),
+        'viruses': rows(viruses, ('x', 'y', 'mass'), 100.0),
+        'virus_uid': np.arange(len(foods), len(foods) + len(viruses), dtype=np.int64),
+        'mass_food': mass_rows,
+        'cells': np.concatenate([cell_rows, 4 + np.sqrt(cell_rows[:, 2:3]) * 6, np.zeros((len(cells), 1))], axis=1),
+        'cell_counts': np.array([len(p.get('cells', [])) for p in everyone], dtype=np.int64),
+        'players': np.array([
+            (p['x'], p['y'], p['x'], p['y'], p['massTotal'], p.get('hue', 0), 0) for p in everyone
+        ], dtype=np.float64).reshape(-1, 7),
+        'player_ids': np.array([str(p['id']) for p in everyone]),
+        'player_names': np.array([str(p.get('name', '')) for p in everyone]),
+        'counters': np.array([0, max_steps, len(foods) + len(viruses)], dtype=np.int64),
+        'total_reward': np.array(0.0),
+        'tick_phase': np.array(0.0),
+    }
+
+
+def check_parity(frames, schema=DEFAULT_SCHEMA, atol=0.0):
+    """比较帧编码路径与环境编码路径的结果，返回最大绝对误差，超过 atol 时抛出 AssertionError
+
+    每一帧恢复成一个环境状态，用 schema 分别从帧和从环境编码。
+    """
+    from env import AgarEnvironment
+    from observation import gather_entities, _self_features
+    from state_processor import encode_states
+
+    encoder = schema.compile()
+    env = AgarEnvironment()
+    error = 0.0
+    for i, frame in enumerate(frames):
+        env.set_state(frame_to_state(frame), restore_rng=False)
+        expected = encoder.encode(
+            _self_features([env]), {source: gather_entities([env], source) for source in schema.sources}
+        )
+        actual = encode_states([frame], schema)
+        diff = float(np.max(np.abs(actual - expected), initial=0.0))
+        assert diff <= atol, f"frame {i}: live encoding differs from the env encoding by {diff}"
+        error = max(error, diff)
+    return error
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest='cmd', required=True)
+    sub.add_parser('layout', help='打印默认布局')
+    parity_parser = sub.add_parser('parity', help='对记录的帧检查两条编码路径是否一致')
+    parity_parser.add_argument('frames')
+    parity_parser.add_argument('--atol', type=float, default=0.0)
+    args = parser.parse_args()
+
+    if args.cmd == 'layout':
+        for i, name in enumerate(DEFAULT_SCHEMA.layout()):
+            print(i, name)
+    else:
+        frames = load_frames(args.frames)
+        print(f'[AI] {len(frames)} frames, max abs difference: {check_parity(frames, atol=args.atol):.3g}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,174 @@
+import numpy as np
+
+from obs_schema import POS_SCALE, MASS_SCALE, ObservationSchema
+from world import cell_slots
+
+
+def _store_entities(env, name):
+    """env 中一类实体（food / viruses / mass_food）的 (x, y, mass) 数组"""
+    if env.world is not None:
+        store = getattr(env.world, name)
+        a, n = env.arena, int(store.n_used[env.arena])
+        return store.x[a, :n], store.y[a, :n], store.mass[a, :n]
+    items = getattr(env, name)
+    if name == 'mass_food':
+        # object 后端的射出质量是 dict
+        return tuple(np.array([m[k] for m in items], dtype=np.float64) for k in ('x', 'y', 'mass'))
+    return tuple(np.array([getattr(e, k) for e in items], dtype=np.float64) for k in ('x', 'y', 'mass'))
+
+
+def _cell_entities(env, players):
+    """players 所有细胞的 (x, y, mass) 数组"""
+    if env.world is not None:
+        cells = env.world.cells
+        slots, _ = cell_slots(players)
+        return cells.x[env.arena, slots], cells.y[env.arena, slots], cells.mass[env.arena, slots]
+    cells = [cell for player in players for cell in player.cells]
+    return tuple(np.array([getattr(c, k) for c in cells], dtype=np.float64) for k in ('x', 'y', 'mass'))
+
+
+def _pad(rows):
+    """把每个环境的 (x, y, mass) 一维数组填充成 (B, N) 数组和有效掩码"""
+    width = max([len(x) for x, _, _ in rows] + [0])
+    x = np.zeros((len(rows), width))
+    y = np.zeros((len(rows), width))
+    mass = np.zeros((len(rows), width))
+    valid = np.zeros((len(rows), width), dtype=bool)
+    for b, (rx, ry, rm) in enumerate(rows):
+        n = len(rx)
+        x[b, :n] = rx
+        y[b, :n] = ry
+        mass[b, :n] = rm
+        valid[b, :n] = True
+    return x, y, mass, valid
+
+
+def _others(env, player):
+    """env 中除 player 以外的玩家；player 为智能体时就是 env.players"""
+    if player is env.agent_player:
+        return env.players
+    return [p for p in [env.agent_player] + env.players if p is not player]
+
+
+def gather_entities(envs, name, players=None):
+    """envs 中一类实体的填充数组 (x, y, mass, valid)，形状 (B, N)
+
+    name 为 'food'、'viruses'、'mass_food'（按存储顺序），或 'enemies'（其他玩家
+    的质心和总质量）、'enemy_cells'、'own_cells'。
+    players[b] 为第 b 行的视角玩家，默认是 envs[b].agent_player；envs 中可以有重复的环境。
+    共享同一个 World 的环境直接对数组行做一次花式索引。
+    """
+    if players is None:
+        players = [env.agent_player for env in envs]
+    if name == 'enemies':
+        return _pad([
+            tuple(np.array([getattr(p, k) for p in _others(env, player)], dtype=np.float64)
+                  for k in ('x', 'y', 'massTotal'))
+            for env, player in zip(envs, players)
+        ])
+    if name == 'enemy_cells':
+        return _pad([_cell_entities(env, _others(env, player)) for env, player in zip(envs, players)])
+    if name == 'own_cells':
+        return _pad([_cell_entities(env, [player]) for env, player in zip(envs, players)])
+
+    world = envs[0].world
+    if world is not None and all(env.world is world for env in envs):
+        store = getattr(world, name)
+        arenas = np.array([env.arena for env in envs], dtype=np.int64)
+        n_used = store.n_used[arenas]
+        width = int(n_used.max(initial=0))
+        valid = np.arange(width) < n_used[:, None]
+        return store.x[arenas, :width], store.y[arenas, :width], store.mass[arenas, :width], valid
+    return _pad([_store_entities(env, name) for env in envs])
+
+
+def _self_features(envs, players=None):
+    """视角玩家（默认为智能体）的 (x, y, 总质量)，形状 (B,) 的数组"""
+    if players is None:
+        players = [env.agent_player for env in envs]
+    px = np.array([p.x for p in players], dtype=np.float64)
+    py = np.array([p.y for p in players], dtype=np.float64)
+    pm = np.array([p.massTotal for p in players], dtype=np.float64)
+    return px, py, pm
+
+
+class NearestEncoder:
+    """k 近邻观察：自身信息 + 各类实体中距离最近的 k 个的相对位置
+
+    布局和尺度由 obs_schema.ObservationSchema 定义（与实时机器人的 state_processor.encode_states
+    共用同一个编译后的编码器）：[x, y, mass] + 食物 k×(dx, dy) + 敌人 k×(dx, dy, mass)
+    + 病毒 k×(dx, dy) + 射出质量 k×(dx, dy) + 自身细胞 k×(dx, dy, mass)，
+    不足 k 个时补 0。默认参数下为 22 维，与原先的布局相同。
+    """
+
+    def __init__(self, k_food=5, k_enemies=3, k_viruses=0, k_mass_food=0, k_cells=0, schema=None):
+        self.schema = schema or ObservationSchema.nearest(k_food, k_enemies, k_viruses, k_mass_food, k_cells)
+        self.size = self.schema.size
+        self._encoder = self.schema.compile()
+
+    def encode(self, envs, players=None, out=None):
+        """编码 envs 的观察，返回 (B, size) 的 float32 数组，给出 out 时就地写入
+
+        players[b] 为第 b 行的视角玩家，默认是各环境的智能体（见 gather_entities）。
+        """
+        entities = {source: gather_entities(envs, source, players) for source in self.schema.sources}
+        return self._encoder.encode(_self_features(envs, players), entities, out)
+
+
+class GridEncoder:
+    """以智能体为中心的栅格密度观察
+
+    视野 [x - view, x + view) × [y - view, y + view) 划分为 size × size 个格子，
+    通道依次为食物（含射出质量）、敌人细胞、病毒的质量之和（除以 MASS_SCALE，截断到 1）。
+    所有环境、所有实体用一次 bincount 完成直方图统计。
+    布局：[x, y, mass] + 通道优先、行优先展平的 3 × size × size 栅格。
+    """
+
+    CHANNELS = (('food', 'mass_food'), ('enemy_cells',), ('viruses',))
+
+    def __init__(self, size=16, view=1000):
+        self.grid = int(size)
+        self.view = float(view)
+        self.size = 3 + len(self.CHANNELS) * self.grid * self.grid
+
+    def encode(self, envs, players=None, out=None):
+        """编码 envs 的观察，返回 (B, size) 的 float32 数组（players、out 见 NearestEncoder.encode）"""
+        px, py, pm = _self_features(envs, players)
+        n_envs, g, n_channels = len(envs), self.grid, len(self.CHANNELS)
+        flat, weights = [], []
+        for c, names in enumerate(self.CHANNELS):
+            for name in names:
+                x, y, mass, valid = gather_entities(envs, name, players)
+                ix = np.floor((x - px[:, None] + self.view) / (2 * self.view) * g)
+                iy = np.floor((y - py[:, None] + self.view) / (2 * self.view) * g)
+                inside = valid & (ix >= 0) & (ix < g) & (iy >= 0) & (iy < g)
+                b = np.broadcast_to(np.arange(n_envs)[:, None], x.shape)
+                index = ((b * n_channels + c) * g + iy.astype(np.int64)) * g + ix.astype(np.int64)
+                flat.append(index[inside])
+                weights.append(mass[inside])
+        hist = np.bincount(
+            np.concatenate(flat), weights=np.concatenate(weights), minlength=n_envs * n_channels * g * g
+        )
+        grid = np.minimum(hist.reshape(n_envs, -1) / MASS_SCALE, 1.0)
+        if out is None:
+            out = np.empty((n_envs, self.size), dtype=np.float32)
+        out[:, 0] = px / POS_SCALE
+        out[:, 1] = py / POS_SCALE
+        out[:, 2] = pm / MASS_SCALE
+        out[:, 3:] = grid
+        return out
+
+
+def make_encoder(config):
+    """根据配置创建观察编码器
+
+    config['observation']: 'nearest'（默认）或 'grid'。
+    nearest 模式读取 obsFoodK / obsEnemyK / obsVirusK / obsMassFoodK / obsCellK，
+    grid 模式读取 obsGridSize / obsGridView。
+    """
+    mode = config.get('observation', 'nearest')
+    if mode == 'nearest':
+        return NearestEncoder(schema=ObservationSchema.from_config(config))
+    if mode == 'grid':
+        return GridEncoder(size=config.get('obsGridSize', 16), view=config.get('obsGridView', 1000))
+    raise ValueError(f"Unknown observation mode: {mode}")
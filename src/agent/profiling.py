@@ -0,0 +1,111 @@
+import json
+import time
+from collections import deque
+
+import numpy as np
+
+
+# AgarEnvironment.step 的阶段（按执行顺序）
+PHASES = (
+    'action',            # 解析动作、分裂、射出质量
+    'update',            # _update_all_entities：机器人目标、移动、衰减
+    'food_collision',    # _check_player_food_collision
+    'mass_food',         # _check_mass_food_collision 和 _feed_viruses
+    'player_collision',  # _check_players_collision
+    'virus_collision',   # _check_player_virus_collision 和病毒再生
+    'respawn',           # 食物再生
+    'reward',            # _calculate_reward 和 _is_done
+    'observation',       # _get_observation
+)
+
+
+class StepProfiler:
+    """逐步计时与计数
+
+    环境在每个阶段结束时调用 lap(phase)，把距上一次 lap 的耗时累加到该阶段；
+    count(name, n) 累加计数。finish() 结束一步，返回本步的 {phase: 秒} 和计数，
+    并把它们加入最近 max_samples 步的样本中，供 summary() / histograms() 汇总。
+    环境的 profiler 为 None 时只多一次属性判断。
+    """
+
+    def __init__(self, max_samples=100000):
+        self.max_samples = max_samples
+        self.reset()
+
+    def reset(self):
+        """清空所有样本"""
+        self.samples = {}
+        self.counters = {}
+        self.steps = 0
+        self._step_times = {}
+        self._step_counts = {}
+        self._t = time.perf_counter()
+
+    def start(self):
+        """开始计时新的一步"""
+        self._step_times = {}
+        self._step_counts = {}
+        self._t = time.perf_counter()
+
+    def skip(self):
+        """丢弃距上一次 lap（或 start）的耗时，不计入任何阶段"""
+        self._t = time.perf_counter()
+
+    def lap(self, phase):
+        """把距上一次 lap（或 start）的耗时计入 phase"""
+        now = time.perf_counter()
+        self._step_times[phase] = self._step_times.get(phase, 0.0) + now - self._t
+        self._t = now
+
+    def count(self, name, n=1):
+        """本步的计数 name 增加 n"""
+        self._step_counts[name] = self._step_counts.get(name, 0) + n
+
+    def finish(self):
+        """结束一步，返回 {'times': {phase: 秒}, 'counts': {name: n}}"""
+        times, counts = self._step_times, self._step_counts
+        times['total'] = sum(times.values())
+        for phase, seconds in times.items():
+            if phase not in self.samples:
+                self.samples[phase] = deque(maxlen=self.max_samples)
+            self.samples[phase].append(seconds)
+        for name, n in counts.items():
+            self.counters[name] = self.counters.get(name, 0) + n
+        self.steps += 1
+        self.start()
+        return {'times': times, 'counts': counts}
+
+    def summary(self):
+        """各阶段耗时统计（毫秒）和累计计数"""
+        total = sum(self.samples.get('total', [])) or 1.0
+        phases = {}
+        for phase, values in self.samples.items():
+            ms = np.asarray(values) * 1e3
+            phases[phase] = {
+                'n': len(ms),
+                'mean_ms': float(ms.mean()),
+                'p50_ms': float(np.percentile(ms, 50)),
+                'p95_ms': float(np.percentile(ms, 95)),
+                'p99_ms': float(np.percentile(ms, 99)),
+                'max_ms': float(ms.max()),
+                'share': float(ms.sum() / 1e3 / total) if phase != 'total' else 1.0,
+            }
+        return {'steps': self.steps, 'phases': phases, 'counters': dict(self.counters)}
+
+    def histograms(self, bins=20):
+        """各阶段耗时直方图 {phase: {'edges_ms': [...], 'counts': [...]}}"""
+        result = {}
+        for phase, values in self.samples.items():
+            ms = np.asarray(values) * 1e3
+            lo, hi = float(ms.min()), float(ms.max())
+            if hi - lo < 1e-6:
+                # 耗时几乎相同时 np.histogram 无法划分出 bins 个区间，按同一个值处理
+                lo, hi = lo - 0.5, hi + 0.5
+            counts, edges = np.histogram(ms, bins=bins, range=(lo, hi))
+            result[phase] = {'edges_ms': edges.tolist(), 'counts': counts.tolist()}
+        return result
+
+    def export(self, path, bins=20):
+        """把 summary 和直方图写入 JSON 文件"""
+        with open(path, 'w') as f:
+            json.dump({'summary': self.summary(), 'histograms': self.histograms(bins)}, f, indent=2)
@@ -0,0 +1,233 @@
+"""对局记录：分块的列式二进制文件 + 小索引，读取时内存映射
+
+目录布局：
+    index.json                 列的 dtype/形状和每个块的行数
+    chunk_00000/obs.npy        每列一个 .npy 文件（观察、动作、奖励、结束标志、环境编号、局编号）
+    chunk_00000/snapshots.bin  可选的实体快照（env.pack_state 的结果）依次拼接
+    chunk_00000/snapshot_offsets.npy
+
+EpisodeRecorder 在内存中攒满 chunk_size 行后写出一个块并更新索引；
+ReplayDataset 用 np.load(mmap_mode='r') 打开各块，随机访问和采样不会把整个数据集读入内存。
+"""
+import json
+import os
+
+import gym
+import numpy as np
+from stable_baselines3.common.vec_env.base_vec_env import VecEnvWrapper
+
+from env import pack_state, unpack_state
+
+
+INDEX_FILE = 'index.json'
+
+
+class EpisodeRecorder:
+    """逐步追加 (obs, action, reward, done)，obs 为采取 action 时的观察"""
+
+    def __init__(self, directory, chunk_size=65536):
+        self.directory = directory
+        self.chunk_size = chunk_size
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, INDEX_FILE)
+        if os.path.exists(path):
+            # 在已有数据集后继续追加
+            with open(path) as f:
+                self.index = json.load(f)
+        else:
+            self.index = {'columns': None, 'chunks': [], 'episodes': 0}
+        self._next_episode = self.index['episodes']
+        self._episode_of = {}
+        self._rows = []
+        self._snapshots = []
+
+    def _episode(self, env_id):
+        if env_id not in self._episode_of:
+            self._episode_of[env_id] = self._next_episode
+            self._next_episode += 1
+        return self._episode_of[env_id]
+
+    def add(self, obs, action, reward, done, env_id=0, snapshot=None):
+        """记录一步；snapshot 为可选的 pack_state 字节串"""
+        self._rows.append((
+            np.asarray(obs, dtype=np.float32),
+            np.asarray(action, dtype=np.float32),
+            reward, done, env_id, self._episode(env_id)
+        ))
+        self._snapshots.append(snapshot or b'')
+        if done:
+            # 该环境的下一步属于新的一局
+            del self._episode_of[env_id]
+        if len(self._rows) >= self.chunk_size:
+            self.flush()
+
+    def end_episode(self, env_id=0):
+        """在没有 done 标志时（如实时对局断开）手动结束 env_id 当前的一局"""
+        self._episode_of.pop(env_id, None)
+
+    def add_batch(self, obs, actions, rewards, dones):
+        """记录向量化环境的一步，第 i 行的环境编号为 i"""
+        for i in range(len(obs)):
+            self.add(obs[i], actions[i], rewards[i], dones[i], env_id=i)
+
+    def flush(self):
+        """把缓冲的行写成一个块并更新索引"""
+        if not self._rows:
+            return
+        obs, actions, rewards, dones, env_ids, episodes = zip(*self._rows)
+        columns = {
+            'obs': np.stack(obs),
+            'action': np.stack(actions),
+            'reward': np.asarray(rewards, dtype=np.float32),
+            'done': np.asarray(dones, dtype=bool),
+            'env_id': np.asarray(env_ids, dtype=np.int32),
+            'episode': np.asarray(episodes, dtype=np.int64),
+        }
+        schema = {name: [str(a.dtype), list(a.shape[1:])] for name, a in columns.items()}
+        if self.index['columns'] is None:
+            self.index['columns'] = schema
+        elif self.index['columns'] != schema:
+            raise ValueError(f"Column layout {schema} does not match the dataset {self.index['columns']}")
+
+        name = f"chunk_{len(self.index['chunks']):05d}"
+        chunk_dir = os.path.join(self.directory, name)
+        os.makedirs(chunk_dir, exist_ok=True)
+        for column, array in columns.items():
+            np.save(os.path.join(chunk_dir, column + '.npy'), array)
+        has_snapshots = any(self._snapshots)
+        if has_snapshots:
+            offsets = np.concatenate([[0], np.cumsum([len(s) for s in self._snapshots])]).astype(np.int64)
+            np.save(os.path.join(chunk_dir, 'snapshot_offsets.npy'), offsets)
+            with open(os.path.join(chunk_dir, 'snapshots.bin'), 'wb') as f:
+                for snapshot in self._snapshots:
+                    f.write(snapshot)
+
+        self.index['chunks'].append({'name': name, 'rows': len(self._rows), 'snapshots': has_snapshots})
+        self.index['episodes'] = self._next_episode
+        self._write_index()
+        self._rows = []
+        self._snapshots = []
+
+    def _write_index(self):
+        path = os.path.join(self.directory, INDEX_FILE)
+        tmp = path + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(self.index, f)
+        os.replace(tmp, path)
+
+    def close(self):
+        self.flush()
+
+
+class ReplayDataset:
+    """内存映射读取 EpisodeRecorder 写出的数据集"""
+
+    def __init__(self, directory):
+        self.directory = directory
+        with open(os.path.join(directory, INDEX_FILE)) as f:
+            self.index = json.load(f)
+        self.columns = list(self.index['columns'] or {})
+        self.chunks = []
+        for chunk in self.index['chunks']:
+            chunk_dir = os.path.join(directory, chunk['name'])
+            arrays = {c: np.load(os.path.join(chunk_dir, c + '.npy'), mmap_mode='r') for c in self.columns}
+            if chunk['snapshots']:
+                arrays['snapshot_offsets'] = np.load(os.path.join(chunk_dir, 'snapshot_offsets.npy'), mmap_mode='r')
+                arrays['snapshots'] = np.memmap(os.path.join(chunk_dir, 'snapshots.bin'), dtype=np.uint8, mode='r')
+            self.chunks.append(arrays)
+        # 第 k 个块的全局起始行
+        self.starts = np.concatenate([[0], np.cumsum([c['rows'] for c in self.index['chunks']])]).astype(np.int64)
+
+    def __len__(self):
+        return int(self.starts[-1])
+
+    def _locate(self, rows):
+        rows = np.asarray(rows, dtype=np.int64)
+        if rows.size and (rows.min() < 0 or rows.max() >= len(self)):
+            raise IndexError('replay row out of range')
+        chunk = np.searchsorted(self.starts, rows, side='right') - 1
+        return chunk, rows - self.starts[chunk]
+
+    def get(self, rows):
+        """按全局行号取出若干行，返回 {列名: 数组}"""
+        chunk, local = self._locate(rows)
+        result = {}
+        for column in self.columns:
+            first = self.chunks[0][column] if self.chunks else np.zeros(0)
+            out = np.empty((len(local),) + first.shape[1:], dtype=first.dtype)
+            for k in np.unique(chunk):
+                mask = chunk == k
+                out[mask] = self.chunks[k][column][local[mask]]
+            result[column] = out
+        return result
+
+    def sample(self, batch_size, rng=None):
+        """均匀随机采样一个小批量"""
+        rng = rng or np.random
+        return self.get(rng.randint(0, len(self), size=batch_size))
+
+    def column(self, name):
+        """一列在所有块上的内存映射数组列表（零拷贝）"""
+        return [chunk[name] for chunk in self.chunks]
+
+    def snapshot(self, row):
+        """第 row 行记录的实体快照（get_state 格式），没有记录时返回 None"""
+        chunk, local = self._locate([row])
+        arrays = self.chunks[int(chunk[0])]
+        if 'snapshots' not in arrays:
+            return None
+        lo, hi = arrays['snapshot_offsets'][int(local[0]):int(local[0]) + 2]
+        if hi == lo:
+            return None
+        return unpack_state(arrays['snapshots'][lo:hi].tobytes())
+
+
+class RecordEpisodes(gym.Wrapper):
+    """记录单个 AgarEnvironment 的每一步；snapshot_every > 0 时每隔若干步附带实体快照"""
+
+    def __init__(self, env, recorder, snapshot_every=0):
+        super().__init__(env)
+        self.recorder = recorder
+        self.snapshot_every = snapshot_every
+        self._obs = None
+
+    def reset(self, **kwargs):
+        self._obs = self.env.reset(**kwargs)
+        return self._obs
+
+    def step(self, action):
+        snapshot = None
+        if self.snapshot_every and self.env.steps % self.snapshot_every == 0:
+            snapshot = pack_state(self.env.get_state())
+        obs, reward, done, info = self.env.step(action)
+        self.recorder.add(self._obs, action, reward, done, snapshot=snapshot)
+        self._obs = obs
+        return obs, reward, done, info
+
+
+class VecRecorder(VecEnvWrapper):
+    """记录向量化环境的每一步（第 i 个环境的环境编号为 i）"""
+
+    def __init__(self, venv, recorder):
+        super().__init__(venv)
+        self.recorder = recorder
+        self._obs = None
+        self._actions = None
+
+    def reset(self):
+        self._obs = self.venv.reset()
+        return self._obs
+
+    def step_async(self, actions):
+        self._actions = np.asarray(actions)
+        self.venv.step_async(actions)
+
+    def step_wait(self):
+        obs, rewards, dones, infos = self.venv.step_wait()
+        self.recorder.add_batch(self._obs, self._actions, rewards, dones)
+        self._obs = obs
+        return obs, rewards, dones, infos
+
+    def close(self):
+        self.recorder.close()
+        self.venv.close()
@@ -0,0 +1,412 @@
+"""无界面光栅化：把环境状态画成 RGB 帧，并离线编码成视频
+
+Rasterizer 把食物、射出质量、病毒和细胞（按 client/js/render.js 的顺序和配色）画进一个
+numpy 帧缓冲区：所有圆一次展开成逐行的水平区间再展开成像素（工作量与覆盖的像素数成正比），
+重叠的像素用深度缓冲区（np.maximum.at）决定可见的圆，不逐个圆调用绘图函数。
+视野可以是整张地图，也可以以智能体为中心（view 为半宽，世界单位）；supersample > 1 时
+先按倍数放大绘制再平均缩小，得到抗锯齿的小尺寸帧。
+
+render 直接读取运行中环境的实体（numpy 后端的 World 数组或对象后端的列表，不生成完整快照），
+地图尺寸每次从 env.config 读取（场景切换会改变地图）；render_state 渲染 AgarEnvironment.get_state()
+格式的快照，例如 recorder.RecordEpisodes 记录的快照，两者画出的帧逐像素一致。
+视野以外的实体在光栅化之前剔除。
+
+视频在帧收集完之后才编码（VideoRecorder 在一局结束时写出；render_replay 从数据集离线渲染）：
+.gif 使用 Pillow，其他格式（如 .mp4）使用 imageio（需要 imageio-ffmpeg）。
+
+用法:
+    python render.py replay data/replay out.mp4 --episode 0
+    python render.py play out.gif --model models/ppo_agar_agent.npz --steps 600
+"""
+import argparse
+
+import gym
+import numpy as np
+
+from env import AgarEnvironment, DEFAULT_CONFIG
+from world import cell_slots
+
+
+FOOD_RADIUS = 4
+# 细胞和射出质量的描边宽度（playerConfig.border）、病毒描边宽度的一半（virus.strokeWidth / 2），世界单位
+CELL_BORDER = 6
+VIRUS_BORDER = 10
+
+def rgba(rgb):
+    """(N, 3) 或 (3,) 的 RGB 颜色打包成 uint32 像素值（内存中按 R, G, B, A 排列）"""
+    rgb = np.asarray(rgb, dtype=np.uint8).reshape(-1, 3)
+    out = np.full((len(rgb), 4), 255, dtype=np.uint8)
+    out[:, :3] = rgb
+    return out.view(np.uint32).ravel()
+
+
+def hsl_colors(hue, lightness):
+    """饱和度 100% 的 hsl(hue, 100%, lightness) 转为 (N, 3) 的 uint8 颜色"""
+    hue = np.asarray(hue, dtype=np.float64)[:, None]
+    k = (np.array([0.0, 8.0, 4.0]) + hue / 30) % 12
+    a = min(lightness, 1 - lightness)
+    rgb = lightness - a * np.clip(np.minimum(k - 3, 9 - k), -1, 1)
+    return np.round(rgb * 255).astype(np.uint8)
+
+
+BACKGROUND = rgba((0xf2, 0xfb, 0xff))[0]
+OUTSIDE = rgba((0xd0, 0xd8, 0xdc))[0]
+# 网格线是不透明度 0.15 的黑线
+GRID_LINE = rgba(np.round(np.array([0xf2, 0xfb, 0xff]) * 0.85))[0]
+VIRUS_FILL = rgba((0x33, 0xff, 0x33))[0]
+VIRUS_STROKE = rgba((0x19, 0xd1, 0x19))[0]
+# 按整数色相查表：hsl(hue, 100%, 50%) 为填充色，hsl(hue, 100%, 45%) 为描边色
+FILL_PALETTE = rgba(hsl_colors(np.arange(360), 0.5))
+STROKE_PALETTE = rgba(hsl_colors(np.arange(360), 0.45))
+
+
+def _food_hues(uid):
+    """食物没有记录颜色，按 uid 取一个固定的色相"""
+    return (np.asarray(uid, dtype=np.int64) * 137) % 360
+
+
+class Rasterizer:
+    """把环境或 get_state() 快照画成 (height, width, 3) 的 uint8 帧
+
+    config: render_state 使用的配置（快照不包含地图尺寸）；render 使用环境当前的 env.config
+    size: 输出边长或 (width, height)，像素
+    view: 以智能体为中心的视野半宽（世界单位）；None 时显示整张地图
+    supersample: 内部按该倍数放大绘制，再平均缩小到 size
+    grid: 网格线间距（世界单位），0 时不画
+    """
+
+    def __init__(self, config=None, size=128, view=None, supersample=1, grid=50):
+        self.config = config or DEFAULT_CONFIG
+        self.width, self.height = (size, size) if np.isscalar(size) else size
+        if view is not None and view <= 0:
+            raise ValueError(f'view must be > 0, got {view}')
+        if supersample < 1:
+            raise ValueError(f'supersample must be >= 1, got {supersample}')
+        self.view = view
+        self.supersample = int(supersample)
+        self.grid = grid
+
+    def render(self, env):
+        """渲染环境的当前状态（直接读取实体，不调用 get_state）"""
+        center = (env.agent_player.x, env.agent_player.y)
+        return self._draw(self._env_layers(env), center, env.config)
+
+    def render_state(self, state, config=None):
+        """渲染一个 get_state() 快照；视野中心为快照中的第一个玩家（智能体）
+
+        config: 快照所在环境的配置，默认为构造时的 config
+        """
+        center = state['players'][0, :2] if len(state['players']) else None
+        return self._draw(self._layers(state), center, config or self.config)
+
+    def _draw(self, layers, center, config):
+        """按 _layers 的顺序画出各层，只保留与视野相交的圆"""
+        game_width, game_height = config['gameWidth'], config['gameHeight']
+        ss = self.supersample
+        width, height = self.width * ss, self.height * ss
+        if self.view is None or center is None:
+            cx, cy = game_width / 2, game_height / 2
+        else:
+            cx, cy = center
+        if self.view is None:
+            half_w = max(game_width / 2, game_height / 2 * width / height)
+        else:
+            half_w = self.view
+        scale = width / (2 * half_w)
+        # 视野左上角的世界坐标
+        left, top = cx - half_w, cy - height / (2 * scale)
+        right, bottom = left + width / scale, top + height / scale
+
+        frame = self._background(width, height, left, top, scale, game_width, game_height)
+        x, y, r, border, colors, border_colors = (np.concatenate(column) for column in zip(*layers))
+        # fill_circles 至少画出最近的像素，剔除时半径按不小于一个像素计
+        reach = np.maximum(r, 1 / scale)
+        visible = np.flatnonzero((x + reach > left) & (x - reach < right) & (y + reach > top) & (y - reach < bottom))
+        x, y, r, border, colors, border_colors = (
+            column[visible] for column in (x, y, r, border, colors, border_colors)
+        )
+        fill_circles(frame, (x - left) * scale, (y - top) * scale, r * scale, colors, border * scale, border_colors)
+        # uint32 的 RGBA 像素还原成 RGB（逐通道复制比按像素复制 3 字节快）
+        rgba = frame.view(np.uint8).reshape(height, width, 4)
+        if ss > 1:
+            rgb = rgba[..., :3].reshape(self.height, ss, self.width, ss, 3).mean(axis=(1, 3))
+            return rgb.round().astype(np.uint8)
+        rgb = np.empty((height, width, 3), dtype=np.uint8)
+        for channel in range(3):
+            rgb[..., channel] = rgba[..., channel]
+        return rgb
+
+    def _background(self, width, height, left, top, scale, game_width, game_height):
+        """背景色、地图外区域和网格线，返回 (height, width) 的 uint32 帧"""
+        wx = left + (np.arange(width) + 0.5) / scale
+        wy = top + (np.arange(height) + 0.5) / scale
+        frame = np.empty((height, width), dtype=np.uint32)
+        if self.grid:
+            # 像素列（行）与左边（上边）的像素之间跨过网格线时画线
+            col = np.floor(wx / self.grid) != np.floor((wx - 1 / scale) / self.grid)
+            row = np.floor(wy / self.grid) != np.floor((wy - 1 / scale) / self.grid)
+            frame[:] = np.where(col, GRID_LINE, BACKGROUND)
+            frame[row] = GRID_LINE
+        else:
+            frame[:] = BACKGROUND
+        # 地图外的区域是帧边缘的若干整行、整列
+        x0, x1 = np.searchsorted(wx, 0), np.searchsorted(wx, game_width, side='right')
+        y0, y1 = np.searchsorted(wy, 0), np.searchsorted(wy, game_height, side='right')
+        frame[:y0] = frame[y1:] = OUTSIDE
+        frame[:, :x0] = frame[:, x1:] = OUTSIDE
+        return frame
+
+    def _layers(self, state):
+        """快照的各层（见 _styled）"""
+        mass = state['mass_food']
+        return _styled(
+            state['food'][:, 0], state['food'][:, 1], state['food_uid'],
+            mass[:, 0], mass[:, 1], mass[:, 2], mass[:, 6].astype(np.int64),
+            state['viruses'][:, 0], state['viruses'][:, 1], state['viruses'][:, 2],
+            state['cells'][:, 0], state['cells'][:, 1], state['cells'][:, 2], state['cells'][:, 3],
+            state['cell_counts'], state['players'][:, 5]
+        )
+
+    def _env_layers(self, env):
+        """环境当前实体的各层（见 _styled），与 _layers(env.get_state()) 一致"""
+        players = [env.agent_player] + env.players
+        if env.world is not None:
+            a = env.arena
+            food, viruses, cells = env.world.food, env.world.viruses, env.world.cells
+            nf, nv = int(food.n_used[a]), int(viruses.n_used[a])
+            food_columns = food.x[a, :nf], food.y[a, :nf], food.uid[a, :nf]
+            virus_columns = viruses.x[a, :nv], viruses.y[a, :nv], viruses.mass[a, :nv]
+            slots, _ = cell_slots(players)
+            cell_columns = cells.x[a, slots], cells.y[a, slots], cells.mass[a, slots], cells.radius[a, slots]
+        else:
+            food_columns = (
+                np.array([f.x for f in env.food], dtype=np.float64),
+                np.array([f.y for f in env.food], dtype=np.float64),
+                np.array([f.uid for f in env.food], dtype=np.int64),
+            )
+            virus_columns = tuple(
+                np.array([getattr(v, k) for v in env.viruses], dtype=np.float64) for k in ('x', 'y', 'mass')
+            )
+            cell_columns = tuple(
+                np.array([getattr(c, k) for p in players for c in p.cells], dtype=np.float64)
+                for k in ('x', 'y', 'mass', 'radius')
+            )
+        mass_columns = env._mass_food_arrays(players)
+        return _styled(
+            *food_columns, *mass_columns[:3], mass_columns[-1], *virus_columns, *cell_columns,
+            np.array([len(p.cells) for p in players], dtype=np.int64),
+            np.array([p.hue for p in players], dtype=np.float64)
+        )
+
+
+def _styled(food_x, food_y, food_uid, mass_x, mass_y, mass_mass, mass_owner,
+            virus_x, virus_y, virus_mass, cell_x, cell_y, cell_mass, cell_radius, cell_counts, player_hue):
+    """按绘制顺序返回各层的 (x, y, radius, border, colors, border_colors)：
+    食物、射出质量、病毒、细胞（质量小的在下）；颜色为 uint32 像素值
+
+    mass_owner 为射出者在玩家中的下标（已出局为 -1），细胞按玩家顺序排列，cell_counts 为各玩家的细胞数。
+    """
+    colors = FILL_PALETTE[_food_hues(food_uid)]
+    food = (food_x, food_y, np.full(len(food_x), FOOD_RADIUS, dtype=np.float64), np.zeros(len(food_x)),
+            colors, colors)
+
+    hues = player_hue.astype(np.int64) % 360
+    mass_hue = np.where(mass_owner >= 0, hues[np.maximum(mass_owner, 0)] if len(hues) else 0, 0)
+    mass = (mass_x, mass_y, 4 + np.sqrt(mass_mass) * 6 - 1, np.full(len(mass_x), CELL_BORDER / 2 + 1),
+            FILL_PALETTE[mass_hue], STROKE_PALETTE[mass_hue])
+
+    n = len(virus_x)
+    viruses = (virus_x, virus_y, 4 + np.sqrt(virus_mass) * 6, np.full(n, VIRUS_BORDER),
+               np.full(n, VIRUS_FILL), np.full(n, VIRUS_STROKE))
+
+    cell_hue = np.repeat(hues, cell_counts)
+    order = np.argsort(cell_mass, kind='stable')
+    cells = (cell_x[order], cell_y[order], cell_radius[order], np.full(len(order), CELL_BORDER),
+             FILL_PALETTE[cell_hue[order]], STROKE_PALETTE[cell_hue[order]])
+    return food, mass, viruses, cells
+
+
+def _expand(starts, counts):
+    """把区间 [starts[i], starts[i] + counts[i]) 依次展开成一个下标数组（counts 已非负）"""
+    first = np.cumsum(counts) - counts
+    return np.repeat((starts - first).astype(np.int32), counts) + np.arange(int(counts.sum()), dtype=np.int32)
+
+
+def fill_circles(frame, x, y, radius, colors, border=None, border_colors=None):
+    """把若干实心圆画进 frame（(H, W) 的像素数组，就地修改），后面的圆覆盖前面的圆
+
+    colors 为 (N,) 的像素值，与 frame 同类型（Rasterizer 使用打包成 uint32 的 RGBA）；
+    x, y, radius 为像素坐标。border 给出时，距圆边 border 以内的部分使用 border_colors。
+    像素中心落在圆内即着色，半径小于一个像素的圆至少覆盖最近的像素（半径为 0 的圆不画）。
+
+    所有圆一次展开成逐行的水平区间，每行分成左描边、内部、右描边三段，再展开成像素，
+    每个像素只写一次深度：深度缓冲区保留最后一个覆盖它的区段。
+    """
+    height, width = frame.shape
+    drawn = np.flatnonzero(radius > 0)
+    if border is None:
+        border, border_colors = np.zeros(len(radius)), colors
+    x, y = x[drawn], y[drawn]
+    inner = np.maximum(radius[drawn] - border[drawn], 0)
+    radius = np.maximum(radius[drawn], 0.75)
+
+    # 每个圆覆盖的像素行（行中心在圆内），裁剪到帧内；行按圆的顺序排列
+    row_lo = np.clip(np.ceil(y - radius - 0.5), 0, height).astype(np.int64)
+    row_hi = np.clip(np.floor(y + radius - 0.5), -1, height - 1).astype(np.int64)
+    row_counts = np.maximum(row_hi - row_lo + 1, 0)
+    rows = _expand(row_lo, row_counts)
+    circle = np.repeat(np.arange(len(x)), row_counts)
+    cx, dy = x[circle], rows + 0.5 - y[circle]
+    # 每一行在圆内的像素列 [lo, hi]，以及其中不属于描边的部分 [inner_lo, inner_hi]
+    half = np.sqrt(np.maximum(radius[circle] ** 2 - dy * dy, 0))
+    lo = np.maximum(np.ceil(cx - half - 0.5), 0).astype(np.int64)
+    hi = np.minimum(np.floor(cx + half - 0.5), width - 1).astype(np.int64)
+    inner2 = inner[circle] ** 2 - dy * dy
+    inner_half = np.sqrt(np.maximum(inner2, 0))
+    inner_lo = np.where(inner2 >= 0, np.ceil(cx - inner_half - 0.5), hi + 1).astype(np.int64)
+    inner_lo = np.clip(inner_lo, lo, hi + 1)
+    inner_hi = np.clip(np.floor(cx + inner_half - 0.5).astype(np.int64), inner_lo - 1, hi)
+
+    # 区段按 (行, 左描边/内部/右描边) 排列，编号越大越靠上
+    starts = np.stack([lo, inner_lo, inner_hi + 1], axis=1).ravel()
+    ends = np.stack([inner_lo - 1, inner_hi, hi], axis=1).ravel()
+    counts = np.maximum(ends - starts + 1, 0)
+    segment_colors = np.stack([
+        border_colors[drawn][circle], colors[drawn][circle], border_colors[drawn][circle]
+    ], axis=1).ravel()
+    pixels = _expand(np.repeat(rows, 3) * width + starts, counts)
+
+    zbuffer = np.full(height * width, -1, dtype=np.int32)
+    np.maximum.at(zbuffer, pixels, np.repeat(np.arange(len(counts), dtype=np.int32), counts))
+    # 未覆盖的像素（深度 -1）取到的颜色被掩码丢弃
+    np.copyto(frame.reshape(-1), segment_colors[zbuffer], where=zbuffer >= 0)
+    return frame
+
+
+def write_video(frames, path, fps=30):
+    """把帧序列编码为视频：.gif 使用 Pillow，其他格式使用 imageio"""
+    frames = [np.asarray(frame, dtype=np.uint8) for frame in frames]
+    if not frames:
+        raise ValueError('no frames to write')
+    if path.lower().endswith('.gif'):
+        from PIL import Image
+
+        images = [Image.fromarray(frame) for frame in frames]
+        images[0].save(path, save_all=True, append_images=images[1:], duration=1000 / fps, loop=0)
+        return path
+    import imageio
+
+    imageio.mimwrite(path, frames, fps=fps)
+    return path
+
+
+class VideoRecorder(gym.Wrapper):
+    """每 every 步渲染一帧，一局结束（或 close）时编码为视频
+
+    path 中的 {episode} 替换为局编号，例如 'videos/episode_{episode}.mp4'。
+    帧先保存在内存中，编码不占用运行中的步。
+    """
+
+    def __init__(self, env, path, rasterizer=None, every=1, fps=30):
+        super().__init__(env)
+        self.path = path
+        self.rasterizer = rasterizer or Rasterizer(env.config)
+        self.every = every
+        self.fps = fps
+        self.episode = 0
+        self.frames = []
+        self._steps = 0
+
+    def reset(self, **kwargs):
+        self._write()
+        obs = self.env.reset(**kwargs)
+        self._steps = 0
+        self.frames.append(self.rasterizer.render(self.env))
+        return obs
+
+    def step(self, action):
+        obs, reward, done, info = self.env.step(action)
+        self._steps += 1
+        if done or self._steps % self.every == 0:
+            self.frames.append(self.rasterizer.render(self.env))
+        if done:
+            self._write()
+        return obs, reward, done, info
+
+    def _write(self):
+        if self.frames:
+            write_video(self.frames, self.path.format(episode=self.episode), self.fps)
+            self.episode += 1
+            self.frames = []
+
+    def close(self):
+        self._write()
+        return self.env.close()
+
+
+def render_replay(dataset, episode, path, rasterizer=None, fps=30):
+    """把 recorder.ReplayDataset 中一局记录的实体快照离线渲染成视频，返回帧数
+
+    需要用 RecordEpisodes(snapshot_every=k) 记录快照，没有快照的行被跳过。
+    """
+    rasterizer = rasterizer or Rasterizer()
+    rows = np.flatnonzero(np.concatenate(dataset.column('episode')) == episode) if len(dataset) else []
+    frames = []
+    for row in rows.tolist():
+        state = dataset.snapshot(row)
+        if state is not None:
+            frames.append(rasterizer.render_state(state))
+    if not frames:
+        raise ValueError(f'episode {episode} has no recorded snapshots')
+    write_video(frames, path, fps)
+    return len(frames)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest='cmd', required=True)
+    replay_parser = sub.add_parser('replay', help='渲染数据集中记录的一局')
+    replay_parser.add_argument('dataset')
+    replay_parser.add_argument('out')
+    replay_parser.add_argument('--episode', type=int, default=0)
+    play_parser = sub.add_parser('play', help='运行一局并录制')
+    play_parser.add_argument('out')
+    play_parser.add_argument('--model', default=None, help='numpy_policy 导出的 .npz，默认随机动作')
+    play_parser.add_argument('--steps', type=int, default=600)
+    play_parser.add_argument('--seed', type=int, default=0)
+    for p in (replay_parser, play_parser):
+        p.add_argument('--size', type=int, default=256)
+        p.add_argument('--view', type=float, default=None, help='以智能体为中心的视野半宽，默认整张地图')
+        p.add_argument('--supersample', type=int, default=1)
+        p.add_argument('--fps', type=int, default=30)
+    args = parser.parse_args()
+
+    rasterizer = Rasterizer(size=args.size, view=args.view, supersample=args.supersample)
+    if args.cmd == 'replay':
+        from recorder import ReplayDataset
+
+        count = render_replay(ReplayDataset(args.dataset), args.episode, args.out, rasterizer, args.fps)
+        print(f'[AI] {count} frames written to {args.out}')
+        return
+
+    env = AgarEnvironment()
+    env.seed(args.seed)
+    policy = None
+    if args.model:
+        from numpy_policy import NumpyPolicy
+
+        policy = NumpyPolicy(args.model)
+    obs = env.reset()
+    frames = [rasterizer.render(env)]
+    for _ in range(args.steps):
+        action = policy.predict(obs[None])[0] if policy else env.action_space.sample()
+        obs, _, done, _ = env.step(action)
+        frames.append(rasterizer.render(env))
+        if done:
+            break
+    write_video(frames, args.out, args.fps)
+    print(f'[AI] {len(frames)} frames written to {args.out}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,159 @@
+"""场景与课程：声明式地图定义、缓存的初始局面和按表现调整的难度
+
+场景是对 env.DEFAULT_CONFIG 的覆盖项，只能改变地图和对手相关的键（SCENARIO_KEYS）：
+地图尺寸、食物数量和密度场、病毒数量、机器人数量/初始质量/视野、出生点策略、
+规则策略接管的步数。LayoutCache 为每个场景预生成一批初始局面并在所有环境间共享，
+reset 时直接恢复（见 AgarEnvironment.set_state），不再重复生成。
+CurriculumScheduler 根据最近若干局的总奖励在难度等级之间升降。
+
+用法:
+    scheduler = CurriculumScheduler()
+    env.set_curriculum(scheduler)                      # 单个环境
+    venv.env_method('set_curriculum', scheduler)       # BatchedAgarVecEnv，所有竞技场共享难度
+"""
+from collections import deque
+
+import numpy as np
+
+from env import DEFAULT_CONFIG
+
+
+# 场景可以覆盖的配置键；其余键（移动、衰减、分裂等物理参数）在共享 World 的环境间必须一致
+SCENARIO_KEYS = {
+    'gameWidth', 'gameHeight', 'maxFood', 'maxViruses',
+    'foodClusters', 'foodBackground', 'foodUniformDisposition',
+    'botCount', 'botMass', 'botSight', 'newPlayerInitialPosition', 'ruleSteps',
+}
+
+# 内置场景，难度大致递增
+SCENARIOS = {
+    # 没有对手和病毒，食物集中在几处：学会移动和觅食
+    'forage': {
+        'botCount': 0, 'maxViruses': 0, 'ruleSteps': 0,
+        'foodClusters': [
+            {'x': 0.25, 'y': 0.25, 'spread': 0.08},
+            {'x': 0.75, 'y': 0.7, 'spread': 0.08},
+        ],
+    },
+    # 少量弱小、视野短的机器人
+    'easy': {
+        'botCount': 3, 'botMass': 0.75, 'botSight': 150, 'maxViruses': 5, 'ruleSteps': 0,
+    },
+    # 默认配置，但没有规则策略接管
+    'standard': {'ruleSteps': 0},
+    # 更大的地图，食物稀疏成团，机器人更多
+    'sparse': {
+        'gameWidth': 1000, 'gameHeight': 1000, 'maxFood': 600, 'maxViruses': 20,
+        'botCount': 8, 'ruleSteps': 0,
+        'foodClusters': [
+            {'x': 0.2, 'y': 0.5, 'spread': 0.1},
+            {'x': 0.8, 'y': 0.3, 'spread': 0.1, 'weight': 0.5},
+            {'x': 0.6, 'y': 0.85, 'spread': 0.05, 'weight': 0.5},
+        ],
+    },
+    # 机器人更多、更大、视野更远
+    'crowded': {
+        'gameWidth': 1000, 'gameHeight': 1000, 'maxFood': 1000, 'maxViruses': 20,
+        'botCount': 15, 'botMass': 2.0, 'botSight': 450, 'ruleSteps': 0,
+    },
+}
+
+DEFAULT_LEVELS = ('forage', 'easy', 'standard', 'sparse', 'crowded')
+
+
+def scenario_config(scenario, base=None):
+    """把场景覆盖项合并到 base（默认 DEFAULT_CONFIG），返回新的配置 dict
+
+    scenario 为 SCENARIOS 中的名字或覆盖项 dict；包含 SCENARIO_KEYS 之外的键时抛出 ValueError。
+    """
+    overrides = SCENARIOS[scenario] if isinstance(scenario, str) else scenario
+    unknown = set(overrides) - SCENARIO_KEYS
+    if unknown:
+        raise ValueError(f"Scenario keys not allowed: {sorted(unknown)}")
+    return dict(base or DEFAULT_CONFIG, **overrides)
+
+
+class LayoutCache:
+    """按场景名缓存预生成的初始局面，所有环境共享
+
+    第一次请求某个场景时，用请求它的环境（已切换到该场景的配置）生成 size 个局面。
+    """
+
+    def __init__(self, size=16):
+        self.size = size
+        self._layouts = {}
+
+    def layouts(self, name, env):
+        if name not in self._layouts:
+            self._layouts[name] = env.generate_layouts(self.size)
+        return self._layouts[name]
+
+    def clear(self):
+        self._layouts = {}
+
+
+class CurriculumScheduler:
+    """根据最近 window 局总奖励的均值在 levels（SCENARIOS 中的名字）之间升降难度
+
+    均值不低于 promote 时升一级，不高于 demote 时降一级；每次变化后清空记录，
+    在新难度上重新累计。所有共享同一调度器的环境在下一次 reset 时切换。
+    """
+
+    def __init__(self, levels=DEFAULT_LEVELS, window=50, promote=30.0, demote=0.0,
+                 base_config=None, cache=None, start_level=0):
+        """base_config 为合并场景覆盖项的基础配置，默认取第一个应用场景的环境的配置"""
+        if not levels:
+            raise ValueError('levels must not be empty')
+        self.levels = list(levels)
+        self.window = window
+        self.promote = promote
+        self.demote = demote
+        self.base_config = base_config
+        self.cache = cache or LayoutCache()
+        self.level = start_level
+        self.returns = deque(maxlen=window)
+        self.history = []
+        # 每个场景的配置只合并一次，环境间共享
+        self._configs = {}
+
+    @property
+    def scenario(self):
+        return self.levels[self.level]
+
+    def record(self, episode_return):
+        """记录一局的总奖励，必要时调整难度"""
+        self.returns.append(float(episode_return))
+        if len(self.returns) < self.window:
+            return
+        mean = float(np.mean(self.returns))
+        if mean >= self.promote and self.level < len(self.levels) - 1:
+            self._set_level(self.level + 1, mean)
+        elif mean <= self.demote and self.level > 0:
+            self._set_level(self.level - 1, mean)
+
+    def _set_level(self, level, mean):
+        self.history.append((self.scenario, self.levels[level], mean))
+        self.level = level
+        self.returns.clear()
+
+    def apply(self, env):
+        """让 env 使用当前难度的场景（已是该场景时不做任何事）"""
+        name = self.scenario
+        if env.scenario == name:
+            return
+        if name not in self._configs:
+            if self.base_config is None:
+                # 默认以第一个环境切换场景前的配置为基础
+                self.base_config = dict(env.config)
+            self._configs[name] = scenario_config(name, self.base_config)
+        env.apply_scenario(name, self._configs[name], self.cache)
+
+    def stats(self):
+        """当前难度、最近的平均奖励和难度变化记录"""
+        return {
+            'scenario': self.scenario,
+            'level': self.level,
+            'mean_return': float(np.mean(self.returns)) if self.returns else None,
+            'episodes': len(self.returns),
+            'history': list(self.history),
+        }
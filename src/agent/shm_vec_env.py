@@ -0,0 +1,212 @@
+import multiprocessing as mp
+import os
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+from stable_baselines3.common.vec_env.base_vec_env import VecEnv
+
+from env import AgarEnvironment, DEFAULT_CONFIG
+from vec_env import BatchedAgarVecEnv
+
+
+class SharedBuffers:
+    """共享内存块上的观察、动作、奖励、结束标志视图
+
+    布局按字段依次排列，父进程和 worker 用同样的参数构造即可得到相同的视图。
+    """
+
+    def __init__(self, buf, num_envs, obs_shape, act_dim):
+        fields = [
+            ('actions', (num_envs, act_dim), np.float32),
+            ('obs', (num_envs,) + tuple(obs_shape), np.float32),
+            ('terminal_obs', (num_envs,) + tuple(obs_shape), np.float32),
+            ('rewards', (num_envs,), np.float32),
+            ('dones', (num_envs,), np.bool_),
+        ]
+        offset = 0
+        for name, shape, dtype in fields:
+            array = np.ndarray(shape, dtype=dtype, buffer=buf, offset=offset)
+            setattr(self, name, array)
+            offset += array.nbytes
+        self.nbytes = offset
+
+    @classmethod
+    def size(cls, num_envs, obs_shape, act_dim):
+        """所需的共享内存字节数"""
+        return cls(None, num_envs, obs_shape, act_dim).nbytes
+
+
+def _worker(remote, parent_remote, shm_name, num_envs, obs_shape, act_dim, lo, hi, config, cpu):
+    """worker 进程：在 [lo, hi) 这些竞技场上运行一个 BatchedAgarVecEnv"""
+    parent_remote.close()
+    if cpu is not None:
+        os.sched_setaffinity(0, {cpu})
+    shm = SharedMemory(name=shm_name)
+    bufs = SharedBuffers(shm.buf, num_envs, obs_shape, act_dim)
+    venv = BatchedAgarVecEnv(num_envs=hi - lo, config=config)
+    try:
+        while True:
+            cmd, data = remote.recv()
+            if cmd == 'step':
+                venv.step_async(bufs.actions[lo:hi])
+                obs, rewards, dones, infos = venv.step_wait()
+                bufs.obs[lo:hi] = obs
+                bufs.rewards[lo:hi] = rewards
+                bufs.dones[lo:hi] = dones
+                for i in np.flatnonzero(dones):
+                    bufs.terminal_obs[lo + i] = infos[i].pop('terminal_observation')
+                # 只有小的 info 字典经管道返回
+                remote.send(infos)
+            elif cmd == 'reset':
+                bufs.obs[lo:hi] = venv.reset()
+                remote.send(None)
+            elif cmd == 'seed':
+                remote.send(venv.seed(data))
+            elif cmd == 'get_attr':
+                remote.send(venv.get_attr(*data))
+            elif cmd == 'set_attr':
+                remote.send(venv.set_attr(*data))
+            elif cmd == 'env_method':
+                name, args, kwargs, indices = data
+                remote.send(venv.env_method(name, *args, indices=indices, **kwargs))
+            elif cmd == 'close':
+                remote.close()
+                break
+            else:
+                raise NotImplementedError(f"`{cmd}` is not implemented in the worker")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        del bufs
+        shm.close()
+
+
+class SharedMemoryVecEnv(VecEnv):
+    """多进程 VecEnv：worker 把观察、奖励和结束标志直接写入共享内存
+
+    与 SubprocVecEnv 不同，观察等数组不经管道 pickle 传输，管道只传命令和
+    info 字典。num_envs 个竞技场尽量均分给 n_workers 个 worker，每个 worker
+    内部用 BatchedAgarVecEnv 批量模拟自己的若干竞技场。
+
+    pin_cpus: False 不绑定；True 按 worker 序号轮流绑定到可用 CPU；
+              也可以传入 CPU 编号列表（仅 Linux）。
+    """
+
+    def __init__(self, num_envs, n_workers=None, config=None, seed=None,
+                 pin_cpus=False, start_method=None):
+        config = config or dict(DEFAULT_CONFIG)
+        n_workers = min(num_envs, n_workers or os.cpu_count() or 1)
+        probe = AgarEnvironment(config=config)
+        obs_shape = probe.observation_space.shape
+        act_dim = probe.action_space.shape[0]
+        super().__init__(num_envs, probe.observation_space, probe.action_space)
+
+        self._shm = SharedMemory(create=True, size=SharedBuffers.size(num_envs, obs_shape, act_dim))
+        self._bufs = SharedBuffers(self._shm.buf, num_envs, obs_shape, act_dim)
+
+        if pin_cpus is True:
+            pin_cpus = sorted(os.sched_getaffinity(0))
+        cpus = [pin_cpus[w % len(pin_cpus)] if pin_cpus else None for w in range(n_workers)]
+
+        # 第 w 个 worker 负责竞技场 [bounds[w], bounds[w + 1])
+        self._bounds = np.linspace(0, num_envs, n_workers + 1).astype(int).tolist()
+
+        if start_method is None:
+            # fork 在已加载 torch 等线程库时不安全，与 SubprocVecEnv 保持一致
+            forkserver_available = 'forkserver' in mp.get_all_start_methods()
+            start_method = 'forkserver' if forkserver_available else 'spawn'
+        ctx = mp.get_context(start_method)
+
+        self.remotes, self.processes = [], []
+        for w in range(n_workers):
+            lo, hi = self._bounds[w], self._bounds[w + 1]
+            remote, work_remote = ctx.Pipe()
+            args = (work_remote, remote, self._shm.name, num_envs, obs_shape, act_dim, lo, hi, config, cpus[w])
+            process = ctx.Process(target=_worker, args=args, daemon=True)
+            process.start()
+            work_remote.close()
+            self.remotes.append(remote)
+            self.processes.append(process)
+
+        self.waiting = False
+        self.closed = False
+        if seed is not None:
+            self.seed(seed)
+
+    def reset(self):
+        for remote in self.remotes:
+            remote.send(('reset', None))
+        for remote in self.remotes:
+            remote.recv()
+        return self._bufs.obs.copy()
+
+    def step_async(self, actions):
+        self._bufs.actions[:] = np.asarray(actions, dtype=np.float32).reshape(self._bufs.actions.shape)
+        for remote in self.remotes:
+            remote.send(('step', None))
+        self.waiting = True
+
+    def step_wait(self):
+        infos = []
+        for remote in self.remotes:
+            infos.extend(remote.recv())
+        self.waiting = False
+        dones = self._bufs.dones.copy()
+        for i in np.flatnonzero(dones):
+            infos[i]['terminal_observation'] = self._bufs.terminal_obs[i].copy()
+        return self._bufs.obs.copy(), self._bufs.rewards.copy(), dones, infos
+
+    def seed(self, seed=None):
+        """第 i 个竞技场使用种子 seed + i"""
+        if seed is None:
+            seed = np.random.randint(0, 2 ** 31 - 1)
+        for remote, lo in zip(self.remotes, self._bounds):
+            remote.send(('seed', seed + lo))
+        return [s for remote in self.remotes for s in remote.recv()]
+
+    def close(self):
+        if self.closed:
+            return
+        if self.waiting:
+            for remote in self.remotes:
+                remote.recv()
+        for remote in self.remotes:
+            remote.send(('close', None))
+        for process in self.processes:
+            process.join()
+        del self._bufs
+        self._shm.close()
+        self._shm.unlink()
+        self.closed = True
+
+    def _call(self, cmd, make_data, indices):
+        """把全局下标按 worker 分组发送命令，按 indices 的顺序返回结果"""
+        indices = list(self._get_indices(indices))
+        groups = {}
+        for pos, i in enumerate(indices):
+            w = int(np.searchsorted(self._bounds, i, side='right')) - 1
+            groups.setdefault(w, []).append((pos, i - self._bounds[w]))
+        for w, items in groups.items():
+            self.remotes[w].send((cmd, make_data([local for _, local in items])))
+        results = [None] * len(indices)
+        for w, items in groups.items():
+            values = self.remotes[w].recv()
+            for (pos, _), value in zip(items, values or [None] * len(items)):
+                results[pos] = value
+        return results
+
+    def get_attr(self, attr_name, indices=None):
+        return self._call('get_attr', lambda local: (attr_name, local), indices)
+
+    def set_attr(self, attr_name, value, indices=None):
+        self._call('set_attr', lambda local: (attr_name, value, local), indices)
+
+    def env_method(self, method_name, *method_args, indices=None, **method_kwargs):
+        return self._call(
+            'env_method',
+            lambda local: (method_name, method_args, method_kwargs, local),
+            indices
+        )
+
+    def env_is_wrapped(self, wrapper_class, indices=None):
+        return [False for _ in self._get_indices(indices)]
@@ -0,0 +1,152 @@
+import math
+
+import numpy as np
+
+
+# 默认网格边长，约为初始玩家直径的两倍
+DEFAULT_CELL_SIZE = 64
+
+
+class SpatialHash:
+    """均匀网格空间索引（哈希桶）
+
+    实体用整数 uid 标识，按 (x // cell_size, y // cell_size) 放入桶中。
+    插入、删除都是 O(1) 的增量更新（食物和病毒生成后不移动）；查询结果按 uid 升序（半径查询）
+    或按 (距离, uid) 升序（最近邻查询）返回。uid 按生成顺序递增时，
+    结果与按生成顺序做线性扫描逐位一致。
+    """
+
+    def __init__(self, cell_size=DEFAULT_CELL_SIZE):
+        self.cell_size = float(cell_size)
+        self.buckets = {}     # (ix, iy) -> {uid: (x, y)}
+        self.keys = {}        # uid -> (ix, iy)
+        # 出现过的桶坐标范围，用于限制最近邻搜索的圈数（只增不减）
+        self._extent = None
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __contains__(self, uid):
+        return uid in self.keys
+
+    def _key(self, x, y):
+        return (math.floor(x / self.cell_size), math.floor(y / self.cell_size))
+
+    def _grow_extent(self, key):
+        if self._extent is None:
+            self._extent = [key[0], key[1], key[0], key[1]]
+            return
+        e = self._extent
+        e[0] = min(e[0], key[0])
+        e[1] = min(e[1], key[1])
+        e[2] = max(e[2], key[0])
+        e[3] = max(e[3], key[1])
+
+    def insert(self, uid, x, y):
+        """插入实体"""
+        key = self._key(x, y)
+        self.buckets.setdefault(key, {})[uid] = (x, y)
+        self.keys[uid] = key
+        self._grow_extent(key)
+
+    def insert_many(self, uids, xs, ys):
+        """批量插入，参数为等长序列；桶坐标和范围一次向量化计算"""
+        xs = np.asarray(xs, dtype=np.float64)
+        ys = np.asarray(ys, dtype=np.float64)
+        if len(xs) == 0:
+            return
+        ix = np.floor(xs / self.cell_size).astype(np.int64)
+        iy = np.floor(ys / self.cell_size).astype(np.int64)
+        self._grow_extent((int(ix.min()), int(iy.min())))
+        self._grow_extent((int(ix.max()), int(iy.max())))
+        buckets, keys = self.buckets, self.keys
+        for uid, x, y, key in zip(uids, xs.tolist(), ys.tolist(), zip(ix.tolist(), iy.tolist())):
+            buckets.setdefault(key, {})[uid] = (x, y)
+            keys[uid] = key
+
+    def remove(self, uid):
+        """删除实体，不存在时忽略"""
+        key = self.keys.pop(uid, None)
+        if key is None:
+            return
+        bucket = self.buckets[key]
+        del bucket[uid]
+        if not bucket:
+            del self.buckets[key]
+
+    def copy(self):
+        """索引的副本（逐桶浅拷贝，比逐个重新插入快得多）"""
+        other = SpatialHash(self.cell_size)
+        other.buckets = {key: dict(bucket) for key, bucket in self.buckets.items()}
+        other.keys = dict(self.keys)
+        other._extent = list(self._extent) if self._extent is not None else None
+        return other
+
+    def clear(self):
+        self.buckets.clear()
+        self.keys.clear()
+        self._extent = None
+
+    def position(self, uid):
+        """实体当前位置"""
+        return self.buckets[self.keys[uid]][uid]
+
+    def query_radius(self, x, y, radius):
+        """距离 (x, y) 严格小于 radius 的实体，返回按 uid 升序的 [(uid, dist)]"""
+        x0, y0 = self._key(x - radius, y - radius)
+        x1, y1 = self._key(x + radius, y + radius)
+        found = []
+        buckets = self.buckets
+        if (x1 - x0 + 1) * (y1 - y0 + 1) > len(buckets):
+            # 查询范围比已占用的桶还多时直接遍历桶
+            keys = [k for k in buckets if x0 <= k[0] <= x1 and y0 <= k[1] <= y1]
+        else:
+            keys = [(i, j) for i in range(x0, x1 + 1) for j in range(y0, y1 + 1)]
+        for key in keys:
+            bucket = buckets.get(key)
+            if not bucket:
+                continue
+            for uid, (ex, ey) in bucket.items():
+                dist = math.sqrt((x - ex) ** 2 + (y - ey) ** 2)
+                if dist < radius:
+                    found.append((uid, dist))
+        found.sort()
+        return found
+
+    def _ring(self, cx, cy, r):
+        """切比雪夫距离恰为 r 的桶坐标"""
+        if r == 0:
+            yield (cx, cy)
+            return
+        for i in range(cx - r, cx + r + 1):
+            yield (i, cy - r)
+            yield (i, cy + r)
+        for j in range(cy - r + 1, cy + r):
+            yield (cx - r, j)
+            yield (cx + r, j)
+
+    def nearest(self, x, y, k=1):
+        """距离 (x, y) 最近的 k 个实体，返回按 (dist, uid) 升序的 [(uid, dist)]
+
+        距离相同时 uid 小者优先，与 np.argmin 取第一个最小值的语义一致。
+        """
+        if not self.keys or k <= 0:
+            return []
+        cx, cy = self._key(x, y)
+        e = self._extent
+        max_r = max(cx - e[0], cy - e[1], e[2] - cx, e[3] - cy, 0)
+        found = []
+        for r in range(max_r + 1):
+            for key in self._ring(cx, cy, r):
+                bucket = self.buckets.get(key)
+                if not bucket:
+                    continue
+                for uid, (ex, ey) in bucket.items():
+                    found.append((math.sqrt((x - ex) ** 2 + (y - ey) ** 2), uid))
+            # 第 r 圈之外的实体距离至少为 r * cell_size
+            if len(found) >= k:
+                found.sort()
+                if found[k - 1][0] < r * self.cell_size:
+                    break
+        found.sort()
+        return [(uid, dist) for dist, uid in found[:k]]
@@ -1,5 +1,85 @@
+import heapq
+from operator import itemgetter
+
 import numpy as np
 
+from obs_schema import DEFAULT_SCHEMA
+
+# 模型输入：自身 3 维 + 最近 N_FOODS 个食物 (dx, dy) + 最近 N_ENEMIES 个敌人 (dx, dy, mass)
+# 布局和尺度由 obs_schema.DEFAULT_SCHEMA 定义，与训练环境相同
+N_FOODS = DEFAULT_SCHEMA.groups[0].k
+N_ENEMIES = DEFAULT_SCHEMA.groups[1].k
+OBS_SIZE = DEFAULT_SCHEMA.size
+
+
+def _column(items, key):
+    """[{key: ...}] 中一个字段转换为一维数组"""
+    return np.fromiter(map(itemgetter(key), items), dtype=np.float64, count=len(items))
+
+
+def _entity_arrays(items, mass_key='mass'):
+    """[{x, y, mass_key}] 转换为 (x, y, mass) 一维数组；mass_key 为 None 时不读取质量，mass 为 0"""
+    mass = _column(items, mass_key) if mass_key is not None else np.zeros(len(items))
+    return _column(items, 'x'), _column(items, 'y'), mass
+
+
+def _frame_rows(state, source, with_mass=True):
+    """一帧服务器数据中一类实体的 (x, y, mass) 数组（来源名与 obs_schema.SOURCES 相同）
+
+    with_mass 为 False 时不读取质量字段（例如服务器数据中的食物可能没有 mass）。
+    """
+    me, players, foods, masses, viruses = state
+    mass_key = 'mass' if with_mass else None
+    if source == 'food':
+        return _entity_arrays(foods, mass_key)
+    if source == 'viruses':
+        return _entity_arrays(viruses, mass_key)
+    if source == 'mass_food':
+        return _entity_arrays(masses, mass_key)
+    others = [p for p in players if p['id'] != me['id']]
+    if source == 'enemies':
+        return _entity_arrays(others, 'massTotal' if with_mass else None)
+    if source == 'own_cells':
+        return _entity_arrays(me.get('cells', []), mass_key)
+    return _entity_arrays([c for p in others for c in p.get('cells', [])], mass_key)
+
+
+def _pad(rows):
+    """把每帧的 (x, y, mass) 一维数组填充成 (B, N) 数组和有效掩码"""
+    width = max([len(x) for x, _, _ in rows] + [0])
+    x = np.zeros((len(rows), width))
+    y = np.zeros((len(rows), width))
+    mass = np.zeros((len(rows), width))
+    valid = np.zeros((len(rows), width), dtype=bool)
+    for b, (rx, ry, rm) in enumerate(rows):
+        n = len(rx)
+        x[b, :n] = rx
+        y[b, :n] = ry
+        mass[b, :n] = rm
+        valid[b, :n] = True
+    return x, y, mass, valid
+
+
+def frame_entities(states, source, with_mass=True):
+    """多帧服务器数据中一类实体的填充数组 (x, y, mass, valid)，形状 (B, N)"""
+    return _pad([_frame_rows(state, source, with_mass) for state in states])
+
+
+def encode_states(states, schema=DEFAULT_SCHEMA, out=None):
+    """把多个机器人的帧数据一次编码为模型输入，返回 (B, schema.size) 的 float32 数组
+
+    states 的每一项为 (me, players, foods, masses, viruses)，即 serverTellPlayerMove
+    的参数。使用与训练环境相同的编译后编码器（obs_schema），给出 out 时就地写入；
+    两条路径的一致性可以用 obs_schema.check_parity 对记录的帧检查。
+    """
+    me = [s[0] for s in states]
+    selves = (_column(me, 'x'), _column(me, 'y'), _column(me, 'massTotal'))
+    # 只读取布局中用到质量的分组的质量字段
+    mass_sources = {g.source for g in schema.groups if g.with_mass}
+    entities = {source: frame_entities(states, source, source in mass_sources) for source in schema.sources}
+    return schema.compile().encode(selves, entities, out)
+
+
 def extract_observation(me, players, foods, masses, viruses):
     # 假设提取中心点和周围5个单位的相对位置与质量
     obs = {
@@ -9,13 +89,13 @@ def extract_observation(me, players, foods, masses, viruses):
         'nearby_foods': [],
         'nearby_enemies': [],
     }
-    foods_sorted = sorted(foods, key=lambda f: (f['x'] - me['x']) ** 2 + (f['y'] - me['y']) ** 2)
-    for f in foods_sorted[:5]:
+    # 最近的食物和敌人用部分选择取出，不对全部实体排序（与 sorted(...)[:k] 结果相同）
+    distance = lambda e: (e['x'] - me['x']) ** 2 + (e['y'] - me['y']) ** 2
+    for f in heapq.nsmallest(N_FOODS, foods, key=distance):
         obs['nearby_foods'].append([f['x'] - me['x'], f['y'] - me['y']])
 
     enemies = [p for p in players if p['id'] != me['id']]
-    enemies_sorted = sorted(enemies, key=lambda p: (p['x'] - me['x']) ** 2 + (p['y'] - me['y']) ** 2)
-    for p in enemies_sorted[:3]:
+    for p in heapq.nsmallest(N_ENEMIES, enemies, key=distance):
         obs['nearby_enemies'].append([
             p['x'] - me['x'], p['y'] - me['y'], p['massTotal']
         ])
@@ -23,8 +103,19 @@ def extract_observation(me, players, foods, masses, viruses):
     return obs
 
 def format_action(action, me):
+    """模型动作 [dx, dy, split, eject] 转换为 '0' 事件的目标坐标，只用前两维（其余见 action_events）"""
     # 例：将方向向量转换为目标坐标
-    dx, dy = action  # 模型输出方向
+    dx, dy = action[:2]  # 模型输出方向
     scale = 200
     return {'x': me['x'] + dx * scale, 'y': me['y'] + dy * scale}
 
+
+def action_events(action):
+    """动作中要额外发送的事件：分裂为 '2'，射出质量为 '1'（与训练环境相同，大于 0.5 时触发）"""
+    events = []
+    if len(action) > 2 and action[2] > 0.5:
+        events.append('2')
+    if len(action) > 3 and action[3] > 0.5:
+        events.append('1')
+    return events
+
@@ -0,0 +1,52 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from async_agent import AsyncBot
+from test_bot_server import fake_frame
+
+
+class FakeAsyncSio:
+    def __init__(self):
+        self.emitted = []
+
+    async def emit(self, event, data=None):
+        self.emitted.append((event, data))
+
+
+def test_decide_loop_survives_failed_decisions():
+    calls = []
+
+    def predict(states):
+        calls.append(len(states))
+        if len(calls) == 1:
+            raise RuntimeError('inference failed')
+        return np.array([[0.0, 1.0, 1.0, 0.0]], dtype=np.float32)
+
+    async def wait_until(condition):
+        for _ in range(200):
+            if condition():
+                return
+            await asyncio.sleep(0.005)
+        raise AssertionError('timed out')
+
+    async def run():
+        executor = ThreadPoolExecutor(max_workers=1)
+        bot = AsyncBot('py_ai_test', 'http://localhost:3000', predict, executor)
+        bot.sio = FakeAsyncSio()
+        task = asyncio.create_task(bot._decide_loop())
+        await bot.on_game_state(*fake_frame())
+        await wait_until(lambda: len(calls) == 1)
+        await bot.on_game_state(*fake_frame())
+        await wait_until(lambda: bot.decisions == 1)
+        assert not task.done()
+        task.cancel()
+        executor.shutdown()
+        return bot
+
+    bot = asyncio.run(run())
+    assert calls == [1, 1]
+    assert bot.decisions == 1
+    assert bot.latest_target == {'x': 1000.0, 'y': 2200.0}
+    assert bot.sio.emitted == [('0', {'x': 1000.0, 'y': 2200.0}), ('2', None)]
@@ -0,0 +1,68 @@
+import json
+import math
+import sys
+
+import pytest
+
+import benchmark
+
+
+def test_quick_run_covers_every_benchmark():
+    result = benchmark.run_all(quick=True)
+    assert result['meta']['quick'] is True
+    names = result['results']
+    for backend in ('object', 'numpy'):
+        for scenario, _ in benchmark.ENV_SCENARIOS:
+            assert f'env_steps/{backend}/{scenario}' in names
+    for prefix in ('vec_env_steps/', 'reset/', 'encode/', 'extract_observation/', 'encode_states/'):
+        assert any(name.startswith(prefix) for name in names), prefix
+    for metric in names.values():
+        assert math.isfinite(metric['value']) and metric['value'] > 0
+
+
+def write_results(path, values):
+    results = {
+        name: benchmark._metric(value, unit, unit == 'steps/s')
+        for name, (value, unit) in values.items()
+    }
+    path.write_text(json.dumps({'meta': {}, 'results': results}))
+    return str(path)
+
+
+def test_compare_flags_regressions(tmp_path, monkeypatch, capsys):
+    baseline = write_results(tmp_path / 'baseline.json', {
+        'env_steps/object/base': (1000.0, 'steps/s'),
+        'env_steps/numpy/base': (800.0, 'steps/s'),
+        'reset/object': (2.0, 'ms'),
+        'encode/nearest': (0.5, 'ms'),
+    })
+    current = write_results(tmp_path / 'current.json', {
+        'env_steps/object/base': (850.0, 'steps/s'),   # 吞吐量下降 15%
+        'env_steps/numpy/base': (840.0, 'steps/s'),    # 吞吐量上升 5%
+        'reset/object': (2.1, 'ms'),                   # 延迟升高 5%，在阈值内
+        'vec_env_steps/base': (100.0, 'steps/s'),      # 基线中没有，忽略
+    })
+
+    rows = benchmark.compare(benchmark._load(baseline), benchmark._load(current))
+    # 按名称排序，只对比两边都有的基准；相对变化为正表示变好
+    assert [row[0] for row in rows] == ['env_steps/numpy/base', 'env_steps/object/base', 'reset/object']
+    changes = {name: (change, regressed) for name, _, _, change, regressed in rows}
+    assert math.isclose(changes['env_steps/object/base'][0], -0.15) and changes['env_steps/object/base'][1]
+    assert math.isclose(changes['env_steps/numpy/base'][0], 0.05) and not changes['env_steps/numpy/base'][1]
+    assert math.isclose(changes['reset/object'][0], -0.05) and not changes['reset/object'][1]
+
+    # 命令行对比：有回归时输出标记并以 1 退出
+    monkeypatch.setattr(sys, 'argv', ['benchmark.py', 'compare', baseline, current])
+    with pytest.raises(SystemExit) as exc:
+        benchmark.main()
+    assert exc.value.code == 1
+    lines = capsys.readouterr().out.splitlines()
+    assert lines[0].split() == ['benchmark', 'baseline', 'current', 'change']
+    flagged = [line.split()[0] for line in lines[1:] if line.endswith('REGRESSION')]
+    assert flagged == ['env_steps/object/base']
+    assert '-15.0%' in lines[2]
+
+    # 放宽阈值后没有回归，正常返回
+    monkeypatch.setattr(sys, 'argv', ['benchmark.py', 'compare', baseline, current, '--threshold', '0.2'])
+    benchmark.main()
+    assert 'REGRESSION' not in capsys.readouterr().out
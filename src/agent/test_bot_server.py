@@ -0,0 +1,65 @@
+import numpy as np
+
+from bot_server import BotConnection, InferenceQueue
+from state_processor import OBS_SIZE, encode_states
+
+
+def fake_frame(x=1000.0, y=2000.0):
+    """一帧 serverTellPlayerMove 的参数：自己、一个敌人、两个食物"""
+    me = {'id': 'me', 'x': x, 'y': y, 'massTotal': 20, 'cells': [{'x': x, 'y': y, 'mass': 20}]}
+    enemy = {'id': 'enemy', 'x': x + 300, 'y': y, 'massTotal': 50, 'cells': [{'x': x + 300, 'y': y, 'mass': 50}]}
+    foods = [{'x': x + 10, 'y': y, 'mass': 1}, {'x': x, 'y': y - 40, 'mass': 1}]
+    return me, [me, enemy], foods, [], []
+
+
+class FakeSio:
+    def __init__(self):
+        self.emitted = []
+
+    def emit(self, event, data=None):
+        self.emitted.append((event, data))
+
+
+def test_inference_queue_batches_and_survives_callback_errors():
+    batches = []
+
+    def predict_batch(states):
+        obs = encode_states(states)
+        assert obs.shape == (len(states), OBS_SIZE)
+        batches.append(len(states))
+        return np.tile([0.5, -0.5, 0.0, 0.0], (len(states), 1))
+
+    results = []
+
+    def fail(action):
+        raise ValueError('bad callback')
+
+    queue = InferenceQueue(predict_batch, max_batch=8, max_wait=0.05)
+    queue.submit(fake_frame(), fail)
+    for _ in range(3):
+        queue.submit(fake_frame(), results.append)
+    queue.close()
+
+    assert len(results) == 3
+    assert queue.requests == 4
+    assert sum(batches) == 4
+    np.testing.assert_array_equal(results[0], [0.5, -0.5, 0.0, 0.0])
+
+
+def test_bot_connection_acts_on_four_dim_actions():
+    actions = np.array([[1.0, -1.0, 1.0, 1.0]], dtype=np.float32)
+    queue = InferenceQueue(lambda states: np.repeat(actions, len(states), axis=0), max_wait=0.0)
+    bot = BotConnection('py_ai_test', 'http://localhost:3000', queue)
+    bot.sio = FakeSio()
+
+    bot.on_game_state(*fake_frame())
+    queue.close()
+
+    assert bot.latest_target == {'x': 1200.0, 'y': 1800.0}
+    assert [event for event, _ in bot.sio.emitted] == ['2', '1']
+
+    # 直接调用：不分裂、不射出时只更新目标
+    bot.sio = FakeSio()
+    bot._act(np.array([0.0, 0.5, 0.0, 0.0], dtype=np.float32), fake_frame()[0])
+    assert bot.latest_target == {'x': 1000.0, 'y': 2100.0}
+    assert bot.sio.emitted == []
@@ -0,0 +1,83 @@
+import numpy as np
+
+from bots import RETARGET_PROB, bot_policy
+from env import AgarEnvironment, DEFAULT_CONFIG, nearest_food_arrays, nearest_food_objects
+
+
+def layout():
+    """一个竞技场 5 个玩家：0 号是 AI 玩家，1 号被 2 号追赶，3 号追赶 0 号，4 号附近没有玩家"""
+    px = np.array([[450.0, 100.0, 150.0, 400.0, 100.0]])
+    py = np.array([[400.0, 100.0, 100.0, 400.0, 800.0]])
+    mass = np.array([[10.0, 10.0, 100.0, 50.0, 20.0]])
+    valid = np.ones((1, 5), dtype=bool)
+    food_x = np.full((1, 5), 120.0)
+    food_y = np.full((1, 5), 130.0)
+    has_food = np.ones((1, 5), dtype=bool)
+    return px, py, mass, valid, food_x, food_y, has_food
+
+
+def test_bot_policy_priorities():
+    px, py, mass, valid, food_x, food_y, has_food = layout()
+    draws = np.ones((1, 5, 3))
+    target_x, target_y, keep = bot_policy(px, py, mass, valid, food_x, food_y, has_food, draws, 1000.0, 1000.0)
+    # 1 号躲避更大的 2 号：沿远离方向移动视野距离，限制在地图内
+    assert (target_x[0, 1], target_y[0, 1]) == (0.0, 100.0)
+    # 2 号和 3 号追逐视野内最近的更小玩家
+    assert (target_x[0, 2], target_y[0, 2]) == (100.0, 100.0)
+    assert (target_x[0, 3], target_y[0, 3]) == (450.0, 400.0)
+    # 4 号视野内没有玩家，去最近的食物
+    assert (target_x[0, 4], target_y[0, 4]) == (120.0, 130.0)
+    assert not keep.any()
+
+    # 没有食物时保持原目标
+    has_food[0, 4] = False
+    _, _, keep = bot_policy(px, py, mass, valid, food_x, food_y, has_food, draws, 1000.0, 1000.0)
+    assert keep[0].tolist() == [False, False, False, False, True]
+
+    # 随机换目标优先于追逐和食物，但不优先于躲避
+    draws[0, :, 0] = RETARGET_PROB / 2
+    draws[0, :, 1:] = 0.25
+    target_x, target_y, keep = bot_policy(px, py, mass, valid, food_x, food_y, has_food, draws, 1000.0, 1000.0)
+    assert (target_x[0, 1], target_y[0, 1]) == (0.0, 100.0)
+    for b in (2, 3, 4):
+        assert (target_x[0, b], target_y[0, b]) == (250.0, 250.0)
+
+    # 视野缩短后 2 号看不到 1 号，1 号也不再躲避
+    draws = np.ones((1, 5, 3))
+    target_x, target_y, _ = bot_policy(px, py, mass, valid, food_x, food_y, has_food, draws, 1000.0, 1000.0, sight=40)
+    assert (target_x[0, 1], target_y[0, 1]) == (120.0, 130.0)
+    assert (target_x[0, 2], target_y[0, 2]) == (120.0, 130.0)
+
+    # 无效槽位不参与
+    valid[0, 2] = False
+    target_x, target_y, _ = bot_policy(px, py, mass, valid, food_x, food_y, has_food, draws, 1000.0, 1000.0)
+    assert (target_x[0, 1], target_y[0, 1]) == (120.0, 130.0)
+
+
+def test_nearest_food_queries_agree():
+    rng = np.random.RandomState(0)
+    envs = {}
+    for backend in ('object', 'numpy'):
+        env = AgarEnvironment(config=dict(DEFAULT_CONFIG, botCount=12), backend=backend)
+        env.seed(4)
+        env.reset()
+        for _ in range(20):
+            if env.step(np.concatenate([rng.uniform(-1, 1, 2), [0, 0]]))[2]:
+                env.reset()
+        envs[backend] = env
+
+    env = envs['object']
+    players = env.players
+    assert len(players) > 3
+    expected = [env._nearest_food(p) for p in players]
+    assert nearest_food_objects([env] * len(players), players) == expected
+    # 被吃掉、重新生成后坐标数组仍与食物一致
+    np.testing.assert_array_equal(env._food_xy[:len(env.food)], [(f.x, f.y) for f in env.food])
+
+    numpy_env = envs['numpy']
+    assert nearest_food_arrays([numpy_env] * len(numpy_env.players), numpy_env.players) == \
+        [numpy_env._nearest_food(p) for p in numpy_env.players]
+
+    # 没有食物时为 None
+    env._remove_food(list(env.food))
+    assert nearest_food_objects([env], players[:1]) == [None]
@@ -1,4 +1,7 @@
-from demo import AgarEnvironment
+import numpy as np
+import pytest
+
+from env import AgarEnvironment, DEFAULT_CONFIG, pack_state, unpack_state
 
 
 def test_env():
@@ -24,4 +27,143 @@ def test_env():
     
     env.close()
 
-test_env()
+
+def random_action(rng):
+    """随机方向，偶尔分裂、射出质量"""
+    return np.concatenate([rng.uniform(-1, 1, 2), rng.random_sample(2) < (0.05, 0.1)])
+
+
+def assert_same_state(a, b):
+    """两个 get_state() 快照一致；玩家颜色（未设种子的 random）除外"""
+    assert a.keys() == b.keys()
+    for key in a:
+        x, y = a[key], b[key]
+        if key == 'players':
+            x, y = np.delete(x, 5, axis=1), np.delete(y, 5, axis=1)
+        assert np.array_equal(x, y), key
+
+
+def test_backends_match():
+    config = dict(DEFAULT_CONFIG, botCount=6, maxViruses=15)
+    envs = [AgarEnvironment(config=dict(config), backend=backend) for backend in ('object', 'numpy')]
+    for env in envs:
+        env.seed(7)
+        env.max_steps = 250
+    np.testing.assert_array_equal(*[env.reset() for env in envs])
+    rng = np.random.RandomState(0)
+    episodes = 0
+    for step in range(400):
+        action = random_action(rng)
+        (obs_a, reward_a, done_a, info_a), (obs_b, reward_b, done_b, info_b) = [env.step(action) for env in envs]
+        np.testing.assert_array_equal(obs_a, obs_b)
+        assert (reward_a, done_a, info_a) == (reward_b, done_b, info_b)
+        if step % 25 == 0:
+            assert_same_state(*[env.get_state() for env in envs])
+        if done_a:
+            episodes += 1
+            np.testing.assert_array_equal(*[env.reset() for env in envs])
+    assert episodes > 0
+
+
+def test_snapshot_round_trip_and_cross_backend_restore():
+    config = dict(DEFAULT_CONFIG, botCount=6, maxViruses=15)
+    source = AgarEnvironment(config=dict(config), backend='numpy')
+    source.seed(2)
+    source.reset()
+    rng = np.random.RandomState(1)
+    for _ in range(100):
+        if source.step(random_action(rng))[2]:
+            source.reset()
+    snapshot = source.get_state()
+    data = pack_state(snapshot)
+    # 快照包括随机数状态，恢复后的重置也与原环境一致
+    actions = [random_action(rng) for _ in range(300)]
+    expected = []
+    for action in actions:
+        expected.append(source.step(action))
+        if expected[-1][2]:
+            expected[-1] += (source.reset(),)
+    final = source.get_state()
+
+    for backend in ('object', 'numpy'):
+        env = AgarEnvironment(config=dict(config), backend=backend)
+        env.seed(0)
+        env.reset()
+        env.set_state(unpack_state(data))
+        assert_same_state(env.get_state(), snapshot)
+        for action, (obs, reward, done, info, *reset_obs) in zip(actions, expected):
+            result = env.step(action)
+            np.testing.assert_array_equal(result[0], obs)
+            assert result[1:] == (reward, done, info)
+            if done:
+                np.testing.assert_array_equal(env.reset(), reset_obs[0])
+        assert_same_state(env.get_state(), final)
+    assert sum(result[2] for result in expected) > 0
+
+
+def test_debug_mass_with_splits_and_ejects():
+    for backend in ('object', 'numpy'):
+        env = AgarEnvironment(config=dict(DEFAULT_CONFIG, botCount=6, ruleSteps=0), backend=backend)
+        env.seed(2)
+        env.reset()
+        env.debug_mass = True
+        rng = np.random.RandomState(4)
+        splits = ejects = 0
+        for step in range(400):
+            if step % 50 == 0:
+                player = env.agent_player
+                player.set_cell_mass(player.cells[0], 400)
+            action = np.concatenate([rng.uniform(-1, 1, 2), rng.random_sample(2) < (0.1, 0.3)])
+            # verify_mass 在每个 tick 用细胞求和核对增量维护的 massTotal
+            _, _, done, _ = env.step(action)
+            splits += len(env.agent_player.cells) > 1
+            ejects += len(env.mass_food) > 0
+            if done:
+                env.reset()
+        assert splits > 0 and ejects > 0
+
+        env.agent_player.massTotal += 1
+        with pytest.raises(RuntimeError):
+            env.step(np.zeros(4))
+
+
+def test_server_action_repeat():
+    config = dict(DEFAULT_CONFIG, botCount=4, ruleSteps=0, actionRepeat='server')
+    # 服务器 60 tick/s、每 40 ms 下发一次：每次决策依次运行 1, 2, 1, 2... 个 tick
+    for factor, expected in ((40, [1, 2] * 5), (25, [2, 2, 3, 2, 3] * 2)):
+        env = AgarEnvironment(config=dict(config, networkUpdateFactor=factor))
+        assert env.action_repeat == 60 / factor
+        env.seed(0)
+        env.reset()
+        ticks = []
+        for _ in range(10):
+            steps = env.steps
+            env.step(np.array([1.0, 0.0, 0.0, 0.0]))
+            ticks.append(env.steps - steps)
+        assert ticks == expected
+
+    # 奖励是各 tick 奖励之和；分裂和射出质量只在第一个 tick 执行
+    envs = [AgarEnvironment(config=dict(config)), AgarEnvironment(config=dict(config, actionRepeat=1))]
+    for env in envs:
+        env.seed(6)
+        env.reset()
+    repeated, single = envs
+    rng = np.random.RandomState(2)
+    for _ in range(150):
+        action = random_action(rng)
+        _, reward, done, _ = repeated.step(action)
+        total = 0.0
+        for tick in range(repeated.steps - single.steps):
+            tick_reward = single.step(action if tick == 0 else [action[0], action[1], 0.0, 0.0])[1]
+            total += tick_reward
+        assert reward == total
+        # 除 tick 累加器外局面与逐 tick 运行一致
+        state, expected = repeated.get_state(), single.get_state()
+        assert state.pop('tick_phase') in (0.0, 0.5) and expected.pop('tick_phase') == 0.0
+        assert_same_state(state, expected)
+        if done:
+            np.testing.assert_array_equal(repeated.reset(), single.reset())
+
+
+if __name__ == '__main__':
+    test_env()
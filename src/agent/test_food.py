@@ -0,0 +1,84 @@
+import numpy as np
+
+from env import AgarEnvironment, DEFAULT_CONFIG
+from world import spawn_positions
+
+
+def make_env(backend, **config):
+    env = AgarEnvironment(config=dict(DEFAULT_CONFIG, **config), backend=backend)
+    env.seed(0)
+    env.reset()
+    return env
+
+
+def food_positions(env):
+    return np.array([(f.x, f.y) for f in env.food]).reshape(-1, 2)
+
+
+def test_food_count_never_exceeds_max_food():
+    for backend in ('object', 'numpy'):
+        env = make_env(backend, maxFood=60, botCount=6)
+        assert len(env.food) == 60
+        env._init_food(100)
+        assert len(env.food) == 60
+        rng = np.random.RandomState(0)
+        for _ in range(300):
+            _, _, done, _ = env.step(np.concatenate([rng.uniform(-1, 1, 2), [0, 0]]))
+            assert len(env.food) <= 60
+            if done:
+                env.reset()
+
+
+def test_freed_food_slots_are_reused():
+    env = make_env('object', maxFood=40, botCount=0)
+    pool = {id(f) for f in env.food} | {id(f) for f in env._food_free}
+    eaten = [env.food[3], env.food[0], env.food[-1]]
+    env._remove_food(eaten)
+    assert len(env.food) == 37
+    # swap-remove 保持紧凑：槽位、编号表和空间索引都与存活食物一致
+    assert [f.slot for f in env.food] == list(range(37))
+    assert env._food_by_uid == {f.uid: f for f in env.food}
+    assert len(env.food_index) == 37 and all(f.uid in env.food_index for f in env.food)
+    assert not any(f.uid in env._food_by_uid for f in eaten)
+
+    env._init_food(10)
+    assert len(env.food) == 40
+    # 新食物复用被吃掉的对象，不再分配新对象
+    assert {id(f) for f in eaten} <= {id(f) for f in env.food}
+    assert {id(f) for f in env.food} | {id(f) for f in env._food_free} == pool
+    assert [f.slot for f in env.food] == list(range(40))
+
+    # 重置后所有对象回到空闲列表并再次被使用
+    env.reset()
+    assert {id(f) for f in env.food} | {id(f) for f in env._food_free} == pool
+
+
+def test_uniform_respawn_keeps_distance_to_existing_food():
+    for backend in ('object', 'numpy'):
+        env = make_env(backend, maxFood=80, botCount=0, foodUniformDisposition=True)
+        if env.world is not None:
+            env.world.food.remove(env.arena, list(range(20)))
+        else:
+            env._remove_food(list(env.food)[:20])
+        existing = food_positions(env)
+        width, height = env.config['gameWidth'], env.config['gameHeight']
+
+        def nearest(xs, ys):
+            return np.sqrt(((xs[:, None] - existing[:, 0]) ** 2 + (ys[:, None] - existing[:, 1]) ** 2).min(axis=1))
+
+        state = env.rng.get_state()
+        env._init_food(20)
+        spawned = food_positions(env)[60:]
+        assert len(spawned) == 20
+
+        # 每个新食物是各自候选中离现有食物最远的一个
+        env.rng.set_state(state)
+        u = env.rng.random_sample((20, 10, 2))
+        best = nearest(width * u[..., 0].ravel(), height * u[..., 1].ravel()).reshape(20, 10).max(axis=1)
+        np.testing.assert_allclose(nearest(spawned[:, 0], spawned[:, 1]), best)
+
+        # 与均匀随机相比离现有食物更远
+        rng = np.random.RandomState(1)
+        uniform = nearest(*spawn_positions(rng, 200, width, height))
+        uniform_best = nearest(*spawn_positions(rng, 200, width, height, nearest))
+        assert uniform_best.mean() > uniform.mean() * 1.5
@@ -0,0 +1,75 @@
+import numpy as np
+
+from env import AgarEnvironment, DEFAULT_CONFIG
+from league import League, PolicyPool
+from numpy_policy import NumpyPolicy
+
+CONFIG = dict(DEFAULT_CONFIG, botCount=6, ruleSteps=0)
+
+
+def linear_policy(seed, obs_size):
+    """单层线性策略：随机方向，不分裂、不射出质量"""
+    rng = np.random.RandomState(seed)
+    policy = NumpyPolicy.__new__(NumpyPolicy)
+    policy._load({
+        'action_w': rng.normal(0, 0.3, size=(4, obs_size)).astype(np.float32),
+        'action_b': np.array([0, 0, -1, -1], dtype=np.float32),
+        'activation': np.array('tanh'),
+        'action_low': np.array([-1, -1, 0, 0], dtype=np.float32),
+        'action_high': np.array([1, 1, 1, 1], dtype=np.float32),
+    })
+    return policy
+
+
+def league_envs(league, seeds, backend='numpy'):
+    envs = []
+    for seed in seeds:
+        env = AgarEnvironment(config=dict(CONFIG), backend=backend)
+        env.seed(seed)
+        env.set_league(league)
+        env.reset()
+        envs.append(env)
+    return envs
+
+
+def test_act_applies_each_bots_policy():
+    obs_size = AgarEnvironment(config=dict(CONFIG)).observation_space.shape[0]
+    policies = [linear_policy(0, obs_size), linear_policy(1, obs_size)]
+    pool = PolicyPool(max_size=2, obs_size=obs_size)
+    pool.add('a', policies[0])
+    pool.add('b', policies[1])
+    league = League(pool, fraction=0.7)
+    envs = league_envs(league, [3, 4])
+    bots = [(env, bot) for env in envs for bot in env.players]
+    # 两个快照和内置逻辑都有机器人使用
+    assert {bot.policy for _, bot in bots} == {None, *policies}
+
+    before = [dict(bot.target) for _, bot in bots]
+    league.act(envs)
+    for (env, bot), target in zip(bots, before):
+        if bot.policy is None:
+            # 内置逻辑控制的机器人不受影响
+            assert bot.target == target
+            continue
+        action = bot.policy.predict(env.encoder.encode([env], [bot]))[0]
+        np.testing.assert_allclose(
+            [bot.target['x'], bot.target['y']], [bot.x + action[0] * 1000, bot.y + action[1] * 1000], atol=1e-3
+        )
+
+
+def test_league_matches_across_backends():
+    obs_size = AgarEnvironment(config=dict(CONFIG)).observation_space.shape[0]
+    pool = PolicyPool(max_size=2)
+    pool.add('a', linear_policy(0, obs_size))
+    pool.add('b', linear_policy(1, obs_size))
+    league = League(pool, fraction=0.7)
+    envs = [league_envs(league, [5], backend)[0] for backend in ('object', 'numpy')]
+    rng = np.random.RandomState(0)
+    for step in range(300):
+        action = np.concatenate([rng.uniform(-1, 1, 2), rng.random_sample(2) < (0.05, 0.1)])
+        (obs_a, reward_a, done_a, _), (obs_b, reward_b, done_b, _) = [env.step(action) for env in envs]
+        np.testing.assert_array_equal(obs_a, obs_b)
+        assert (reward_a, done_a) == (reward_b, done_b)
+        if done_a:
+            for env in envs:
+                env.reset()
@@ -0,0 +1,32 @@
+import os
+
+import numpy as np
+
+import agent
+from model import MyAIModel
+from obs_schema import FrameLog, load_frames
+from test_bot_server import FakeSio, fake_frame
+
+MODEL_PATH = os.path.join(os.path.dirname(__file__), 'models', 'ppo_agar_agent.npz')
+
+
+def test_on_game_state_with_recorded_frame(tmp_path, monkeypatch):
+    log = FrameLog(tmp_path / 'frames.jsonl')
+    log.add(fake_frame())
+    log.close()
+    frame, = load_frames(tmp_path / 'frames.jsonl')
+
+    model = MyAIModel(MODEL_PATH, backend='numpy')
+    monkeypatch.setattr(agent, 'model', model)
+    monkeypatch.setattr(agent, 'sio', FakeSio())
+    monkeypatch.setattr(agent, 'latest_target', None)
+
+    agent.on_game_state(*frame)
+
+    action = model.predict_states([frame])[0]
+    assert action.shape == (4,)
+    me = frame[0]
+    assert agent.latest_target == {'x': me['x'] + action[0] * 200, 'y': me['y'] + action[1] * 200}
+    assert np.isfinite([agent.latest_target['x'], agent.latest_target['y']]).all()
+    expected = (['2'] if action[2] > 0.5 else []) + (['1'] if action[3] > 0.5 else [])
+    assert [event for event, _ in agent.sio.emitted] == expected
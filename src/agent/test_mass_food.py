@@ -0,0 +1,114 @@
+import numpy as np
+
+from env import AgarEnvironment, DEFAULT_CONFIG
+
+BACKENDS = ('object', 'numpy')
+
+
+def make_env(backend, **config):
+    env = AgarEnvironment(config=dict(DEFAULT_CONFIG, botCount=0, ruleSteps=0, **config), backend=backend)
+    env.seed(3)
+    env.reset()
+    return env
+
+
+def eject(env, player):
+    env._control(player, [1.0, 0.0, 0.0, 1.0])
+
+
+def test_eject_requires_min_mass():
+    for backend in BACKENDS:
+        env = make_env(backend)
+        player = env.agent_player
+        cell = player.cells[0]
+        threshold = env.config['defaultPlayerMass'] + env.config['fireFood']
+
+        player.set_cell_mass(cell, threshold - 0.5)
+        eject(env, player)
+        assert len(env.mass_food) == 0
+        assert player.massTotal == threshold - 0.5
+
+        player.set_cell_mass(cell, threshold)
+        eject(env, player)
+        assert len(env.mass_food) == 1
+        assert player.massTotal == env.config['defaultPlayerMass']
+        food = env.mass_food[0]
+        assert food['mass'] == env.config['fireFood']
+        assert food['speed'] > 0 and food['num'] == 0
+
+
+def test_mass_food_pool_is_bounded():
+    for backend in BACKENDS:
+        env = make_env(backend, maxMassFood=12)
+        player = env.agent_player
+        player.set_cell_mass(player.cells[0], 2000)
+        for _ in range(3):
+            env._control(player, [1.0, 0.0, 1.0, 0.0])
+        assert len(player.cells) > 4
+
+        for _ in range(5):
+            eject(env, player)
+            assert len(env.mass_food) <= 12
+        assert len(env.mass_food) == 12
+
+        # 整局运行中射出质量也不超过上限
+        for _ in range(100):
+            env.step(np.array([1.0, 0.0, 0.0, 1.0]))
+            assert len(env.mass_food) <= 12
+
+
+def test_cell_does_not_eat_own_moving_mass_food():
+    for backend in BACKENDS:
+        env = make_env(backend)
+        player = env.agent_player
+        player.set_cell_mass(player.cells[0], 100)
+        eject(env, player)
+        assert player.massTotal == 90
+
+        # 仍在运动、位于射出细胞内部，不会被吃回去
+        env._check_mass_food_collision()
+        assert len(env.mass_food) == 1
+        assert player.massTotal == 90
+
+        # 停下后被吃回
+        stopped = dict(env.mass_food[0], speed=0.0)
+        env._remove_mass_food([0])
+        env.mass_food.append(stopped)
+        env._check_mass_food_collision()
+        assert len(env.mass_food) == 0
+        assert player.massTotal == 100
+
+
+def test_virus_splits_at_split_mass():
+    for backend in BACKENDS:
+        env = make_env(backend, maxViruses=1)
+        env.config['maxViruses'] = 2
+        virus_mass, split_mass = env.config['virusMass'], env.config['virusSplitMass']
+        virus = env.viruses[0]
+        # 把病毒移到地图中央，新病毒不会被边界截断
+        virus.x, virus.y = 250.0, 250.0
+
+        def shoot(mass):
+            env.mass_food.append({
+                'id': None, 'num': 0, 'x': virus.x, 'y': virus.y, 'mass': mass,
+                'radius': 4.0, 'speed': 10.0, 'direction': {'x': 1.0, 'y': 0.0},
+            })
+            env._feed_viruses()
+            assert len(env.mass_food) == 0
+
+        shoot(split_mass - virus_mass - 10)
+        assert len(env.viruses) == 1
+        assert env.viruses[0].mass == split_mass - 10
+
+        shoot(10)
+        assert len(env.viruses) == 2
+        assert env.viruses[0].mass == virus_mass
+        spawned = env.viruses[1]
+        radius = 4 + np.sqrt(virus_mass) * 6
+        assert spawned.mass == virus_mass
+        assert (spawned.x, spawned.y) == (250.0 + radius * 2, 250.0)
+
+        # 达到 maxViruses 后不再分裂，质量以 virusSplitMass 为上限
+        shoot(split_mass)
+        assert len(env.viruses) == 2
+        assert env.viruses[0].mass == split_mass
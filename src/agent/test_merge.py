@@ -0,0 +1,76 @@
+import numpy as np
+
+from env import AgarEnvironment, DEFAULT_CONFIG, resolve_own_cells_arrays
+from world import PUSHING_AWAY_SPEED, own_cell_interactions
+
+
+def split_agent(backend, merge_time):
+    """智能体分裂成两个重叠的细胞，返回环境"""
+    env = AgarEnvironment(config=dict(DEFAULT_CONFIG, botCount=0, ruleSteps=0, mergeTime=merge_time), backend=backend)
+    env.seed(1)
+    env.reset()
+    player = env.agent_player
+    player.set_cell_mass(player.cells[0], 200)
+    env._control(player, [1.0, 0.0, 1.0, 0.0])
+    assert len(player.cells) == 2
+    for cell, x in zip(player.cells, (200.0, 210.0)):
+        cell.x, cell.y = x, 250.0
+    return env
+
+
+def resolve(env):
+    if env.world is not None:
+        resolve_own_cells_arrays([env])
+    else:
+        env._resolve_own_cells()
+
+
+def test_cells_repel_before_merge_time_then_merge():
+    history = []
+    for backend in ('object', 'numpy'):
+        env = split_agent(backend, merge_time=0.25)
+        player = env.agent_player
+        ticks = env.merge_ticks
+        assert ticks == 15 and player.merge_timer == ticks
+        positions = []
+        for tick in range(ticks):
+            left, right = player.cells
+            gap = right.x - left.x
+            resolve(env)
+            # 计时未结束：相交的细胞沿连线各推开 PUSHING_AWAY_SPEED，质量不变
+            assert len(player.cells) == 2
+            assert np.isclose(right.x - left.x, gap + 2 * PUSHING_AWAY_SPEED)
+            assert player.massTotal == 200
+            positions.append([(cell.x, cell.y) for cell in player.cells])
+        assert player.merge_timer == 0
+
+        resolve(env)
+        assert len(player.cells) == 1
+        assert player.cells[0].mass == player.massTotal == 200
+        history.append(positions)
+    # 两个后端逐位一致
+    assert history[0] == history[1]
+
+
+def test_own_cell_interactions():
+    x = np.array([0.0, 10.0, 500.0, 0.0, 0.0])
+    y = np.array([0.0, 0.0, 0.0, 0.0, 0.0])
+    radius = np.array([20.0, 20.0, 20.0, 20.0, 20.0])
+    bounds = [0, 3, 5]
+
+    # 第一个玩家不能合并：相交的 0、1 推开，远处的 2 不动；第二个玩家重合的细胞沿 y 轴推开
+    dx, dy, merges = own_cell_interactions(x, y, radius, bounds, [False, False])
+    np.testing.assert_allclose(dx, [-PUSHING_AWAY_SPEED, PUSHING_AWAY_SPEED, 0, 0, 0])
+    np.testing.assert_allclose(dy, [0, 0, 0, -1, 1])
+    assert merges == []
+
+    # 能合并时相交的细胞对合并而不推开
+    dx, dy, merges = own_cell_interactions(x, y, radius, bounds, [True, False])
+    np.testing.assert_allclose(dx, [0, 0, 0, 0, 0])
+    np.testing.assert_allclose(dy, [0, 0, 0, -1, 1])
+    assert merges == [(0, 1)]
+
+    # 已被吸收的细胞不再参与合并
+    x = np.array([0.0, 10.0, 20.0])
+    dx, dy, merges = own_cell_interactions(x, np.zeros(3), np.full(3, 20.0), [0, 3], [True])
+    assert merges == [(0, 1), (0, 2)]
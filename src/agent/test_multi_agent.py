@@ -0,0 +1,72 @@
+import numpy as np
+import pytest
+
+from env import DEFAULT_CONFIG
+from multi_agent import MultiAgentAgarEnv, MultiAgentVecEnv
+
+CONFIG = dict(DEFAULT_CONFIG, botCount=6, gameWidth=600, gameHeight=600)
+
+
+def random_actions(rng, n):
+    return rng.uniform([-1, -1, 0, 0], [1, 1, 1, 1], size=(n, 4)).astype(np.float32)
+
+
+def test_step_matches_across_backends():
+    arenas = []
+    for backend in ('object', 'numpy'):
+        arena = MultiAgentAgarEnv(3, dict(CONFIG, actionRepeat=2), backend=backend)
+        arena.seed(5)
+        arena.reset()
+        arena.env.max_steps = 300
+        arena.env.debug_mass = True
+        arena.env.enable_profiling()
+        arenas.append(arena)
+
+    rng = np.random.RandomState(0)
+    deaths = 0
+    for step in range(300):
+        actions = random_actions(rng, 3)
+        (obs_a, rew_a, done_a, info_a), (obs_b, rew_b, done_b, info_b) = [arena.step(actions) for arena in arenas]
+        np.testing.assert_array_equal(obs_a, obs_b)
+        np.testing.assert_array_equal(rew_a, rew_b)
+        np.testing.assert_array_equal(done_a, done_b)
+        np.testing.assert_array_equal(info_a['alive'], info_b['alive'])
+        # 碰撞和奖励经过 _end_tick，计时的各阶段都有记录
+        for info in (info_a, info_b):
+            assert {'action', 'update', 'player_collision', 'reward', 'observation'} <= set(info['profile']['times'])
+        deaths += done_a.sum()
+        if info_a['episode_done']:
+            for arena in arenas:
+                arena.reset()
+    assert deaths > 0
+
+    # debug_mass 在每个 tick 校验玩家质量
+    player = arenas[1].slots[0]
+    player.massTotal += 1
+    with pytest.raises(RuntimeError):
+        arenas[1].step(np.zeros((3, 4), dtype=np.float32))
+
+
+def test_vec_env_matches_single_arenas():
+    n_arenas, n_agents = 3, 3
+    vec = MultiAgentVecEnv(n_arenas=n_arenas, n_agents=n_agents, config=CONFIG, seed=0)
+    vec.set_attr('max_steps', 120)
+    singles = [MultiAgentAgarEnv(n_agents, CONFIG, respawn=True) for _ in range(n_arenas)]
+    for a, arena in enumerate(singles):
+        arena.seed(a)
+        arena.env.max_steps = 120
+
+    obs = vec.reset()
+    np.testing.assert_array_equal(obs, np.concatenate([arena.reset() for arena in singles]))
+    rng = np.random.RandomState(1)
+    for step in range(300):
+        actions = random_actions(rng, n_arenas * n_agents)
+        obs, rewards, dones, infos = vec.step(actions)
+        for a, arena in enumerate(singles):
+            rows = slice(a * n_agents, (a + 1) * n_agents)
+            expected_obs, expected_rewards, expected_dones, info = arena.step(actions[rows])
+            if info['episode_done']:
+                expected_obs = arena.reset()
+            np.testing.assert_array_equal(obs[rows], expected_obs)
+            np.testing.assert_array_equal(rewards[rows], expected_rewards.astype(np.float32))
+            np.testing.assert_array_equal(dones[rows], expected_dones)
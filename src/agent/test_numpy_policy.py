@@ -0,0 +1,44 @@
+import numpy as np
+import pytest
+from stable_baselines3 import PPO
+
+from numpy_policy import NumpyPolicy, OnnxPolicy, check_parity, export, export_onnx
+from vec_env import BatchedAgarVecEnv
+
+
+def small_model(seed=0):
+    return PPO('MlpPolicy', BatchedAgarVecEnv(num_envs=4, seed=seed), n_steps=32, batch_size=64, n_epochs=2, seed=seed, device='cpu')
+
+
+def test_snapshot_is_frozen_after_training():
+    model = small_model()
+    snapshot = NumpyPolicy.from_model(model)
+    obs = np.random.RandomState(0).uniform(-1, 1, size=(64, snapshot.obs_size)).astype(np.float32)
+    before = snapshot.predict(obs)
+    bias_before = snapshot.action_b.copy()
+
+    model.learn(256)
+
+    np.testing.assert_array_equal(snapshot.action_b, bias_before)
+    np.testing.assert_array_equal(snapshot.predict(obs), before)
+    # 训练确实改变了参数，新的快照与旧快照不同
+    assert not np.array_equal(NumpyPolicy.from_model(model).predict(obs), before)
+
+
+def test_exported_policies_match_sb3(tmp_path):
+    model = small_model(seed=1)
+    zip_path = tmp_path / 'policy.zip'
+    model.save(zip_path)
+    npz_path = export(str(zip_path))
+
+    obs = np.random.RandomState(1).uniform(-2, 2, size=(300, model.observation_space.shape[0])).astype(np.float32)
+    expected, _ = model.predict(obs, deterministic=True)
+    np.testing.assert_allclose(NumpyPolicy(npz_path).predict(obs), expected, atol=1e-5)
+    # 从 .zip 加载（与 MyAIModel 相同的 custom_objects）再比较
+    assert check_parity(zip_path, NumpyPolicy(npz_path), n=300) <= 1e-5
+
+    pytest.importorskip('onnx')
+    pytest.importorskip('onnxruntime')
+    onnx_path = export_onnx(npz_path)
+    np.testing.assert_allclose(OnnxPolicy(onnx_path).predict(obs), expected, atol=1e-5)
+    assert check_parity(model, OnnxPolicy(onnx_path), n=300) <= 1e-5
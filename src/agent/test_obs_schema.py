@@ -0,0 +1,56 @@
+import json
+
+import numpy as np
+
+from env import AgarEnvironment, DEFAULT_CONFIG
+from model import MyAIModel
+from obs_schema import ObservationSchema, check_parity
+from state_processor import encode_states, extract_observation
+
+
+def env_frame(env):
+    """把环境当前局面转换为服务器 serverTellPlayerMove 的参数（经过一次 JSON 往返）"""
+    def player(p):
+        return {
+            'id': p.id, 'name': p.name, 'x': p.x, 'y': p.y, 'massTotal': p.massTotal, 'hue': p.hue,
+            'cells': [{'x': c.x, 'y': c.y, 'mass': c.mass, 'radius': c.radius} for c in p.cells],
+        }
+
+    state = env.get_state()
+    me = player(env.agent_player)
+    players = [me] + [player(p) for p in env.players]
+    foods = [{'id': i, 'x': x, 'y': y, 'mass': m} for i, (x, y, m) in enumerate(state['food'].tolist())]
+    viruses = [{'id': i, 'x': x, 'y': y, 'mass': m} for i, (x, y, m) in enumerate(state['viruses'].tolist())]
+    masses = [
+        {'id': None, 'num': 0, 'x': r[0], 'y': r[1], 'mass': r[2], 'direction': {'x': r[3], 'y': r[4]}, 'speed': r[5]}
+        for r in state['mass_food'].tolist()
+    ]
+    return tuple(json.loads(json.dumps([me, players, foods, masses, viruses])))
+
+
+def test_live_encoding_matches_env_observation():
+    for backend in ('object', 'numpy'):
+        env = AgarEnvironment(config=dict(DEFAULT_CONFIG, botCount=6), backend=backend)
+        env.seed(3)
+        obs = env.reset()
+        rng = np.random.RandomState(0)
+        model = MyAIModel.__new__(MyAIModel)
+        frames = []
+        for step in range(300):
+            action = np.concatenate([rng.uniform(-1, 1, 2), rng.random_sample(2) < (0.05, 0.1)])
+            obs, _, done, _ = env.step(action)
+            if step % 5 == 0:
+                frame = env_frame(env)
+                frames.append(frame)
+                np.testing.assert_array_equal(encode_states([frame])[0], obs)
+                np.testing.assert_array_equal(model._preprocess(extract_observation(*frame))[0], obs)
+            if done:
+                obs = env.reset()
+
+        # 批量编码与逐帧编码一致，并就地写入 out
+        out = np.empty((len(frames), obs.size), dtype=np.float32)
+        assert encode_states(frames, out=out) is out
+        np.testing.assert_array_equal(out, np.concatenate([encode_states([f]) for f in frames]))
+        # 帧恢复成环境状态后两条路径一致（包括默认布局以外的分组）
+        assert check_parity(frames) == 0.0
+        assert check_parity(frames, ObservationSchema.nearest(5, 3, 2, 2, 4)) == 0.0
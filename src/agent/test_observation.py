@@ -0,0 +1,86 @@
+import numpy as np
+
+from env import AgarEnvironment, DEFAULT_CONFIG, Food, Virus
+from obs_schema import MASS_SCALE, POS_SCALE, REL_SCALE
+from observation import GridEncoder, NearestEncoder, make_encoder
+
+
+def hand_placed(backend, **config):
+    """AI 玩家位于 (250, 250)，一个机器人，食物、病毒和射出质量都由测试放置"""
+    env = AgarEnvironment(config=dict(DEFAULT_CONFIG, botCount=1, ruleSteps=0, **config), backend=backend)
+    env.seed(0)
+    env.reset()
+    env.food.clear()
+    env.viruses.clear()
+    env.mass_food.clear()
+    player = env.agent_player
+    player.x, player.y = 250.0, 250.0
+    player.cells[0].x, player.cells[0].y = 250.0, 250.0
+    bot = env.players[0]
+    bot.set_cell_mass(bot.cells[0], 50)
+    bot.cells[0].x, bot.cells[0].y = 200.0, 300.0
+    bot.x, bot.y = 200.0, 300.0
+    for uid, (x, y, mass) in enumerate([(160, 160, 1), (340, 160, 2), (400, 250, 1), (345, 155, 3), (210, 240, 600)]):
+        env.food.append(Food(float(x), float(y), float(mass), uid))
+    env.viruses.append(Virus(151.0, 349.0, 100, 100))
+    env.mass_food.append({
+        'id': None, 'num': 0, 'x': 260.0, 'y': 260.0, 'mass': 10.0, 'radius': 4.0,
+        'speed': 0.0, 'direction': {'x': 0.0, 'y': 0.0},
+    })
+    return env
+
+
+def test_grid_encoder_channels():
+    for backend in ('object', 'numpy'):
+        env = hand_placed(backend, observation='grid', obsGridSize=4, obsGridView=100)
+        assert isinstance(env.encoder, GridEncoder)
+        obs = env._get_observation()
+        assert obs.shape == (3 + 3 * 16,) == env.observation_space.shape
+        np.testing.assert_allclose(obs[:3], [250 / POS_SCALE, 250 / POS_SCALE, env.agent_player.massTotal / MASS_SCALE],
+                                   rtol=1e-6)
+        # 视野 [150, 350) 划分为 4 × 4 个 50 宽的格子，通道依次为食物（含射出质量）、敌人细胞、病毒
+        food, enemies, viruses = obs[3:].reshape(3, 4, 4) * MASS_SCALE
+        expected = np.zeros((4, 4))
+        expected[0, 0] = 1
+        expected[0, 3] = 2 + 3
+        expected[2, 2] = 10
+        expected[1, 1] = MASS_SCALE  # 超过 MASS_SCALE 的格子截断到 1
+        np.testing.assert_allclose(food, expected, rtol=1e-6)
+        expected = np.zeros((4, 4))
+        expected[3, 1] = 50
+        np.testing.assert_allclose(enemies, expected, rtol=1e-6)
+        expected = np.zeros((4, 4))
+        expected[3, 0] = 100
+        np.testing.assert_allclose(viruses, expected, rtol=1e-6)
+
+        # 自身细胞不计入；视野外的食物 (400, 250) 被忽略
+        assert np.isclose(food.sum(), 1 + 5 + 10 + MASS_SCALE)
+
+
+def test_nearest_encoder_with_custom_k():
+    config = dict(obsFoodK=2, obsEnemyK=4, obsVirusK=3, obsMassFoodK=1, obsCellK=2)
+    encoder = make_encoder(dict(DEFAULT_CONFIG, **config))
+    assert isinstance(encoder, NearestEncoder)
+    assert encoder.size == 3 + 2 * 2 + 4 * 3 + 3 * 2 + 1 * 2 + 2 * 3
+    assert NearestEncoder().size == 22
+
+    for backend in ('object', 'numpy'):
+        env = hand_placed(backend, **config)
+        assert env.observation_space.shape == (encoder.size,)
+        obs = env._get_observation()
+        assert obs.shape == (encoder.size,)
+        schema = env.encoder.schema
+        # 最近的两个食物：(210, 240) 和 (160, 160)
+        np.testing.assert_allclose(
+            obs[schema.columns('food')], np.array([-40, -10, -90, -90]) / REL_SCALE, rtol=1e-6
+        )
+        # 只有一个敌人，其余补 0
+        enemies = obs[schema.columns('enemies')].reshape(4, 3)
+        np.testing.assert_allclose(enemies[0], [-50 / REL_SCALE, 50 / REL_SCALE, 50 / MASS_SCALE], rtol=1e-6)
+        assert not enemies[1:].any()
+        viruses = obs[schema.columns('viruses')].reshape(3, 2)
+        assert viruses[0].any() and not viruses[1:].any()
+        np.testing.assert_allclose(obs[schema.columns('mass_food')], np.array([10, 10]) / REL_SCALE, rtol=1e-6)
+
+        # 重置后的观察也是新的尺寸
+        assert env.reset().shape == (encoder.size,)
@@ -0,0 +1,87 @@
+import json
+
+import numpy as np
+
+import profiling
+from env import AgarEnvironment, DEFAULT_CONFIG
+from profiling import PHASES, StepProfiler
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_summary_and_export(monkeypatch, tmp_path):
+    clock = FakeClock()
+    monkeypatch.setattr(profiling.time, 'perf_counter', clock)
+    profiler = StepProfiler()
+    # 第 i 步：update 耗时 i 毫秒，reward 固定 1 毫秒，中间 5 毫秒被 skip 丢弃
+    for i in range(1, 11):
+        profiler.start()
+        clock.now += i * 1e-3
+        profiler.lap('update')
+        clock.now += 5e-3
+        profiler.skip()
+        clock.now += 1e-3
+        profiler.lap('reward')
+        profiler.count('food', 2)
+        info = profiler.finish()
+        assert np.isclose(info['times']['total'], (i + 1) * 1e-3)
+        assert info['counts'] == {'food': 2}
+
+    summary = profiler.summary()
+    assert summary['steps'] == 10
+    assert summary['counters'] == {'food': 20}
+    update = summary['phases']['update']
+    assert update['n'] == 10
+    assert np.isclose(update['mean_ms'], 5.5)
+    assert np.isclose(update['p50_ms'], 5.5)
+    assert np.isclose(update['max_ms'], 10.0)
+    assert np.isclose(update['p95_ms'], np.percentile(np.arange(1, 11), 95))
+    # 各阶段占总耗时的比例
+    assert np.isclose(update['share'], 55 / 65)
+    assert np.isclose(summary['phases']['reward']['share'], 10 / 65)
+    assert summary['phases']['total']['share'] == 1.0
+
+    path = tmp_path / 'profile.json'
+    profiler.export(str(path), bins=5)
+    data = json.loads(path.read_text())
+    assert data['summary'] == json.loads(json.dumps(summary))
+    histogram = data['histograms']['update']
+    assert len(histogram['edges_ms']) == 6 and sum(histogram['counts']) == 10
+    assert np.isclose(histogram['edges_ms'][0], 1.0) and np.isclose(histogram['edges_ms'][-1], 10.0)
+    # 每步耗时相同（计时误差以内）的阶段也能画直方图
+    assert data['histograms']['reward']['counts'] == [0, 0, 10, 0, 0]
+
+    # max_samples 只保留最近的样本，计数不受影响
+    profiler = StepProfiler(max_samples=3)
+    for i in range(5):
+        profiler.start()
+        clock.now += (i + 1) * 1e-3
+        profiler.lap('update')
+        profiler.finish()
+    assert profiler.summary()['phases']['update']['n'] == 3
+    assert np.isclose(profiler.summary()['phases']['update']['mean_ms'], 4.0)
+    assert profiler.steps == 5
+
+
+def test_env_phases():
+    env = AgarEnvironment(config=dict(DEFAULT_CONFIG, botCount=6, ruleSteps=0))
+    env.seed(0)
+    env.reset()
+    profiler = env.enable_profiling()
+    rng = np.random.RandomState(0)
+    for _ in range(50):
+        _, _, done, info = env.step(np.concatenate([rng.uniform(-1, 1, 2), rng.random_sample(2) < (0.05, 0.3)]))
+        times = info['profile']['times']
+        # 每个阶段每步只计时一次，各阶段之和就是总耗时
+        assert set(times) == set(PHASES) | {'total'}
+        assert np.isclose(sum(t for phase, t in times.items() if phase != 'total'), times['total'])
+        if done:
+            env.reset()
+    assert profiler.summary()['steps'] == 50
+    assert {'food', 'viruses', 'players', 'cells'} <= set(profiler.summary()['counters'])
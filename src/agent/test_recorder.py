@@ -0,0 +1,84 @@
+import numpy as np
+import pytest
+
+from env import AgarEnvironment, DEFAULT_CONFIG
+from recorder import EpisodeRecorder, RecordEpisodes, ReplayDataset, VecRecorder
+from vec_env import BatchedAgarVecEnv
+
+CONFIG = dict(DEFAULT_CONFIG, botCount=4)
+
+
+def test_replay_dataset_reads_recorded_steps(tmp_path):
+    n = 3
+    recorder = EpisodeRecorder(str(tmp_path / 'replay'), chunk_size=64)
+    venv = VecRecorder(BatchedAgarVecEnv(num_envs=n, config=CONFIG, seed=0), recorder)
+    venv.set_attr('max_steps', 40)
+    obs = venv.reset()
+    rng = np.random.RandomState(0)
+    expected = {'obs': [], 'action': [], 'reward': [], 'done': []}
+    for _ in range(100):
+        actions = rng.uniform([-1, -1, 0, 0], [1, 1, 1, 1], size=(n, 4)).astype(np.float32)
+        next_obs, rewards, dones, _ = venv.step(actions)
+        for name, value in zip(expected, (obs, actions, rewards, dones)):
+            expected[name].append(value)
+        obs = next_obs
+    venv.close()
+
+    dataset = ReplayDataset(str(tmp_path / 'replay'))
+    assert len(dataset) == 100 * n
+    assert len(dataset.chunks) == -(-len(dataset) // 64)
+    rows = np.arange(len(dataset))
+    data = dataset.get(rows)
+    for name, values in expected.items():
+        np.testing.assert_array_equal(data[name], np.concatenate(values).astype(data[name].dtype), err_msg=name)
+    np.testing.assert_array_equal(data['env_id'], np.tile(np.arange(n), 100))
+    # 同一环境的局编号在 done 之后递增，不同环境的局编号互不相同
+    for i in range(n):
+        episodes = data['episode'][i::n]
+        dones = data['done'][i::n]
+        np.testing.assert_array_equal(np.diff(episodes) > 0, dones[:-1])
+    assert len(set(data['episode'][:n])) == n
+    np.testing.assert_array_equal(np.concatenate(dataset.column('reward')), data['reward'])
+
+    # 随机访问跨块，与整体读取一致
+    picked = np.random.RandomState(1).permutation(len(dataset))[:50]
+    for name, column in dataset.get(picked).items():
+        np.testing.assert_array_equal(column, data[name][picked])
+    assert dataset.sample(16, np.random.RandomState(2))['obs'].shape == (16,) + data['obs'].shape[1:]
+    with pytest.raises(IndexError):
+        dataset.get([len(dataset)])
+
+
+def test_snapshots_restore_recorded_states(tmp_path):
+    recorder = EpisodeRecorder(str(tmp_path / 'replay'), chunk_size=16)
+    env = RecordEpisodes(AgarEnvironment(config=dict(CONFIG), backend='numpy'), recorder, snapshot_every=5)
+    env.env.seed(1)
+    env.reset()
+    rng = np.random.RandomState(0)
+    states = {}
+    for row in range(40):
+        if env.env.steps % 5 == 0:
+            states[row] = env.env.get_state()
+        _, _, done, _ = env.step(rng.uniform([-1, -1, 0, 0], [1, 1, 0, 0]))
+        if done:
+            env.reset()
+    recorder.close()
+
+    # 追加到已有数据集
+    more = EpisodeRecorder(str(tmp_path / 'replay'))
+    more.add(np.zeros(env.observation_space.shape), np.zeros(4), 0.0, True)
+    more.close()
+
+    dataset = ReplayDataset(str(tmp_path / 'replay'))
+    assert len(dataset) == 41
+    assert dataset.snapshot(40) is None
+    for row in range(40):
+        snapshot = dataset.snapshot(row)
+        if row not in states:
+            assert snapshot is None
+            continue
+        for name, value in states[row].items():
+            assert np.array_equal(snapshot[name], value), name
+    restored = AgarEnvironment(config=dict(CONFIG), backend='object')
+    restored.set_state(dataset.snapshot(max(states)))
+    np.testing.assert_array_equal(restored._get_observation(), dataset.get([max(states)])['obs'][0])
@@ -0,0 +1,48 @@
+import numpy as np
+
+from env import AgarEnvironment, DEFAULT_CONFIG
+from render import Rasterizer
+from scenarios import scenario_config
+
+
+def test_render_matches_snapshot_rendering():
+    for backend in ('object', 'numpy'):
+        env = AgarEnvironment(config=dict(DEFAULT_CONFIG, botCount=6, ruleSteps=0), backend=backend)
+        env.seed(5)
+        env.reset()
+        rasterizers = [Rasterizer(env.config, size=96), Rasterizer(env.config, size=64, view=120, supersample=2)]
+        rng = np.random.RandomState(1)
+        for step in range(200):
+            action = np.concatenate([rng.uniform(-1, 1, 2), rng.random_sample(2) < (0.05, 0.2)])
+            _, _, done, _ = env.step(action)
+            if step % 20 == 0:
+                state = env.get_state()
+                for rasterizer in rasterizers:
+                    np.testing.assert_array_equal(rasterizer.render(env), rasterizer.render_state(state))
+            if done:
+                env.reset()
+
+        # 视野以外的实体被剔除，画出的帧不变
+        rasterizer = rasterizers[1]
+        state = env.get_state()
+        far = dict(state, food=np.concatenate([state['food'], [[1e5, 1e5, 1.0]]]),
+                   food_uid=np.append(state['food_uid'], 10 ** 9))
+        np.testing.assert_array_equal(rasterizer.render_state(far), rasterizer.render(env))
+
+
+def test_render_uses_current_config():
+    env = AgarEnvironment(config=dict(DEFAULT_CONFIG, botCount=3), backend='numpy')
+    env.seed(0)
+    env.reset()
+    rasterizer = Rasterizer(env.config, size=64)
+    before = rasterizer.render(env)
+
+    config = scenario_config('sparse', env.config)
+    env.apply_scenario('sparse', config)
+    env.reset()
+    frame = rasterizer.render(env)
+    # 地图变大后整张地图缩小显示，与按新配置渲染的快照一致
+    np.testing.assert_array_equal(frame, Rasterizer(config, size=64).render_state(env.get_state()))
+    np.testing.assert_array_equal(frame, rasterizer.render_state(env.get_state(), config))
+    assert not np.array_equal(frame, rasterizer.render_state(env.get_state()))
+    assert frame.shape == before.shape
@@ -0,0 +1,91 @@
+import numpy as np
+import pytest
+
+from env import AgarEnvironment, DEFAULT_CONFIG
+from scenarios import SCENARIOS, CurriculumScheduler, LayoutCache, scenario_config
+
+
+def test_scenario_config():
+    config = scenario_config('sparse')
+    assert config['gameWidth'] == 1000 and config['botCount'] == 8
+    assert config['foodClusters'] == SCENARIOS['sparse']['foodClusters']
+    # 其余键沿用基础配置，基础配置本身不被修改
+    base = dict(DEFAULT_CONFIG, mergeTime=5)
+    config = scenario_config({'botCount': 1}, base)
+    assert config == dict(base, botCount=1)
+    assert base['botCount'] == DEFAULT_CONFIG['botCount']
+    with pytest.raises(ValueError):
+        scenario_config({'botCount': 1, 'mergeTime': 3})
+
+
+def test_forage_has_no_opponents():
+    env = AgarEnvironment(config=scenario_config('forage'))
+    env.seed(0)
+    env.reset()
+    assert env.players == [] and len(env.viruses) == 0
+    # 没有机器人时回合不会因为“只剩 AI 玩家”立即结束
+    for _ in range(100):
+        assert not env.step(np.array([0.5, 0.5, 0.0, 0.0]))[2]
+
+
+def test_layout_cache_is_shared():
+    cache = LayoutCache(size=3)
+    scheduler = CurriculumScheduler(levels=('sparse', 'crowded'), cache=cache)
+    envs = [AgarEnvironment(config=dict(DEFAULT_CONFIG)) for _ in range(2)]
+    generated = []
+    calls = []
+    for env in envs:
+        env.seed(len(calls))
+        generate, apply = env.generate_layouts, env.apply_scenario
+        env.generate_layouts = lambda size, generate=generate: generated.append(size) or generate(size)
+        env.apply_scenario = lambda *args, apply=apply: calls.append(args[0]) or apply(*args)
+        env.set_curriculum(scheduler)
+
+    for env in envs:
+        env.reset()
+        assert env.scenario == 'sparse' and env.config['gameWidth'] == 1000
+    # 每个场景只生成一次局面，所有环境共享同一批；每次切换只调用一次 apply_scenario
+    assert generated == [3]
+    assert calls == ['sparse', 'sparse']
+    assert envs[0]._start_pool is envs[1]._start_pool
+    layouts = cache.layouts('sparse', envs[0])
+    assert len(layouts) == 3
+    # reset 从缓存的局面中恢复，不再重新生成
+    for env in envs:
+        env.reset()
+        food = np.array([(f.x, f.y) for f in env.food])
+        assert any(np.array_equal(food, state['food'][:, :2]) for state, _ in layouts)
+    assert generated == [3] and calls == ['sparse', 'sparse']
+
+
+def test_curriculum_promotion_and_demotion():
+    scheduler = CurriculumScheduler(levels=('forage', 'easy', 'standard'), window=3, promote=10.0, demote=-5.0)
+    for episode_return in (20, 2, 5):
+        scheduler.record(episode_return)
+    assert scheduler.scenario == 'forage'
+    scheduler.record(30)
+    assert scheduler.scenario == 'easy'
+    # 切换后清空记录，在新难度上重新累计
+    assert scheduler.stats()['episodes'] == 0
+    for episode_return in (-10, -10, -10):
+        scheduler.record(episode_return)
+    assert scheduler.scenario == 'forage'
+    # 最低难度不再下降
+    for episode_return in (-10, -10, -10):
+        scheduler.record(episode_return)
+    assert scheduler.level == 0
+    assert [(a, b) for a, b, _ in scheduler.stats()['history']] == [('forage', 'easy'), ('easy', 'forage')]
+
+    # 环境在 reset 时报告上一局的总奖励并切换场景
+    scheduler = CurriculumScheduler(levels=('forage', 'easy'), window=2, promote=10.0, cache=LayoutCache(size=2))
+    env = AgarEnvironment(config=dict(DEFAULT_CONFIG))
+    env.seed(0)
+    env.set_curriculum(scheduler)
+    env.reset()
+    assert env.scenario == 'forage' and env.config['botCount'] == 0
+    for _ in range(2):
+        env.step(np.array([0.5, 0.5, 0.0, 0.0]))
+        env.total_reward = 15.0
+        env.reset()
+    assert env.scenario == 'easy'
+    assert env.config['botCount'] == SCENARIOS['easy']['botCount'] == len(env.players)
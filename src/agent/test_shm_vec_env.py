@@ -0,0 +1,33 @@
+import numpy as np
+
+from env import DEFAULT_CONFIG
+from shm_vec_env import SharedMemoryVecEnv
+from vec_env import BatchedAgarVecEnv
+
+CONFIG = dict(DEFAULT_CONFIG, botCount=6)
+
+
+def test_shared_memory_matches_batched():
+    n = 5
+    shm = SharedMemoryVecEnv(n, n_workers=2, config=CONFIG, seed=5)
+    try:
+        batched = BatchedAgarVecEnv(n, config=CONFIG, seed=5)
+        for venv in (shm, batched):
+            venv.set_attr('max_steps', 100)
+        np.testing.assert_array_equal(shm.reset(), batched.reset())
+        rng = np.random.RandomState(0)
+        for step in range(250):
+            actions = rng.uniform([-1, -1, 0, 0], [1, 1, 1, 1], size=(n, 4)).astype(np.float32)
+            (obs_a, rewards_a, dones_a, infos_a), (obs_b, rewards_b, dones_b, infos_b) = [
+                venv.step(actions) for venv in (shm, batched)
+            ]
+            np.testing.assert_array_equal(obs_a, obs_b)
+            np.testing.assert_array_equal(rewards_a, rewards_b)
+            np.testing.assert_array_equal(dones_a, dones_b)
+            for info_a, info_b in zip(infos_a, infos_b):
+                assert info_a.keys() == info_b.keys()
+                if 'terminal_observation' in info_a:
+                    np.testing.assert_array_equal(info_a['terminal_observation'], info_b['terminal_observation'])
+        assert shm.get_attr('steps') == batched.get_attr('steps')
+    finally:
+        shm.close()
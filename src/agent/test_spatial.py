@@ -0,0 +1,59 @@
+import math
+
+import numpy as np
+
+from spatial import SpatialHash
+
+
+def linear_radius(points, x, y, radius):
+    found = [(uid, math.sqrt((x - px) ** 2 + (y - py) ** 2)) for uid, (px, py) in points.items()]
+    return sorted((uid, dist) for uid, dist in found if dist < radius)
+
+
+def linear_nearest(points, x, y, k):
+    found = sorted((math.sqrt((x - px) ** 2 + (y - py) ** 2), uid) for uid, (px, py) in points.items())
+    return [(uid, dist) for dist, uid in found[:k]]
+
+
+def test_queries_match_linear_scan():
+    rng = np.random.RandomState(0)
+    for trial in range(30):
+        size = rng.choice([100.0, 500.0, 5000.0])
+        index = SpatialHash(cell_size=rng.choice([16, 64, 200]))
+        points = {}
+        uids = iter(range(10 ** 6))
+        # 批量插入、逐个插入和删除交替进行
+        n = rng.randint(0, 300)
+        xs, ys = rng.uniform(0, size, n), rng.uniform(0, size, n)
+        batch = [next(uids) for _ in range(n)]
+        index.insert_many(batch, xs, ys)
+        points.update(zip(batch, zip(xs.tolist(), ys.tolist())))
+        for _ in range(100):
+            if points and rng.random_sample() < 0.4:
+                uid = list(points)[rng.randint(len(points))]
+                index.remove(uid)
+                del points[uid]
+            else:
+                uid, x, y = next(uids), *rng.uniform(0, size, 2).tolist()
+                index.insert(uid, x, y)
+                points[uid] = (x, y)
+        assert len(index) == len(points)
+
+        for _ in range(20):
+            # 查询点可以在地图外
+            x, y = rng.uniform(-0.2 * size, 1.2 * size, 2).tolist()
+            radius = float(rng.choice([0.0, 5.0, 50.0, size / 3, 2 * size]))
+            assert index.query_radius(x, y, radius) == linear_radius(points, x, y, radius)
+            k = int(rng.choice([0, 1, 3, 10, len(points) + 2]))
+            assert index.nearest(x, y, k) == linear_nearest(points, x, y, k)
+
+
+def test_nearest_ties_prefer_smaller_uid():
+    index = SpatialHash(cell_size=10)
+    # 到原点距离相同，分布在不同的桶里
+    for uid, (x, y) in zip([5, 2, 9, 7], [(30, 0), (0, 30), (-30, 0), (0, -30)]):
+        index.insert(uid, x, y)
+    assert index.nearest(0, 0, 4) == [(2, 30.0), (5, 30.0), (7, 30.0), (9, 30.0)]
+    index.remove(2)
+    index.remove(2)
+    assert index.nearest(0, 0, 1) == [(5, 30.0)]
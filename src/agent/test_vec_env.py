@@ -0,0 +1,37 @@
+import numpy as np
+
+from env import AgarEnvironment, DEFAULT_CONFIG
+from vec_env import BatchedAgarVecEnv
+
+CONFIG = dict(DEFAULT_CONFIG, botCount=6)
+
+
+def random_actions(rng, n):
+    return rng.uniform([-1, -1, 0, 0], [1, 1, 1, 1], size=(n, 4)).astype(np.float32)
+
+
+def test_batched_matches_single_envs():
+    n = 4
+    venv = BatchedAgarVecEnv(num_envs=n, config=CONFIG, seed=10)
+    venv.set_attr('max_steps', 150)
+    singles = [AgarEnvironment(config=dict(CONFIG), backend='numpy') for _ in range(n)]
+    for i, env in enumerate(singles):
+        env.seed(10 + i)
+        env.max_steps = 150
+
+    np.testing.assert_array_equal(venv.reset(), np.stack([env.reset() for env in singles]))
+    rng = np.random.RandomState(0)
+    episodes = 0
+    for step in range(400):
+        actions = random_actions(rng, n)
+        obs, rewards, dones, infos = venv.step(actions)
+        for i, env in enumerate(singles):
+            expected_obs, reward, done, info = env.step(actions[i])
+            if done:
+                np.testing.assert_array_equal(infos[i]['terminal_observation'], expected_obs)
+                expected_obs = env.reset()
+                episodes += 1
+            np.testing.assert_array_equal(obs[i], expected_obs)
+            assert rewards[i] == np.float32(reward)
+            assert dones[i] == done
+    assert episodes >= n
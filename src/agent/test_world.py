@@ -0,0 +1,72 @@
+import itertools
+
+import numpy as np
+
+from world import cell_eats, sweep_and_prune
+
+
+def brute_force_pairs(x, radius):
+    return {(i, j) for i, j in itertools.combinations(range(len(x)), 2) if abs(x[i] - x[j]) < radius[i] + radius[j]}
+
+
+def brute_force_eats(x, y, radius, mass, owner):
+    """逐对扫描：按捕食者质量降序（相同则按下标）结算，每个细胞至多被吃一次，被吃的细胞不再吃别人"""
+    candidates = []
+    for i, j in itertools.permutations(range(len(x)), 2):
+        if owner[i] == owner[j] or mass[i] <= mass[j] * 1.1:
+            continue
+        if np.sqrt((x[i] - x[j]) ** 2 + (y[i] - y[j]) ** 2) < radius[i] + radius[j]:
+            candidates.append((-mass[i], i, j))
+    eaten, events = set(), []
+    for _, e, p in sorted(candidates):
+        if e not in eaten and p not in eaten:
+            eaten.add(p)
+            events.append((e, p))
+    return events
+
+
+def random_layout(rng, n, size=300.0):
+    mass = rng.choice([10.0, 10.0, 25.0, 60.0, 200.0], size=n) * rng.uniform(0.9, 1.1, size=n)
+    return (rng.uniform(0, size, n), rng.uniform(0, size, n), 4 + np.sqrt(mass) * 6, mass,
+            rng.randint(0, max(n // 3, 1), size=n))
+
+
+def test_sweep_and_prune_matches_brute_force():
+    rng = np.random.RandomState(0)
+    for trial in range(50):
+        x, _, radius, _, _ = random_layout(rng, rng.randint(0, 40))
+        i, j = sweep_and_prune(x, radius)
+        assert (i < j).all()
+        assert len(set(zip(i.tolist(), j.tolist()))) == len(i)
+        assert set(zip(i.tolist(), j.tolist())) == brute_force_pairs(x, radius)
+
+
+def test_cell_eats_matches_brute_force():
+    rng = np.random.RandomState(1)
+    total = 0
+    for trial in range(200):
+        layout = random_layout(rng, rng.randint(0, 30))
+        events = cell_eats(*layout)
+        assert events == brute_force_eats(*layout)
+        total += len(events)
+    assert total > 100
+
+
+def test_cell_eats_chain_and_shared_prey():
+    # A 能吃 B，B 能吃 C：A 先结算，B 被吃掉后不再吃 C
+    x = np.array([0.0, 100.0, 160.0])
+    y = np.zeros(3)
+    mass = np.array([400.0, 100.0, 20.0])
+    radius = 4 + np.sqrt(mass) * 6
+    assert cell_eats(x, y, radius, mass, np.arange(3)) == [(0, 1)]
+    # 只有 B、C 时 B 吃 C
+    assert cell_eats(x[1:], y[1:], radius[1:], mass[1:], np.arange(2)) == [(0, 1)]
+
+    # 三个细胞都能吃 D：质量最大的吃到，质量相同时下标小的吃到
+    x = np.array([10.0, -10.0, 0.0, 0.0])
+    y = np.array([0.0, 0.0, 10.0, 0.0])
+    mass = np.array([190.0, 200.0, 200.0, 10.0])
+    radius = 4 + np.sqrt(mass) * 6
+    assert cell_eats(x, y, radius, mass, np.arange(4)) == [(1, 3)]
+    # 同一玩家的细胞不互吃，D 由另一玩家的细胞吃掉
+    assert cell_eats(x, y, radius, mass, np.array([0, 1, 1, 1])) == [(0, 3)]
@@ -1,24 +1,46 @@
 from stable_baselines3 import PPO
-from env import AgarEnvironment
-from stable_baselines3.common.vec_env import DummyVecEnv
+from vec_env import BatchedAgarVecEnv
+from shm_vec_env import SharedMemoryVecEnv
+from league import PolicyPool, League, SelfPlayCallback
 import os
 
-# 初始化环境
-env = DummyVecEnv([lambda: AgarEnvironment()])
+N_ENVS = 16     # 竞技场总数
+N_WORKERS = 1   # >1 时把竞技场分布到多个进程（共享内存传输观察）
+SELF_PLAY = False  # 机器人由 models/ 下的检查点和训练中的快照控制（仅 N_WORKERS == 1）
 
-# 创建 PPO 模型
-model = PPO(
-    policy="MlpPolicy",
-    env=env,
-    verbose=1,
-    tensorboard_log="./tensorboard_logs",  # 可视化训练过程
-)
 
-# 开始训练
-model.learn(total_timesteps=100_000)  # 可以调成 1_000_000
+def main():
+    # 初始化环境：多个竞技场在同一进程内批量模拟
+    if N_WORKERS > 1:
+        env = SharedMemoryVecEnv(N_ENVS, n_workers=N_WORKERS, pin_cpus=True)
+    else:
+        env = BatchedAgarVecEnv(num_envs=N_ENVS)
 
-# 保存模型
-os.makedirs("models", exist_ok=True)
-model.save("models/ppo_agar_agent")
+    # 创建 PPO 模型
+    model = PPO(
+        policy="MlpPolicy",
+        env=env,
+        verbose=1,
+        tensorboard_log="./tensorboard_logs",  # 可视化训练过程
+    )
 
-print("✅ 训练完成，模型已保存。")
+    callback = None
+    if SELF_PLAY and N_WORKERS == 1:
+        pool = PolicyPool(max_size=8, obs_size=env.observation_space.shape[0])
+        pool.load_directory("models")
+        env.env_method('set_league', League(pool))
+        callback = SelfPlayCallback(pool, every=20_000)
+
+    # 开始训练
+    model.learn(total_timesteps=100_000, callback=callback)  # 可以调成 1_000_000
+
+    # 保存模型
+    os.makedirs("models", exist_ok=True)
+    model.save("models/ppo_agar_agent")
+    env.close()
+
+    print("✅ 训练完成，模型已保存。")
+
+
+if __name__ == '__main__':
+    main()
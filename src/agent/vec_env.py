@@ -0,0 +1,125 @@
+import numpy as np
+from stable_baselines3.common.vec_env.base_vec_env import VecEnv
+
+from env import (
+    AgarEnvironment, DEFAULT_CONFIG,
+    move_and_decay_arrays, nearest_food_arrays, food_contact_arrays,
+    update_bot_targets, apply_leagues, move_mass_food_arrays, _repeat_action,
+)
+from world import World
+
+
+class BatchedAgarVecEnv(VecEnv):
+    """在一个进程内同时模拟 num_envs 个独立竞技场的 VecEnv
+
+    所有竞技场共享一个 World（每个竞技场占一行数组），机器人策略、最近食物查询、
+    细胞移动、质量衰减和食物接触预筛对全部竞技场一次向量化完成；观察、奖励和结束标志
+    写入预分配的缓冲区，观察也对全部竞技场批量编码。
+    结束的竞技场会就地重置，终局观察放在 info['terminal_observation']。
+    每个竞技场的轨迹与相同种子下单独运行的 AgarEnvironment(backend='numpy') 一致。
+    """
+
+    def __init__(self, num_envs=256, config=None, seed=None):
+        self.config = config or dict(DEFAULT_CONFIG)
+        self.world = World(self.config, n_arenas=num_envs)
+        self.envs = [
+            AgarEnvironment(config=self.config, world=self.world, arena=i)
+            for i in range(num_envs)
+        ]
+        env = self.envs[0]
+        super().__init__(num_envs, env.observation_space, env.action_space)
+
+        self._obs = np.zeros((num_envs,) + env.observation_space.shape, dtype=np.float32)
+        self._rewards = np.zeros(num_envs, dtype=np.float32)
+        self._dones = np.zeros(num_envs, dtype=bool)
+        self._actions = None
+        if seed is not None:
+            self.seed(seed)
+
+    def reset(self):
+        for i, env in enumerate(self.envs):
+            self._obs[i] = env.reset()
+        return self._obs.copy()
+
+    def step_async(self, actions):
+        self._actions = np.asarray(actions)
+
+    def step_wait(self):
+        envs = self.envs
+        # 奖励先按 float64 累加，与单个环境的累加结果一致
+        rewards = np.zeros(len(envs))
+        self._dones[:] = False
+        # 每个竞技场本次决策的 tick 数（actionRepeat，见 AgarEnvironment.step）
+        ticks = [env._ticks_for_step() for env in envs]
+        for env in envs:
+            if env.profiler is not None:
+                env.profiler.start()
+
+        for tick in range(max(ticks)):
+            active = [i for i, env in enumerate(envs) if tick < ticks[i] and not self._dones[i]]
+            if not active:
+                break
+            tick_envs = [envs[i] for i in active]
+            # 仍处于规则策略阶段的竞技场，一次性算出各自智能体的最近食物
+            ruled = [env for env in tick_envs if env.steps + 1 < env.config.get('ruleSteps', 2000)]
+            foods = nearest_food_arrays(ruled, [env.agent_player for env in ruled])
+            rule_actions = {id(env): env._chase_action(food) for env, food in zip(ruled, foods)}
+            prev_mass = [
+                envs[i]._apply_action(
+                    self._actions[i] if tick == 0 else _repeat_action(self._actions[i]),
+                    rule_actions.get(id(envs[i]))
+                )
+                for i in active
+            ]
+
+            # 所有竞技场的机器人策略一次批量计算，联赛策略的观察和前向也对所有竞技场批量完成
+            update_bot_targets(tick_envs)
+            apply_leagues(tick_envs)
+
+            arenas, slots = move_and_decay_arrays(tick_envs)
+            move_mass_food_arrays(tick_envs)
+            may_eat = food_contact_arrays(self.world, arenas, slots)
+
+            for i, mass in zip(active, prev_mass):
+                env = envs[i]
+                if env.profiler is not None:
+                    # 前面的阶段是全部竞技场批量完成的，只统计各竞技场自己的碰撞和奖励
+                    env.profiler.skip()
+                reward, done = env._end_tick(mass, may_eat[env.arena])
+                rewards[i] += reward
+                self._dones[i] = done
+
+        self._rewards[:] = rewards
+
+        # 所有竞技场的观察一次批量编码、直接写入观察缓冲区，结束的竞技场随后就地重置
+        infos = [env._step_info() for env in envs]
+        envs[0].encoder.encode(envs, out=self._obs)
+        for i in np.flatnonzero(self._dones):
+            infos[i]['terminal_observation'] = self._obs[i].copy()
+            self._obs[i] = envs[i].reset()
+        return self._obs.copy(), self._rewards.copy(), self._dones.copy(), infos
+
+    def seed(self, seed=None):
+        """第 i 个竞技场使用种子 seed + i"""
+        if seed is None:
+            seed = np.random.randint(0, 2 ** 31 - 1)
+        return [env.seed(seed + i)[0] for i, env in enumerate(self.envs)]
+
+    def close(self):
+        pass
+
+    def get_attr(self, attr_name, indices=None):
+        return [getattr(self.envs[i], attr_name) for i in self._get_indices(indices)]
+
+    def set_attr(self, attr_name, value, indices=None):
+        for i in self._get_indices(indices):
+            setattr(self.envs[i], attr_name, value)
+
+    def env_method(self, method_name, *method_args, indices=None, **method_kwargs):
+        return [
+            getattr(self.envs[i], method_name)(*method_args, **method_kwargs)
+            for i in self._get_indices(indices)
+        ]
+
+    def env_is_wrapped(self, wrapper_class, indices=None):
+        return [False for _ in self._get_indices(indices)]
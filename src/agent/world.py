@@ -0,0 +1,680 @@
+import math
+from collections import namedtuple
+
+import numpy as np
+
+
+# pop() 返回的被删除实体快照
+EntityRecord = namedtuple('EntityRecord', 'x y mass radius')
+
+
+def mass_to_radius(mass):
+    """质量转换为半径（标量或数组）"""
+    return 4 + np.sqrt(mass) * 6
+
+
+class EntityArrays:
+    """一类实体的列式存储（struct-of-arrays）
+
+    每一列的形状为 (n_arenas, capacity)，第 a 行对应第 a 个竞技场。
+    基础列为 x, y, mass, radius, owner, alive，可通过 extra 追加列。
+    n_used[a] 是竞技场 a 已使用槽位的高水位线。
+    """
+
+    BASE_COLUMNS = {
+        'x': np.float64,
+        'y': np.float64,
+        'mass': np.float64,
+        'radius': np.float64,
+        'owner': np.int32,
+        'alive': np.bool_,
+    }
+
+    def __init__(self, n_arenas, capacity, extra=None):
+        self.n_arenas = n_arenas
+        self.capacity = max(1, int(capacity))
+        self.columns = dict(self.BASE_COLUMNS)
+        self.columns.update(extra or {})
+        for name, dtype in self.columns.items():
+            setattr(self, name, np.zeros((n_arenas, self.capacity), dtype=dtype))
+        self.n_used = np.zeros(n_arenas, dtype=np.int64)
+
+    def _grow(self, min_capacity):
+        """容量翻倍直到满足 min_capacity"""
+        capacity = self.capacity
+        while capacity < min_capacity:
+            capacity *= 2
+        for name, dtype in self.columns.items():
+            old = getattr(self, name)
+            new = np.zeros((self.n_arenas, capacity), dtype=dtype)
+            new[:, :self.capacity] = old
+            setattr(self, name, new)
+        self.capacity = capacity
+
+    def append(self, arena, **values):
+        """在末尾追加若干实体，values 为标量或等长数组，返回新槽位"""
+        n = max(np.size(v) for v in values.values()) if values else 1
+        start = int(self.n_used[arena])
+        if start + n > self.capacity:
+            self._grow(start + n)
+        slots = np.arange(start, start + n)
+        for name, value in values.items():
+            getattr(self, name)[arena, start:start + n] = value
+        self.alive[arena, start:start + n] = True
+        self.n_used[arena] = start + n
+        return slots
+
+    def alloc(self, arena, **values):
+        """分配单个槽位，优先复用已释放的槽位"""
+        used = int(self.n_used[arena])
+        free = np.flatnonzero(~self.alive[arena, :used])
+        if len(free) == 0:
+            return int(self.append(arena, **values)[0])
+        slot = int(free[0])
+        for name in self.columns:
+            getattr(self, name)[arena, slot] = 0
+        for name, value in values.items():
+            getattr(self, name)[arena, slot] = value
+        self.alive[arena, slot] = True
+        return slot
+
+    def kill(self, arena, slots):
+        """标记实体死亡（不移动其余实体）"""
+        self.alive[arena, slots] = False
+
+    def compact(self, arena):
+        """把存活实体按原顺序移到前部，等价于对列表逐个 pop"""
+        used = int(self.n_used[arena])
+        keep = np.flatnonzero(self.alive[arena, :used])
+        if len(keep) == used:
+            return
+        n = len(keep)
+        for name in self.columns:
+            col = getattr(self, name)
+            col[arena, :n] = col[arena, keep]
+            col[arena, n:used] = 0
+        self.n_used[arena] = n
+
+    def swap_remove(self, arena, slots):
+        """O(k) 删除：按槽位降序依次把末尾实体移入空位
+
+        存活实体始终保持在 [0, n_used) 内，但顺序会改变；
+        与对 Python 列表执行 "lst[s] = lst[-1]; lst.pop()" 的结果一致。
+        """
+        n = int(self.n_used[arena])
+        if len(slots) == 1:
+            # 最常见的情况（吃掉一个食物）：逐列标量赋值，省去花式索引
+            slot, last = int(slots[0]), n - 1
+            for name in self.columns:
+                col = getattr(self, name)
+                col[arena, slot] = col[arena, last]
+                col[arena, last] = 0
+            self.n_used[arena] = last
+            return
+        source = {}
+        for slot in sorted(set(int(s) for s in slots), reverse=True):
+            last = n - 1
+            if slot != last:
+                source[slot] = source.pop(last, last)
+            else:
+                source.pop(last, None)
+            n -= 1
+        if source:
+            dst = np.fromiter(source.keys(), dtype=np.int64, count=len(source))
+            src = np.fromiter(source.values(), dtype=np.int64, count=len(source))
+            for name in self.columns:
+                col = getattr(self, name)
+                col[arena, dst] = col[arena, src]
+        used = int(self.n_used[arena])
+        for name in self.columns:
+            getattr(self, name)[arena, n:used] = 0
+        self.n_used[arena] = n
+
+    def remove(self, arena, slots):
+        """删除并压实，保持剩余实体的相对顺序"""
+        self.kill(arena, slots)
+        self.compact(arena)
+
+    def clear(self, arena):
+        """清空一个竞技场"""
+        self.alive[arena] = False
+        self.n_used[arena] = 0
+
+
+class EntityView:
+    """指向 EntityArrays 中某个槽位的对象视图，读写直接落到数组上"""
+
+    __slots__ = ('_store', '_arena', '_slot')
+
+    def __init__(self, store, arena, slot):
+        self._store = store
+        self._arena = arena
+        self._slot = slot
+
+    def _get(name):
+        def getter(self):
+            return float(getattr(self._store, name)[self._arena, self._slot])
+
+        def setter(self, value):
+            getattr(self._store, name)[self._arena, self._slot] = value
+
+        return property(getter, setter)
+
+    x = _get('x')
+    y = _get('y')
+    mass = _get('mass')
+    radius = _get('radius')
+    del _get
+
+    @property
+    def uid(self):
+        """空间索引中的实体编号（仅食物和病毒）"""
+        return int(self._store.uid[self._arena, self._slot])
+
+
+class CellView(EntityView):
+    """玩家细胞视图，与 env.Cell 接口一致"""
+
+    __slots__ = ('player_id',)
+
+    def __init__(self, store, arena, slot, player_id):
+        super().__init__(store, arena, slot)
+        self.player_id = player_id
+
+    @property
+    def boost(self):
+        """分裂后的额外速度（见 env.Cell.boost）"""
+        return float(self._store.boost[self._arena, self._slot])
+
+    @boost.setter
+    def boost(self, value):
+        self._store.boost[self._arena, self._slot] = value
+
+    def to_circle(self):
+        """转换为圆形，用于碰撞检测"""
+        return {'x': self.x, 'y': self.y, 'r': self.radius}
+
+
+class FoodView(EntityView):
+    """食物视图，与 env.Food 接口一致"""
+
+    __slots__ = ()
+
+
+class VirusView(EntityView):
+    """病毒视图，与 env.Virus 接口一致"""
+
+    __slots__ = ()
+
+
+class EntityList:
+    """把有序的 EntityArrays 包装成类 list 接口
+
+    存储始终保持压实（存活实体位于 [0, n_used)），因此第 i 个元素就是槽位 i，
+    与原先 Python 列表的顺序和 pop 语义一致。
+    """
+
+    def __init__(self, store, arena, view_cls):
+        self.store = store
+        self.arena = arena
+        self.view_cls = view_cls
+
+    def __len__(self):
+        return int(self.store.n_used[self.arena])
+
+    def __bool__(self):
+        return len(self) > 0
+
+    def _view(self, slot):
+        return self.view_cls(self.store, self.arena, slot)
+
+    def __getitem__(self, index):
+        n = len(self)
+        if isinstance(index, slice):
+            return [self._view(i) for i in range(*index.indices(n))]
+        if index < 0:
+            index += n
+        if not 0 <= index < n:
+            raise IndexError('entity index out of range')
+        return self._view(index)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self._view(i)
+
+    def append(self, entity):
+        """追加一个具有 x, y, mass 属性的实体"""
+        values = {}
+        if 'uid' in self.store.columns:
+            values['uid'] = entity.uid
+        self.store.append(
+            self.arena,
+            x=entity.x,
+            y=entity.y,
+            mass=entity.mass,
+            radius=entity.radius,
+            **values
+        )
+
+    def pop(self, index=-1):
+        """删除并返回第 index 个实体的副本"""
+        n = len(self)
+        if index < 0:
+            index += n
+        view = self._view(index)
+        removed = EntityRecord(view.x, view.y, view.mass, view.radius)
+        self.store.remove(self.arena, [index])
+        return removed
+
+    def clear(self):
+        self.store.clear(self.arena)
+
+
+class MassFoodList(EntityList):
+    """射出质量列表，元素沿用 Player.eject_mass 返回的 dict 格式（元素为副本）
+
+    射出者的玩家 id 在 owner 列中保存为 World.owner_handle 句柄，没有射出者时为 -1。
+    """
+
+    def __init__(self, store, arena, world):
+        super().__init__(store, arena, None)
+        self.world = world
+
+    def _view(self, slot):
+        s, a = self.store, self.arena
+        owner = int(s.owner[a, slot])
+        return {
+            'id': self.world.owner_id(owner) if owner >= 0 else None,
+            'num': int(s.num[a, slot]),
+            'x': float(s.x[a, slot]),
+            'y': float(s.y[a, slot]),
+            'mass': float(s.mass[a, slot]),
+            'radius': float(s.radius[a, slot]),
+            'speed': float(s.speed[a, slot]),
+            'direction': {'x': float(s.dir_x[a, slot]), 'y': float(s.dir_y[a, slot])},
+        }
+
+    def append(self, entity):
+        self.store.append(
+            self.arena,
+            x=entity['x'],
+            y=entity['y'],
+            mass=entity['mass'],
+            radius=entity['radius'],
+            owner=-1 if entity['id'] is None else self.world.owner_handle(entity['id']),
+            num=entity['num'],
+            speed=entity['speed'],
+            dir_x=entity['direction']['x'],
+            dir_y=entity['direction']['y'],
+        )
+
+    def pop(self, index=-1):
+        n = len(self)
+        if index < 0:
+            index += n
+        removed = self._view(index)
+        self.store.remove(self.arena, [index])
+        return removed
+
+
+class World:
+    """NumPy 世界状态：食物、病毒、射出质量和玩家细胞都保存在连续数组中
+
+    所有实体都按竞技场分行存储，单个 AgarEnvironment 使用第 arena 行。
+    """
+
+    def __init__(self, config, n_arenas=1):
+        self.config = config
+        self.n_arenas = n_arenas
+        max_cells = 4 * config['limitSplit']
+        # uid 按生成顺序递增，用作空间索引的键和吃食物的结算顺序；
+        # 食物池容量固定为 maxFood，被吃掉的食物用 swap_remove 删除
+        self.food = EntityArrays(n_arenas, config['maxFood'], extra={'uid': np.int64})
+        self.viruses = EntityArrays(n_arenas, config['maxViruses'], extra={'uid': np.int64})
+        # 射出质量池容量固定为 maxMassFood，池满时不再射出
+        self.mass_food = EntityArrays(n_arenas, config.get('maxMassFood', 256), extra={
+            'dir_x': np.float64,
+            'dir_y': np.float64,
+            'speed': np.float64,
+            'num': np.int32,
+        })
+        self.cells = EntityArrays(n_arenas, max_cells, extra={'boost': np.float64})
+        self._owner_ids = {}
+        self._owner_names = []
+
+    def owner_handle(self, player_id):
+        """玩家 id 对应的整数句柄，写入 owner 列"""
+        if player_id not in self._owner_ids:
+            self._owner_ids[player_id] = len(self._owner_names)
+            self._owner_names.append(player_id)
+        return self._owner_ids[player_id]
+
+    def owner_id(self, handle):
+        """owner_handle 的逆映射"""
+        return self._owner_names[handle]
+
+    def new_cell(self, arena, x, y, mass, radius, player_id, boost=0.0):
+        """分配一个细胞并返回其视图"""
+        slot = self.cells.alloc(
+            arena,
+            x=x,
+            y=y,
+            mass=mass,
+            radius=radius,
+            owner=self.owner_handle(player_id),
+            boost=boost,
+        )
+        return CellView(self.cells, arena, slot, player_id)
+
+    def clear(self, arena):
+        """清空一个竞技场的所有实体"""
+        for store in (self.food, self.viruses, self.mass_food, self.cells):
+            store.clear(arena)
+
+
+# 批量距离计算每块最多处理的元素数，限制 (查询数, capacity) 临时矩阵的内存
+_CHUNK_ELEMENTS = 1 << 20
+
+
+def _distance_chunks(store, arenas, xs, ys):
+    """分块产生 (查询下标切片, 距离矩阵)，未使用的槽位距离为 inf"""
+    step = max(1, _CHUNK_ELEMENTS // store.capacity)
+    cols = np.arange(store.capacity)
+    for lo in range(0, len(arenas), step):
+        part = slice(lo, lo + step)
+        a = arenas[part]
+        dist = np.sqrt((xs[part, None] - store.x[a]) ** 2 + (ys[part, None] - store.y[a]) ** 2)
+        dist[cols >= store.n_used[a][:, None]] = np.inf
+        yield part, dist
+
+
+def nearest_batch(store, arenas, xs, ys):
+    """批量最近邻：第 q 个查询点在竞技场 arenas[q] 中最近实体的槽位，没有实体时为 -1
+
+    距离相同时取槽位较小者，与 SpatialHash.nearest 一致。
+    """
+    slots = np.zeros(len(arenas), dtype=np.int64)
+    for part, dist in _distance_chunks(store, arenas, xs, ys):
+        slots[part] = np.argmin(dist, axis=1)
+    slots[store.n_used[arenas] == 0] = -1
+    return slots
+
+
+def nearest_distance(store, arenas, xs, ys):
+    """第 q 个查询点到竞技场 arenas[q] 中最近实体的距离，没有实体时为 inf"""
+    dist = np.full(len(arenas), np.inf)
+    for part, d in _distance_chunks(store, arenas, xs, ys):
+        dist[part] = np.min(d, axis=1, initial=np.inf)
+    return dist
+
+
+def any_within(store, arenas, xs, ys, reach):
+    """第 q 个查询点在竞技场 arenas[q] 中距离小于 reach[q] 的范围内是否有实体"""
+    found = np.zeros(len(arenas), dtype=bool)
+    for part, dist in _distance_chunks(store, arenas, xs, ys):
+        found[part] = np.any(dist < reach[part, None], axis=1)
+    return found
+
+
+def spawn_positions(rng, count, width, height, nearest_dist=None, candidates=10):
+    """批量生成 count 个出生位置，所需随机数一次抽取
+
+    nearest_dist 为 None 时在地图内均匀随机；否则使用 best-candidate 采样
+    （对应 foodUniformDisposition，与服务器 util.uniformPosition 相同的思路）：
+    每个位置抽取 candidates 个候选，nearest_dist(xs, ys) 返回候选到现有实体的
+    最近距离，取其中最远的候选。同一批新位置之间不互相比较。
+    """
+    if nearest_dist is None:
+        u = rng.random_sample((count, 2))
+        return width * u[:, 0], height * u[:, 1]
+    u = rng.random_sample((count, candidates, 2))
+    xs = width * u[..., 0]
+    ys = height * u[..., 1]
+    dist = np.asarray(nearest_dist(xs.ravel(), ys.ravel())).reshape(count, candidates)
+    best = np.argmax(dist, axis=1)
+    rows = np.arange(count)
+    return xs[rows, best], ys[rows, best]
+
+
+def density_positions(rng, count, width, height, clusters, background=0.2):
+    """按食物密度场批量生成 count 个位置
+
+    clusters 为若干高斯团 {'x', 'y', 'spread', 'weight'}，中心和标准差为地图宽高的比例；
+    background 为均匀分布部分的权重。每个位置先按权重选择分量，再在分量内采样，
+    结果限制在地图内。
+    """
+    weights = np.array([background] + [c.get('weight', 1.0) for c in clusters], dtype=np.float64)
+    if weights.sum() <= 0:
+        raise ValueError('food density weights must not all be zero')
+    cx = np.array([0.0] + [c['x'] for c in clusters])
+    cy = np.array([0.0] + [c['y'] for c in clusters])
+    spread = np.array([0.0] + [c.get('spread', 0.1) for c in clusters])
+    u = rng.random_sample((count, 3))
+    noise = rng.standard_normal((count, 2))
+    component = np.minimum(np.searchsorted(np.cumsum(weights) / weights.sum(), u[:, 0], side='right'), len(weights) - 1)
+    uniform = component == 0
+    x = np.where(uniform, u[:, 1], cx[component] + noise[:, 0] * spread[component])
+    y = np.where(uniform, u[:, 2], cy[component] + noise[:, 1] * spread[component])
+    return np.clip(x, 0, 1) * width, np.clip(y, 0, 1) * height
+
+
+def cell_slots(players):
+    """按玩家顺序、细胞列表顺序收集细胞槽位，并返回每个玩家的分段边界"""
+    slots = []
+    bounds = [0]
+    for player in players:
+        slots.extend(cell._slot for cell in player.cells)
+        bounds.append(len(slots))
+    return np.array(slots, dtype=np.int64), bounds
+
+
+def move_cells(x, y, mass, radius, target_x, target_y, slow_base, game_width, game_height, boost=0.0):
+    """向量化的细胞移动，与 Player.move 的逐细胞逻辑逐位一致
+
+    boost 为分裂后的额外速度，速度取其与正常速度的较大者（衰减由调用方处理）。
+    返回更新后的 x, y 以及 moved 掩码（距离目标不足 1 的细胞不移动）。
+    """
+    dx = target_x - x
+    dy = target_y - y
+    dist = np.sqrt(dx * dx + dy * dy)
+    moved = dist >= 1
+    safe_dist = np.where(moved, dist, 1.0)
+    speed = np.maximum(np.maximum(slow_base, 6.25 / np.sqrt(mass)), boost)
+    dx = dx / safe_dist
+    dy = dy / safe_dist
+    new_x = np.maximum(radius, np.minimum(game_width - radius, x + dx * speed))
+    new_y = np.maximum(radius, np.minimum(game_height - radius, y + dy * speed))
+    return np.where(moved, new_x, x), np.where(moved, new_y, y), moved
+
+
+# 同一玩家的细胞互相推开的速度（map/player.js 的 PUSHING_AWAY_SPEED）
+PUSHING_AWAY_SPEED = 1.1
+
+# own_cell_pairs 按细胞数缓存的上三角下标
+_TRIU = {}
+
+
+def own_cell_pairs(bounds):
+    """同一玩家细胞的所有无序对 (i, j)，i < j
+
+    bounds 为 cell_slots 返回的分段边界；按玩家顺序、再按 (i, j) 字典序排列。
+    """
+    firsts = []
+    seconds = []
+    for lo, hi in zip(bounds[:-1], bounds[1:]):
+        n = hi - lo
+        if n < 2:
+            continue
+        if n not in _TRIU:
+            _TRIU[n] = np.triu_indices(n, 1)
+        i, j = _TRIU[n]
+        firsts.append(i + lo)
+        seconds.append(j + lo)
+    if not firsts:
+        empty = np.zeros(0, dtype=np.int64)
+        return empty, empty
+    return np.concatenate(firsts), np.concatenate(seconds)
+
+
+def own_cell_interactions(x, y, radius, bounds, can_merge):
+    """同一玩家细胞之间的合并和推开（对应 map/player.js 的 mergeCollidingCells /
+    pushAwayCollidingCells），所有玩家的所有细胞对一次计算
+
+    can_merge[p] 表示第 p 个玩家的合并计时已结束：其相交（dist² <= (r1 + r2)²）的细胞对合并，
+    否则互相推开。与服务器逐对原地更新不同，所有判定和位移都基于本阶段开始时的位置：
+    每对相交细胞沿连线方向各移动 PUSHING_AWAY_SPEED（重合时沿 y 轴各移动 1），
+    同一细胞的位移按细胞对的顺序累加。合并按细胞对顺序结算，前者吸收后者，
+    已被吸收的细胞不再参与合并。
+    返回 (dx, dy, merges)，merges 为按结算顺序排列的 [(吸收者, 被吸收者)]。
+    """
+    n = len(x)
+    dx = np.zeros(n)
+    dy = np.zeros(n)
+    i, j = own_cell_pairs(bounds)
+    vx = x[j] - x[i]
+    vy = y[j] - y[i]
+    d2 = vx * vx + vy * vy
+    touching = d2 <= (radius[i] + radius[j]) ** 2
+    owner = np.repeat(np.arange(len(bounds) - 1), np.diff(bounds))
+    merging = touching & np.asarray(can_merge, dtype=bool)[owner[i]]
+    push = touching & ~merging
+
+    vx, vy, d2 = vx[push], vy[push], d2[push]
+    length = np.sqrt(d2)
+    apart = length > 0
+    safe = np.where(apart, length, 1.0)
+    vx = np.where(apart, vx / safe * PUSHING_AWAY_SPEED, 0.0)
+    vy = np.where(apart, vy / safe * PUSHING_AWAY_SPEED, 1.0)
+    np.add.at(dx, i[push], -vx)
+    np.add.at(dy, i[push], -vy)
+    np.add.at(dx, j[push], vx)
+    np.add.at(dy, j[push], vy)
+
+    merges = []
+    absorbed = set()
+    for a, b in zip(i[merging].tolist(), j[merging].tolist()):
+        if a in absorbed or b in absorbed:
+            continue
+        absorbed.add(b)
+        merges.append((a, b))
+    return dx, dy, merges
+
+
+def move_mass_food(x, y, speed, dir_x, dir_y, radius, game_width, game_height):
+    """向量化的射出质量移动（对应 map/massFood.js 的 MassFood.move），与逐个计算逐位一致
+
+    只应传入 speed > 0 的射出质量；位移使用衰减前的速度，速度每次减 0.5 且不小于 0，
+    之后限制在距边界 radius + 5 以内。返回新的 x, y, speed。
+    """
+    border = radius + 5
+    x = np.maximum(border, np.minimum(game_width - border, x + speed * dir_x))
+    y = np.maximum(border, np.minimum(game_height - border, y + speed * dir_y))
+    return x, y, np.maximum(speed - 0.5, 0.0)
+
+
+def mass_food_eats(cell_x, cell_y, cell_radius, cell_mass, cell_owner, cell_index,
+                   food_x, food_y, food_mass, food_speed, food_owner, food_num):
+    """细胞吃射出质量的判定（对应服务器 canEatMass），返回每个射出质量的吞食者下标，未被吃为 -1
+
+    射出质量的中心在细胞圆内（含边界）且细胞质量超过其 1.1 倍时可以吃；
+    仍在运动的射出质量不会被射出它的那个细胞（同一玩家、同一细胞下标）吃掉。
+    细胞按下标顺序结算，每个射出质量归第一个能吃它的细胞。
+    判定只依赖各细胞自己的质量，而细胞只在自己结算时增长，因此结果与逐个结算一致。
+    """
+    inside = (
+        (food_x[None, :] - cell_x[:, None]) ** 2 + (food_y[None, :] - cell_y[:, None]) ** 2
+        <= (cell_radius * cell_radius)[:, None]
+    )
+    own = (
+        (food_owner[None, :] == cell_owner[:, None])
+        & (food_speed[None, :] > 0)
+        & (food_num[None, :] == cell_index[:, None])
+    )
+    can_eat = inside & ~own & (cell_mass[:, None] > food_mass[None, :] * 1.1)
+    return np.where(can_eat.any(axis=0), np.argmax(can_eat, axis=0), -1)
+
+
+def decay_cells(mass, min_mass, rate):
+    """向量化的质量衰减，返回新的 mass 以及发生衰减的掩码"""
+    decaying = mass > min_mass
+    return np.where(decaying, mass - mass * rate, mass), decaying
+
+
+def sweep_and_prune(x, radius):
+    """沿 x 轴扫掠，返回 x 区间 (x - r, x + r) 相交的所有无序对 (i, j)，i < j
+
+    按区间左端排序后，每个区间只需与左端落在自身区间内的后继配对。
+    """
+    n = len(x)
+    lo = x - radius
+    hi = x + radius
+    order = np.argsort(lo, kind='stable')
+    lo_sorted = lo[order]
+    end = np.searchsorted(lo_sorted, hi[order], side='left')
+    counts = np.maximum(end - np.arange(n) - 1, 0)
+    total = int(counts.sum())
+    if total == 0:
+        empty = np.zeros(0, dtype=np.int64)
+        return empty, empty
+    a = np.repeat(np.arange(n), counts)
+    b = a + 1 + np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+    i, j = order[a], order[b]
+    return np.minimum(i, j), np.maximum(i, j)
+
+
+def cell_eats(x, y, radius, mass, owner):
+    """玩家细胞互吃的判定与结算顺序
+
+    粗筛用 sweep_and_prune，细筛为 dist < r1 + r2 且质量超过对方 1.1 倍。
+    所有判定基于本阶段开始时的质量，结算时按捕食者初始质量降序（相同则按下标）
+    依次进行：每个细胞至多被吃一次，被吃掉的细胞不再吃别人。
+    由于捕食者质量严格大于猎物，猎物被吃时一定还没有吃过别人。
+    返回按结算顺序排列的 [(eater, prey)]。
+    """
+    i, j = sweep_and_prune(x, radius)
+    keep = owner[i] != owner[j]
+    i, j = i[keep], j[keep]
+    dist = np.sqrt((x[i] - x[j]) ** 2 + (y[i] - y[j]) ** 2)
+    touching = dist < radius[i] + radius[j]
+    i, j = i[touching], j[touching]
+    i_eats = mass[i] > mass[j] * 1.1
+    j_eats = mass[j] > mass[i] * 1.1
+    eater = np.concatenate([i[i_eats], j[j_eats]])
+    prey = np.concatenate([j[i_eats], i[j_eats]])
+    order = np.lexsort((prey, eater, -mass[eater]))
+    eaten = set()
+    events = []
+    for e, p in zip(eater[order].tolist(), prey[order].tolist()):
+        if e in eaten or p in eaten:
+            continue
+        eaten.add(p)
+        events.append((e, p))
+    return events
+
+
+def eat_food(cell_x, cell_y, cell_mass, cell_radius, food_x, food_y, food_mass, order=None):
+    """单个细胞对一串食物的吞食，返回被吃掉的下标、新质量和新半径
+
+    与原循环语义一致：按顺序扫描，每吃一个食物半径随之增长，
+    后面的食物用增长后的半径判断。先用半径上界筛出候选，再顺序结算。
+    order 给出扫描顺序的排序键（如食物 uid），默认按下标顺序。
+    """
+    dist = np.sqrt((cell_x - food_x) ** 2 + (cell_y - food_y) ** 2)
+    bound = cell_radius
+    while True:
+        candidates = (dist < bound).nonzero()[0]
+        new_bound = 4 + math.sqrt(cell_mass + float(food_mass[candidates].sum())) * 6
+        if new_bound <= bound:
+            break
+        bound = new_bound + 1e-9
+    if order is not None and len(candidates) > 1:
+        candidates = candidates[np.argsort(order[candidates], kind='stable')]
+    eaten = []
+    mass = cell_mass
+    radius = cell_radius
+    for i, d, m in zip(candidates.tolist(), dist[candidates].tolist(), food_mass[candidates].tolist()):
+        if d < radius:
+            mass += m
+            radius = 4 + math.sqrt(mass) * 6
+            eaten.append(i)
+    return eaten, mass, radius